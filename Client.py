@@ -9,15 +9,31 @@ import sys
 import quickfix as fix
 import quickfix44 as fix44
 import random
+import itertools
+import threading
+import time
 from datetime import datetime
 import os
+import metrics
+import message_store
+import fix_codec
+import fix_dictionary
+import commands
+from latency import tracer, TAG_CLIENT_SEND_TIME, TAG_MM_SEND_TIME
+from session_health import SessionHealthMonitor, test_request_interval
+from market_data import MarketDataCache
+from playback import Playback
 
 
 
 class MessageLogger:
+    # FIX_LOG_ANNOTATE=1 adds a line with field and enum names under every logged message
+    annotate = os.environ.get('FIX_LOG_ANNOTATE') == '1'
+
     def __init__(self, name):
         self.name = name
         self.log_dir = f"logs/{name.lower()}"
+        self._handles = {}
         self.ensure_log_directories()
 
     def ensure_log_directories(self):
@@ -34,19 +50,42 @@ class MessageLogger:
         with open(log_file, 'a') as f:
             f.write(f"{timestamp} : {event_type} : {details}\n")
 
-    def log_message(self, direction, message, parsed_content=None):
-        """Log FIX messages with parsed content"""
+    def log_message(self, direction, message, parsed_content=None, flush=True):
+        """Log FIX messages with parsed content
+
+        Message logs keep their file open; pass flush=False while sending a batch
+        and call flush() once at the end."""
         timestamp = datetime.now().strftime('%Y%m%d-%H:%M:%S.%f')
         log_file = f"{self.log_dir}/messages/{direction}.log"
 
         msg_type = self.get_message_type(message)
-        formatted_msg = message.toString().replace(chr(1), ' | ')
-
-        with open(log_file, 'a') as f:
-            f.write(f"{timestamp} : {msg_type} : {formatted_msg}\n")
-            if parsed_content:
-                f.write(f"Parsed Content: {parsed_content}\n")
-            f.write("-" * 80 + "\n")
+        raw = message.toString()
+        formatted_msg = fix_codec.to_pipe(raw)
+
+        record = f"{timestamp} : {msg_type} : {formatted_msg}\n"
+        if parsed_content:
+            record += f"Parsed Content: {parsed_content}\n"
+        if self.annotate:
+            record += f"Fields: {fix_dictionary.load().annotate(raw)}\n"
+        record += "-" * 80 + "\n"
+
+        f = self._handles.get(log_file)
+        if f is None:
+            f = self._handles[log_file] = open(log_file, 'a')
+        f.write(record)
+        if flush:
+            f.flush()
+
+    def flush(self):
+        """Flush buffered message logs"""
+        for f in list(self._handles.values()):
+            f.flush()
+
+    def close(self):
+        """Flush and close message logs"""
+        handles, self._handles = self._handles, {}
+        for f in handles.values():
+            f.close()
 
     def log_event(self, event_type, details):
         """Log business events"""
@@ -104,8 +143,16 @@ class MessageLogger:
         except Exception as e:
             return {'error': str(e)}
 
+# Order states after which only OrderStatus reports may change a cached order
+TERMINAL_STATUSES = {fix.OrdStatus_FILLED, fix.OrdStatus_CANCELED, fix.OrdStatus_REJECTED,
+                     fix.OrdStatus_EXPIRED}
+
+# Sequential ids so that bulk submissions never reuse a ClOrdID
+_order_ids = itertools.count(random.randint(100000, 999999) * 1000)
+
+
 def gen_order_id():
-    return str(random.randint(100000, 999999))
+    return str(next(_order_ids))
 
 
 class Client(fix.Application):
@@ -114,7 +161,22 @@ class Client(fix.Application):
         self.session_id = None
         self.md_req_id = None
         self.last_heartbeat_time = None #set heartbt time
+        # Session ID -> last heartbeat time / last interval between heartbeats (seconds)
+        self.last_heartbeat_times = {}
+        self.heartbeat_intervals = {}
+        self.health = None  # optional SessionHealthMonitor
         self.logger = MessageLogger(self.__class__.__name__)
+        self._local = threading.local()
+        # Local order book: ClOrdID -> order, plus OrderID -> ClOrdID and
+        # cancel ClOrdID -> OrigClOrdID for requests still in flight
+        self.orders = {}
+        self.orders_by_order_id = {}
+        self.pending_cancels = {}
+        self.listeners = []
+        # Set while a session is logged on, so callers can wait for logon instead of sleeping
+        self.logged_on = threading.Event()
+        # Latest top of book per symbol, read by the GUI's conflated market data channel
+        self.market_data = MarketDataCache()
 
     def onCreate(self, session_id):
         self.session_id = session_id
@@ -123,15 +185,22 @@ class Client(fix.Application):
 
     def onLogon(self, session_id):
         self.session_id = session_id
+        if self.health:
+            self.health.on_logon(session_id)
         print(f"Logon - {session_id}")
         self.logger.log_session("Logon", f"Session ID: {session_id}")
         print("Client logged on and ready to send requests.")
+        self.logged_on.set()
 
     def onLogout(self, session_id):
+        self.logged_on.clear()
+        if self.health:
+            self.health.on_logout(session_id)
         self.logger.log_session("Logout", f"Session ID: {session_id}")
         print(f"Logout - {session_id}")
 
     def toAdmin(self, message, session_id):
+        metrics.count_message('client', 'out', message)
         parsed = self.logger.parse_message_content(message)
         self.logger.log_message("outgoing_admin", message, parsed)
         msgType = fix.MsgType()
@@ -139,10 +208,13 @@ class Client(fix.Application):
 
         if msgType.getValue() == fix.MsgType_Heartbeat:
             print("Sending Heartbeat")
+        if self.health:
+            self.health.on_outgoing_admin(msgType.getValue(), session_id)
 
         self.format_and_print_message("Sending admin", message)
 
     def fromAdmin(self, message, session_id):
+        metrics.count_message('client', 'in', message)
         parsed = self.logger.parse_message_content(message)
         self.logger.log_message("incoming_admin", message, parsed)
         msgType = fix.MsgType()
@@ -150,19 +222,44 @@ class Client(fix.Application):
 
         if msgType.getValue() == fix.MsgType_Heartbeat:
             current_time = datetime.now()
-            if self.last_heartbeat_time:
-                interval = (current_time - self.last_heartbeat_time).total_seconds()
+            session_key = session_id.toString()
+            last_heartbeat_time = self.last_heartbeat_times.get(session_key)
+            if last_heartbeat_time:
+                interval = (current_time - last_heartbeat_time).total_seconds()
                 print(f"Heartbeat received. Interval: {interval:.2f} seconds")
+                self.heartbeat_intervals[session_key] = interval
+            self.last_heartbeat_times[session_key] = current_time
             self.last_heartbeat_time = current_time
+        if self.health:
+            self.health.on_incoming_admin(message, msgType.getValue(), session_id)
 
         self.format_and_print_message("Received admin", message)
 
     def toApp(self, message, session_id):
+        metrics.count_message('client', 'out', message)
+        quiet = getattr(self._local, 'quiet', False)
         parsed = self.logger.parse_message_content(message)
-        self.logger.log_message("outgoing_app", message, parsed)
-        self.format_and_print_message("Sending app", message)
+        self.logger.log_message("outgoing_app", message, parsed, flush=not quiet)
+        if not quiet:
+            self.format_and_print_message("Sending app", message)
+
+    def trace_send(self, message, cl_ord_ids):
+        """Stamp requests just before they are sent; only called while the tracer is enabled"""
+        message.setField(TAG_CLIENT_SEND_TIME, str(time.time_ns()))
+        for cl_ord_id in cl_ord_ids:
+            tracer.stamp(cl_ord_id, 'client_send')
+
+    def trace_receive(self, message):
+        now = time.perf_counter_ns()
+        if message.isSetField(TAG_MM_SEND_TIME):
+            tracer.record('wire mm->client', time.time_ns() - int(message.getField(TAG_MM_SEND_TIME)))
+        tracer.stamp(self.get_field_value(message, fix.ClOrdID()), 'client_receive', now)
 
     def fromApp(self, message, session_id):
+        started = time.perf_counter_ns()
+        msg_type = metrics.count_message('client', 'in', message)
+        if tracer.enabled:
+            self.trace_receive(message)
         try:
             msgType = fix.MsgType()
             message.getHeader().getField(msgType)
@@ -186,16 +283,42 @@ class Client(fix.Application):
                 self.on_market_data(message)
             elif msgType.getValue() == fix.MsgType_ExecutionReport:
                 self.on_execution_report(message)
+            elif msgType.getValue() == fix.MsgType_OrderCancelReject:
+                self.on_order_cancel_reject(message)
+            elif msgType.getValue() == fix.MsgType_OrderMassCancelReport:
+                self.on_mass_cancel_report(message)
+            elif msgType.getValue() == fix.MsgType_BusinessMessageReject:
+                self.on_business_reject(message)
 
         except Exception as e:
             print(f" ")
 
         parsed = self.logger.parse_message_content(message)
         self.logger.log_message("incoming_app", message, parsed)
+        metrics.handler_latency.record(('client', msg_type), time.perf_counter_ns() - started)
 
     def log_business_event(self, event_type, details):
         self.logger.log_event(event_type, details)
 
+    def add_listener(self, callback):
+        """Register callback(kind, data) for application events.
+
+        kind is 'execution_report', 'cancel_reject', 'business_reject' or
+        'market_data' and data is a plain dict. Callbacks run on the QuickFIX
+        thread and must not block."""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def notify(self, kind, data):
+        for callback in self.listeners:
+            try:
+                callback(kind, data)
+            except Exception as e:
+                print(f"Error in {kind} listener: {e}")
+
     def on_execution_report(self, message):
         try:
             exec_type = fix.ExecType()
@@ -207,6 +330,9 @@ class Client(fix.Application):
 
             print(
                 f"Execution Report - ClOrdID: {cl_ord_id}, OrderID: {order_id}, Symbol: {symbol}, ExecType: {exec_type.getValue()}")
+            self.apply_execution_report(message)
+            if self.listeners:
+                self.notify('execution_report', self.parse_execution_report(message))
 
             # Handle different execution types
             if exec_type.getValue() == fix.ExecType_NEW:
@@ -215,26 +341,177 @@ class Client(fix.Application):
                 print("Order canceled")
             elif exec_type.getValue() == fix.ExecType_REJECTED:
                 print("Order rejected")
+            elif exec_type.getValue() == fix.ExecType_ORDER_STATUS and \
+                    self.get_field_value(message, fix.TotNumReports()) == "0":
+                print("Mass status: no orders match")
             # Add more execution type handlers as needed
 
         except Exception as e:
             print(f"Error processing execution report: {e}")
 
-    def format_and_print_message(self, prefix, message):
-        try:
-            # Special handling for market data messages
-            msgType = fix.MsgType()
-            message.getHeader().getField(msgType)
+    def parse_execution_report(self, message):
+        """Copy the order fields of an ExecutionReport into a dict"""
+        return {
+            'clOrdID': self.get_field_value(message, fix.ClOrdID()),
+            'origClOrdID': self.get_field_value(message, fix.OrigClOrdID()),
+            'orderID': self.get_field_value(message, fix.OrderID()),
+            'execType': self.get_field_value(message, fix.ExecType()),
+            'ordStatus': self.get_field_value(message, fix.OrdStatus()),
+            'symbol': self.get_field_value(message, fix.Symbol()),
+            'side': self.get_field_value(message, fix.Side()),
+            'leavesQty': self.get_field_value(message, fix.LeavesQty()),
+            'cumQty': self.get_field_value(message, fix.CumQty()),
+            'avgPx': self.get_field_value(message, fix.AvgPx()),
+            'text': self.get_field_value(message, fix.Text())
+        }
+
+    def track_order(self, cl_ord_id, side, symbol, quantity, order_type, price=None, stop_price=None):
+        """Add an order we are about to send to the local order book"""
+        self.orders[cl_ord_id] = {
+            'clOrdID': cl_ord_id,
+            'orderID': None,
+            'symbol': symbol,
+            'side': side,
+            'orderQty': float(quantity),
+            'ordType': order_type,
+            'price': float(price) if price else None,
+            'stopPx': float(stop_price) if stop_price else None,
+            'ordStatus': fix.OrdStatus_PENDING_NEW,
+            'leavesQty': float(quantity),
+            'cumQty': 0.0,
+            'avgPx': 0.0,
+            'text': ''
+        }
 
-            if msgType.getValue() in [fix.MsgType_MarketDataRequest, fix.MsgType_MarketDataSnapshotFullRefresh]:
-                formatted_message = message.toString().replace(chr(1), ' | ')
-                print(f"{prefix}: {formatted_message}")
-                return formatted_message
+    def get_order(self, cl_ord_id=None, order_id=None):
+        """Look up a cached order by ClOrdID or OrderID"""
+        if cl_ord_id is None:
+            cl_ord_id = self.orders_by_order_id.get(order_id)
+        return self.orders.get(cl_ord_id)
+
+    def _find_reported_order(self, message):
+        cl_ord_id = self.get_field_value(message, fix.ClOrdID())
+        cl_ord_id = self.pending_cancels.get(cl_ord_id, cl_ord_id)
+        order = self.orders.get(cl_ord_id)
+        if order is None:
+            order = self.orders.get(self.get_field_value(message, fix.OrigClOrdID()))
+        if order is None:
+            order = self.get_order(order_id=self.get_field_value(message, fix.OrderID()))
+        return cl_ord_id, order
+
+    def apply_execution_report(self, message):
+        """Update the local order book from an ExecutionReport"""
+        cl_ord_id, order = self._find_reported_order(message)
+        exec_type = self.get_field_value(message, fix.ExecType())
+        ord_status = self.get_field_value(message, fix.OrdStatus())
+
+        if order is None:
+            if not cl_ord_id:
+                return None
+            # Order placed before this process started, e.g. reported by a mass status request
+            self.track_order(cl_ord_id, self.get_field_value(message, fix.Side()),
+                             self.get_field_value(message, fix.Symbol()),
+                             self.get_field_value(message, fix.OrderQty()) or 0,
+                             self.get_field_value(message, fix.OrdType()) or fix.OrdType_MARKET)
+            order = self.orders[cl_ord_id]
+        elif order['ordStatus'] in TERMINAL_STATUSES and exec_type != fix.ExecType_ORDER_STATUS:
+            # Late report for an order that is already done
+            return order
+
+        if exec_type == fix.ExecType_REPLACED:
+            self.apply_replace(order, message)
+
+        order_id = self.get_field_value(message, fix.OrderID())
+        if order_id and order_id != "NONE":
+            order['orderID'] = order_id
+            self.orders_by_order_id[order_id] = order['clOrdID']
+        if ord_status:
+            order['ordStatus'] = ord_status
+        for key, field in (('leavesQty', fix.LeavesQty()), ('cumQty', fix.CumQty()), ('avgPx', fix.AvgPx())):
+            value = self.get_field_value(message, field)
+            if value:
+                order[key] = float(value)
+        order['text'] = self.get_field_value(message, fix.Text())
+
+        if order['ordStatus'] in TERMINAL_STATUSES:
+            for cancel_id, orig_id in list(self.pending_cancels.items()):
+                if orig_id == order['clOrdID']:
+                    del self.pending_cancels[cancel_id]
+        return order
+
+    def apply_replace(self, order, message):
+        """Move a replaced order to its new ClOrdID and take over the new quantity and price"""
+        new_id = self.get_field_value(message, fix.ClOrdID())
+        self.pending_cancels.pop(new_id, None)
+        order.pop('statusBeforeCancel', None)
+        if new_id and new_id != order['clOrdID']:
+            self.orders.pop(order['clOrdID'], None)
+            order['origClOrdID'] = order['clOrdID']
+            order['clOrdID'] = new_id
+            self.orders[new_id] = order
+        quantity = self.get_field_value(message, fix.OrderQty())
+        if quantity:
+            order['orderQty'] = float(quantity)
+        price = self.get_field_value(message, fix.Price())
+        if price:
+            order['price'] = float(price)
+
+    def on_order_cancel_reject(self, message):
+        cancel_id = self.get_field_value(message, fix.ClOrdID())
+        orig_id = self.pending_cancels.pop(cancel_id, None) or self.get_field_value(message, fix.OrigClOrdID())
+        reason = self.get_field_value(message, fix.CxlRejReason())
+        print(f"Cancel rejected - ClOrdID: {cancel_id}, OrigClOrdID: {orig_id}, Reason: {reason}")
+
+        order = self.orders.get(orig_id)
+        if order is not None and order['ordStatus'] in (fix.OrdStatus_PENDING_CANCEL, fix.OrdStatus_PENDING_REPLACE):
+            order['ordStatus'] = order.pop('statusBeforeCancel', fix.OrdStatus_NEW)
+            order['text'] = self.get_field_value(message, fix.Text())
+        if self.listeners:
+            self.notify('cancel_reject', {'clOrdID': cancel_id, 'origClOrdID': orig_id, 'reason': reason,
+                                          'text': self.get_field_value(message, fix.Text())})
+
+    def on_business_reject(self, message):
+        reject = {
+            'refMsgType': self.get_field_value(message, fix.RefMsgType()),
+            'refID': self.get_field_value(message, fix.BusinessRejectRefID()),
+            'reason': self.get_field_value(message, fix.BusinessRejectReason()),
+            'text': self.get_field_value(message, fix.Text())
+        }
+        print(f"Business reject - RefMsgType: {reject['refMsgType']}, RefID: {reject['refID']}, "
+              f"Reason: {reject['reason']}, Text: {reject['text']}")
+        if self.listeners:
+            self.notify('business_reject', reject)
+
+    def print_order_status(self, cl_ord_id):
+        """Print the cached state of an order; returns False if the order is unknown"""
+        order = self.orders.get(cl_ord_id)
+        if order is None:
+            return False
+        print(f"Order Status - ClOrdID: {order['clOrdID']}, OrderID: {order['orderID']}, "
+              f"Symbol: {order['symbol']}, Side: {'Buy' if order['side'] == fix.Side_BUY else 'Sell'}, "
+              f"OrdStatus: {order['ordStatus']}, Qty: {order['orderQty']}, LeavesQty: {order['leavesQty']}, "
+              f"CumQty: {order['cumQty']}, AvgPx: {order['avgPx']}")
+        return True
+
+    def on_mass_cancel_report(self, message):
+        try:
+            response = fix.MassCancelResponse()
+            message.getField(response)
+            cl_ord_id = self.get_field_value(message, fix.ClOrdID())
+            if response.getValue() == fix.MassCancelResponse_CANCEL_REQUEST_REJECTED:
+                reason = self.get_field_value(message, fix.MassCancelRejectReason())
+                print(f"Mass cancel {cl_ord_id} rejected. Reason: {reason}")
             else:
-                # Regular message formatting for non-market data messages
-                formatted_message = message.toString().replace(chr(1), ' | ')
-                print(f"{prefix}: {formatted_message}")
-                return formatted_message
+                affected = self.get_field_value(message, fix.TotalAffectedOrders())
+                print(f"Mass cancel {cl_ord_id} accepted. Orders affected: {affected}")
+        except Exception as e:
+            print(f"Error processing mass cancel report: {e}")
+
+    def format_and_print_message(self, prefix, message):
+        try:
+            formatted_message = fix_codec.to_pipe(message.toString())
+            print(f"{prefix}: {formatted_message}")
+            return formatted_message
         except Exception as e:
             print(f"Error formatting message: {e}")
             print(f"{prefix}: {message}")
@@ -276,8 +553,10 @@ class Client(fix.Application):
         except fix.FieldNotFound:
             return ''
 
-    def place_order(self, side, symbol, quantity, order_type, price=None, stop_price=None):
+    def place_order(self, side, symbol, quantity, order_type, price=None, stop_price=None, quiet=False,
+                    cl_ord_id=None):
         order_details = {
+            'clOrdID': cl_ord_id,
             'symbol': symbol,
             'side': side,
             'quantity': quantity,
@@ -285,26 +564,55 @@ class Client(fix.Application):
             'price': price,
             'stopPrice': stop_price
         }
-        return self.send_order(order_details)
+        if not quiet:
+            return self.send_order(order_details)
 
-    def send_order(self, order_details):
-        new_order = fix44.NewOrderSingle()
-        cl_ord_id = gen_order_id()
-        new_order.setField(fix.ClOrdID(cl_ord_id))
-        new_order.setField(fix.Symbol(order_details['symbol']))
-        new_order.setField(fix.Side(order_details['side']))
-        new_order.setField(fix.OrderQty(float(order_details['quantity'])))
-        new_order.setField(fix.OrdType(order_details['orderType']))
+        self._local.quiet = True
+        try:
+            return self.send_order(order_details, verbose=False)
+        finally:
+            self._local.quiet = False
+
+    def check_order(self, order_type, price=None, stop_price=None):
+        """Raise ValueError if the order type needs a price or stop price that is missing"""
+        if order_type in (fix.OrdType_LIMIT, fix.OrdType_STOP_LIMIT) and price is None:
+            raise ValueError(f"OrdType {order_type} order requires a price")
+        if order_type in (fix.OrdType_STOP, fix.OrdType_STOP_LIMIT) and stop_price is None:
+            raise ValueError(f"OrdType {order_type} order requires a stop price")
+
+    def build_order(self, target, cl_ord_id, side, symbol, quantity, order_type, price=None, stop_price=None):
+        """Set the order fields on a NewOrderSingle or a NewOrderList NoOrders entry"""
+        self.check_order(order_type, price, stop_price)
+        target.setField(fix.ClOrdID(cl_ord_id))
+        target.setField(fix.Symbol(symbol))
+        target.setField(fix.Side(side))
+        target.setField(fix.OrderQty(float(quantity)))
+        target.setField(fix.OrdType(order_type))
+
+        if order_type != fix.OrdType_MARKET and price is not None:
+            target.setField(fix.Price(float(price)))
+
+        if order_type in [fix.OrdType_STOP, fix.OrdType_STOP_LIMIT]:
+            target.setField(fix.StopPx(float(stop_price)))
+        return target
+
+    def send_order(self, order_details, verbose=True):
+        cl_ord_id = order_details.get('clOrdID') or gen_order_id()
+        new_order = self.build_order(fix44.NewOrderSingle(), cl_ord_id, order_details['side'],
+                                     order_details['symbol'], order_details['quantity'],
+                                     order_details['orderType'], order_details['price'],
+                                     order_details['stopPrice'])
         new_order.setField(fix.TransactTime())
 
-        if order_details['orderType'] != fix.OrdType_MARKET:
-            new_order.setField(fix.Price(float(order_details['price'])))
-
-        if order_details['orderType'] in [fix.OrdType_STOP, fix.OrdType_STOP_LIMIT]:
-            new_order.setField(fix.StopPx(float(order_details['stopPrice'])))
-
         try:
+            self.track_order(cl_ord_id, order_details['side'], order_details['symbol'],
+                             order_details['quantity'], order_details['orderType'],
+                             order_details['price'], order_details['stopPrice'])
+            if tracer.enabled:
+                self.trace_send(new_order, [cl_ord_id])
             fix.Session.sendToTarget(new_order, self.session_id)
+            if not verbose:
+                return cl_ord_id
             print(f"Order Acknowledgement:")
             print(f"ClOrdID: {cl_ord_id}")
             print(f"Symbol: {order_details['symbol']}")
@@ -317,9 +625,77 @@ class Client(fix.Application):
                 print(f"Stop Price: {order_details['stopPrice']}")
             return cl_ord_id
         except fix.RuntimeError as e:
+            self.orders.pop(cl_ord_id, None)
             print(f"Error sending order: {e}")
             return None
 
+    def place_orders(self, orders, as_list=False, list_size=500, cl_ord_ids=None):
+        """Submit many orders at once and return their ClOrdIDs in submission order.
+
+        Each order is a dict using the place_order keyword names or a tuple
+        (side, symbol, quantity, order_type[, price[, stop_price]]). Orders go out
+        as individual NewOrderSingles, or with as_list=True as NewOrderList (35=E)
+        fragments of up to list_size orders sharing one ListID. cl_ord_ids, one per
+        order, are used instead of fresh ClOrdIDs. Nothing is printed per order."""
+        orders = [order if isinstance(order, dict) else dict(zip(
+            ('side', 'symbol', 'quantity', 'order_type', 'price', 'stop_price'), order)) for order in orders]
+        # Checked up front, so a bad order fails the batch before any of it is sent
+        for order in orders:
+            self.check_order(order['order_type'], order.get('price'), order.get('stop_price'))
+        cl_ord_ids = list(cl_ord_ids) if cl_ord_ids is not None else [gen_order_id() for _ in orders]
+        if len(cl_ord_ids) != len(orders):
+            raise ValueError(f"{len(cl_ord_ids)} ClOrdIDs for {len(orders)} orders")
+        sent = 0
+
+        self._local.quiet = True
+        try:
+            if as_list:
+                list_id = gen_order_id()
+                # Counted per fragment, so a failure keeps the fragments already sent
+                for start in range(0, len(orders), list_size):
+                    sent += self._send_list_fragment(list_id, orders, cl_ord_ids, start, list_size)
+            else:
+                for cl_ord_id, order in zip(cl_ord_ids, orders):
+                    new_order = self.build_order(fix44.NewOrderSingle(), cl_ord_id, **order)
+                    new_order.setField(fix.TransactTime())
+                    self.track_order(cl_ord_id, **order)
+                    if tracer.enabled:
+                        self.trace_send(new_order, [cl_ord_id])
+                    fix.Session.sendToTarget(new_order, self.session_id)
+                    sent += 1
+        except fix.RuntimeError as e:
+            print(f"Error sending order batch after {sent} orders: {e}")
+        finally:
+            self._local.quiet = False
+            self.logger.flush()
+            for cl_ord_id in cl_ord_ids[sent:]:
+                self.orders.pop(cl_ord_id, None)
+
+        print(f"Order batch sent: {sent}/{len(orders)} orders"
+              f"{' as NewOrderList' if as_list else ''}")
+        return cl_ord_ids[:sent]
+
+    def _send_list_fragment(self, list_id, orders, cl_ord_ids, start, list_size):
+        """Send orders[start:start + list_size] as one NewOrderList fragment; returns how many it carried"""
+        total = len(orders)
+        order_list = fix44.NewOrderList()
+        order_list.setField(fix.ListID(list_id))
+        order_list.setField(fix.BidType(fix.BidType_NO_BIDDING_PROCESS))
+        order_list.setField(fix.TotNoOrders(total))
+        order_list.setField(fix.LastFragment(start + list_size >= total))
+
+        chunk = orders[start:start + list_size]
+        for seq_no, (cl_ord_id, order) in enumerate(zip(cl_ord_ids[start:], chunk), start + 1):
+            group = self.build_order(fix44.NewOrderList.NoOrders(), cl_ord_id, **order)
+            group.setField(fix.ListSeqNo(seq_no))
+            order_list.addGroup(group)
+            self.track_order(cl_ord_id, **order)
+
+        if tracer.enabled:
+            self.trace_send(order_list, cl_ord_ids[start:start + len(chunk)])
+        fix.Session.sendToTarget(order_list, self.session_id)
+        return len(chunk)
+
     def subscribe_market_data(self, symbol="USD/BRL"):
         self.md_req_id = gen_order_id()
         request = fix44.MarketDataRequest()
@@ -342,10 +718,43 @@ class Client(fix.Application):
         formatted_msg = self.format_and_print_message("Sending MarketDataRequest", request)
         fix.Session.sendToTarget(request, self.session_id)
 
+    def parse_market_data(self, message):
+        """Top of book from a MarketDataSnapshotFullRefresh as a dict"""
+        snapshot = {
+            'symbol': self.get_field_value(message, fix.Symbol()),
+            'mdReqID': self.get_field_value(message, fix.MDReqID()),
+            'bid': None,
+            'bidSize': None,
+            'offer': None,
+            'offerSize': None
+        }
+        no_md_entries = fix.NoMDEntries()
+        if not message.isSetField(no_md_entries):
+            return snapshot
+        message.getField(no_md_entries)
+
+        group = fix44.MarketDataSnapshotFullRefresh().NoMDEntries()
+        for i in range(no_md_entries.getValue()):
+            message.getGroup(i + 1, group)
+            entry_type = self.get_field_value(group, fix.MDEntryType())
+            price = self.get_field_value(group, fix.MDEntryPx())
+            size = self.get_field_value(group, fix.MDEntrySize())
+            if entry_type == fix.MDEntryType_BID:
+                snapshot['bid'] = float(price) if price else None
+                snapshot['bidSize'] = float(size) if size else None
+            elif entry_type == fix.MDEntryType_OFFER:
+                snapshot['offer'] = float(price) if price else None
+                snapshot['offerSize'] = float(size) if size else None
+        return snapshot
+
     def on_market_data(self, message):
+        snapshot = self.parse_market_data(message)
+        self.market_data.update(snapshot)
+        if self.listeners:
+            self.notify('market_data', snapshot)
         try:
             # Format the message with delimiters first
-            formatted_message = message.toString().replace(chr(1), ' | ')
+            formatted_message = fix_codec.to_pipe(message.toString())
             print(f"Market Data Message: {formatted_message}")
 
             # Keep existing processing intact
@@ -402,73 +811,156 @@ class Client(fix.Application):
             fix.Session.sendToTarget(msg, self.session_id)
             self.md_req_id = None
 
-    def cancel_order(self, orig_cl_ord_id, symbol, side):
+    def order_scope(self, cl_ord_id, symbol=None, side=None):
+        """Fill in symbol and side for a request from the local order book"""
+        order = self.orders.get(cl_ord_id)
+        if order is not None:
+            symbol = symbol or order['symbol']
+            side = side or order['side']
+        return symbol or 'USD/BRL', side or fix.Side_BUY
+
+    def cancel_order(self, orig_cl_ord_id, symbol=None, side=None):
+        symbol, side = self.order_scope(orig_cl_ord_id, symbol, side)
+        cancel_id = gen_order_id()
         cancel = fix44.OrderCancelRequest()
         cancel.setField(fix.OrigClOrdID(orig_cl_ord_id))
-        cancel.setField(fix.ClOrdID(gen_order_id()))
+        cancel.setField(fix.ClOrdID(cancel_id))
         cancel.setField(fix.Symbol(symbol))
         cancel.setField(fix.Side(side))
         cancel.setField(fix.TransactTime())
 
+        order = self.orders.get(orig_cl_ord_id)
+        if order is not None and order['ordStatus'] not in TERMINAL_STATUSES:
+            order['statusBeforeCancel'] = order['ordStatus']
+            order['ordStatus'] = fix.OrdStatus_PENDING_CANCEL
+        self.pending_cancels[cancel_id] = orig_cl_ord_id
+        if tracer.enabled:
+            self.trace_send(cancel, [cancel_id])
         fix.Session.sendToTarget(cancel, self.session_id)
-
-    def order_status_request(self, cl_ord_id, symbol, side):
+        return cancel_id
+
+    def replace_order(self, orig_cl_ord_id, quantity, price=None, symbol=None, side=None):
+        """Change the quantity, and optionally the price, of a working order"""
+        symbol, side = self.order_scope(orig_cl_ord_id, symbol, side)
+        order = self.orders.get(orig_cl_ord_id) or {}
+        replace_id = gen_order_id()
+        replace = fix44.OrderCancelReplaceRequest()
+        replace.setField(fix.OrigClOrdID(orig_cl_ord_id))
+        replace.setField(fix.ClOrdID(replace_id))
+        replace.setField(fix.Symbol(symbol))
+        replace.setField(fix.Side(side))
+        replace.setField(fix.OrderQty(float(quantity)))
+        replace.setField(fix.OrdType(order.get('ordType') or (fix.OrdType_LIMIT if price else fix.OrdType_MARKET)))
+        price = price or order.get('price')
+        if price:
+            replace.setField(fix.Price(float(price)))
+        if order.get('stopPx'):
+            replace.setField(fix.StopPx(order['stopPx']))
+        replace.setField(fix.TransactTime())
+
+        if order and order['ordStatus'] not in TERMINAL_STATUSES:
+            order['statusBeforeCancel'] = order['ordStatus']
+            order['ordStatus'] = fix.OrdStatus_PENDING_REPLACE
+        # Replaces share the cancel bookkeeping: reports and rejects map back to the original order
+        self.pending_cancels[replace_id] = orig_cl_ord_id
+        if tracer.enabled:
+            self.trace_send(replace, [replace_id])
+        fix.Session.sendToTarget(replace, self.session_id)
+        return replace_id
+
+    def order_status_request(self, cl_ord_id, symbol=None, side=None):
+        symbol, side = self.order_scope(cl_ord_id, symbol, side)
         status = fix44.OrderStatusRequest()
         status.setField(fix.ClOrdID(cl_ord_id))
         status.setField(fix.Symbol(symbol))
         status.setField(fix.Side(side))
 
+        if tracer.enabled:
+            self.trace_send(status, [cl_ord_id])
         fix.Session.sendToTarget(status, self.session_id)
 
+    def cancel_all_orders(self, symbol=None, side=None):
+        """Cancel every working order, optionally only for one symbol and/or side"""
+        request = fix44.OrderMassCancelRequest()
+        cl_ord_id = gen_order_id()
+        request.setField(fix.ClOrdID(cl_ord_id))
+        if symbol:
+            request.setField(fix.MassCancelRequestType(fix.MassCancelRequestType_CANCEL_ORDERS_FOR_A_SECURITY))
+            request.setField(fix.Symbol(symbol))
+        else:
+            request.setField(fix.MassCancelRequestType(fix.MassCancelRequestType_CANCEL_ALL_ORDERS))
+        if side:
+            request.setField(fix.Side(side))
+        request.setField(fix.TransactTime())
+
+        fix.Session.sendToTarget(request, self.session_id)
+        return cl_ord_id
+
+    def order_mass_status_request(self, symbol=None, side=None):
+        """Request the status of every working order, optionally only for one symbol and/or side"""
+        request = fix44.OrderMassStatusRequest()
+        mass_status_req_id = gen_order_id()
+        request.setField(fix.MassStatusReqID(mass_status_req_id))
+        if symbol:
+            request.setField(fix.MassStatusReqType(fix.MassStatusReqType_STATUS_FOR_ORDERS_FOR_A_SECURITY))
+            request.setField(fix.Symbol(symbol))
+        else:
+            request.setField(fix.MassStatusReqType(fix.MassStatusReqType_STATUS_FOR_ALL_ORDERS))
+        if side:
+            request.setField(fix.Side(side))
+
+        fix.Session.sendToTarget(request, self.session_id)
+        return mass_status_req_id
+
+    def execute(self, command, quiet=False):
+        """Carry out a command dict from commands.parse(); returns the ID of the request sent, if any.
+
+        quiet leaves the requests sent and the cached order status off the console, as for place_order"""
+        if not quiet:
+            return self._execute(command, quiet)
+        self._local.quiet = True
+        try:
+            return self._execute(command, quiet)
+        finally:
+            self._local.quiet = False
+
+    def _execute(self, command, quiet):
+        action = command['action']
+        if action == 'order':
+            return self.place_order(command['side'], command['symbol'], command['quantity'], command['orderType'],
+                                    command['price'], command['stopPrice'], quiet=quiet)
+        if action == 'cancel':
+            return self.cancel_order(command['clOrdID'])
+        if action == 'replace':
+            return self.replace_order(command['clOrdID'], command['quantity'], command['price'])
+        if action == 'status':
+            # Answer from the local order book; ask the market maker only for unknown orders
+            known = command['clOrdID'] in self.orders if quiet else self.print_order_status(command['clOrdID'])
+            if not known:
+                self.order_status_request(command['clOrdID'])
+            return command['clOrdID']
+        if action == 'cancel_all':
+            return self.cancel_all_orders(command['symbol'], command['side'])
+        if action == 'status_all':
+            return self.order_mass_status_request(command['symbol'], command['side'])
+        if action == 'subscribe':
+            self.subscribe_market_data(command['symbol'])
+            return self.md_req_id
+        if action == 'unsubscribe':
+            self.cancel_market_data()
+        return None
+
     def process_command(self, command: str):
         """Process commands received from the UI"""
         try:
-            parts = command.split()
-            action = parts[0].lower()
-
-            if action in ["buy", "sell"]:
-                if len(parts) >= 3:
-                    symbol = parts[1]
-                    quantity = parts[2]
-                    order_type = fix.OrdType_MARKET
-                    price = None
-                    stop_price = None
-
-                    if len(parts) > 3:
-                        order_type_str = parts[3].lower()
-                        if order_type_str == "limit":
-                            order_type = fix.OrdType_LIMIT
-                            price = parts[4] if len(parts) > 4 else None
-                        elif order_type_str == "stop":
-                            order_type = fix.OrdType_STOP
-                            stop_price = parts[4] if len(parts) > 4 else None
-                        elif order_type_str == "stop_limit":
-                            order_type = fix.OrdType_STOP_LIMIT
-                            stop_price = parts[4] if len(parts) > 4 else None
-                            price = parts[5] if len(parts) > 5 else None
-
-                    side = fix.Side_BUY if action == "buy" else fix.Side_SELL
-                    self.place_order(side, symbol, quantity, order_type, price, stop_price)
-
-            elif action == "subscribe":
-                symbol = parts[1] if len(parts) > 1 else 'USD/BRL'
-                self.subscribe_market_data(symbol)
-            elif action == "unsubscribe":
-                self.cancel_market_data()
-            elif action == "cancel":
-                if len(parts) >= 2:
-                    orig_cl_ord_id = parts[1]
-                    symbol = 'USD/BRL'
-                    side = fix.Side_BUY
-                    self.cancel_order(orig_cl_ord_id, symbol, side)
-            elif action == "status":
-                if len(parts) >= 2:
-                    cl_ord_id = parts[1]
-                    symbol = 'USD/BRL'
-                    side = fix.Side_BUY
-                    self.order_status_request(cl_ord_id, symbol, side)
+            command = commands.parse(command)
+            missing = commands.missing(command)
+            if missing:
+                raise commands.CommandError(f"Order is missing {', '.join(missing)}")
+            self.execute(command)
         except Exception as e:
             print(f"Error processing command: {e}")
+
 def parse_input(input_string):
     parts = input_string.split()
     action = parts[0]
@@ -483,15 +975,19 @@ def parse_input(input_string):
             tags[tag] = value
     return action, tags
 
+PRICE_PROMPTS = {'price': "Enter limit price: ", 'stopPrice': "Enter stop price: "}
+
+
 def main():
     try:
-        settings = fix.SessionSettings("client.cfg")
+        store_factory, settings = message_store.store_factory(fix.SessionSettings("client.cfg"))
         application = Client()
-        store_factory = fix.FileStoreFactory(settings)
         log_factory = fix.ScreenLogFactory(settings)
         initiator = fix.SocketInitiator(application, store_factory, settings, log_factory)
+        application.health = SessionHealthMonitor("CLIENT", test_request_interval(settings))
 
         initiator.start()
+        application.health.start()
 
         print("FIX Client has started...")
         print("Enter commands in the following format:")
@@ -505,6 +1001,9 @@ def main():
         print("Other commands: subscribe, unsubscribe, cancel, status, quit")
         print("For status: status [ClOrdID]")
         print("For cancel order: cancel [OrigClOrdID]")
+        print("For all orders: cancel all / status all [symbol] [buy|sell]")
+        print("For replace order: replace [OrigClOrdID] quantity [price]")
+        print("To play a blotter: play [file.csv|file.jsonl] [orders per second]")
 
         while True:
             try:
@@ -514,65 +1013,39 @@ def main():
                     break
 
                 parts = user_input.split()
-                action = parts[0].lower()
-
-                if action in ["buy", "sell"]:
-                    if len(parts) < 3:
-                        print(
-                            "Invalid order command. Use format: buy/sell symbol quantity [order_type] [price] [stop_price]")
-                        continue
-
-                    symbol = parts[1]
-                    quantity = parts[2]
-                    order_type = fix.OrdType_MARKET
-                    price = None
-                    stop_price = None
-
-                    if len(parts) > 3:
-                        order_type_str = parts[3].lower()
-                        if order_type_str == "limit":
-                            order_type = fix.OrdType_LIMIT
-                            price = parts[4] if len(parts) > 4 else input("Enter limit price: ")
-                        elif order_type_str == "stop":
-                            order_type = fix.OrdType_STOP
-                            stop_price = parts[4] if len(parts) > 4 else input("Enter stop price: ")
-                        elif order_type_str == "stop_limit":
-                            order_type = fix.OrdType_STOP_LIMIT
-                            stop_price = parts[4] if len(parts) > 4 else input("Enter stop price: ")
-                            price = parts[5] if len(parts) > 5 else input("Enter limit price: ")
-                        elif order_type_str != "market":
-                            print("Invalid order type. Using market order.")
-
-                    side = fix.Side_BUY if action == "buy" else fix.Side_SELL
-
-                    cl_ord_id = application.place_order(side, symbol, quantity, order_type, price, stop_price)
-                    if cl_ord_id:
-                        print(f"{action.capitalize()} order placed. ClOrdID: {cl_ord_id}")
-                    else:
-                        print("Failed to place order.")
-                elif action == "subscribe":
-                    symbol = parts[1] if len(parts) > 1 else 'USD/BRL'
-                    application.subscribe_market_data(symbol)
-                elif action == "unsubscribe":
-                    application.cancel_market_data()
-                elif action == "cancel":
+                if not parts:
+                    continue
+                if parts[0].lower() == 'play':
                     if len(parts) < 2:
-                        print("Invalid cancel command. Use format: cancel [OrigClOrdID]")
+                        print("Invalid play command. Use format: play [file.csv|file.jsonl] [orders per second]")
                     else:
-                        orig_cl_ord_id = parts[1]
-                        symbol = 'USD/BRL'  # Default symbol
-                        side = fix.Side_BUY  # Default side
-                        application.cancel_order(orig_cl_ord_id, symbol, side)
-                elif action == "status":
-                    if len(parts) < 2:
-                        print("Invalid status command. Use format: status [ClOrdID]")
+                        Playback(application, rate=float(parts[2]) if len(parts) > 2 else None).play(parts[1])
+                    continue
+
+                try:
+                    command = commands.parse(user_input)
+                except commands.CommandError as e:
+                    print(e)
+                    continue
+                if command.get('warning'):
+                    print(command['warning'])
+                for name in commands.missing(command):
+                    command[name] = input(PRICE_PROMPTS[name])
+
+                request_id = application.execute(command)
+                action = command['action']
+                if action == 'order':
+                    word = 'buy' if command['side'] == fix.Side_BUY else 'sell'
+                    if request_id:
+                        print(f"{word.capitalize()} order placed. ClOrdID: {request_id}")
                     else:
-                        cl_ord_id = parts[1]
-                        symbol = 'USD/BRL'
-                        side = fix.Side_BUY
-                        application.order_status_request(cl_ord_id, symbol, side)
-                else:
-                    print("Invalid action. Please try again.")
+                        print("Failed to place order.")
+                elif action == 'cancel_all':
+                    print(f"Mass cancel sent. ClOrdID: {request_id}")
+                elif action == 'status_all':
+                    print(f"Mass status request sent. MassStatusReqID: {request_id}")
+                elif action == 'replace':
+                    print(f"Replace sent. ClOrdID: {request_id}")
             except Exception as e:
                 print(f" ")
 
@@ -586,6 +1059,8 @@ def main():
     except KeyboardInterrupt:
         print("FIX client interrupted by user.")
     finally:
+        if tracer.enabled:
+            tracer.dump()
         print("Exiting FIX client.")
 
 if __name__ == "__main__":
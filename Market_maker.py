@@ -2,18 +2,31 @@ import sys
 import quickfix as fix
 import quickfix44 as fix44
 import random
+import itertools
 import threading
 import time
-from datetime import datetime
 import asyncio
 import os
-from datetime import datetime
+import metrics
+import message_store
+import fix_codec
+import fix_dictionary
+from latency import tracer, sending_time_ns, TAG_CLIENT_SEND_TIME, TAG_MM_SEND_TIME
+from session_health import SessionHealthMonitor, test_request_interval
+from tick_store import TickStore
+from drop_copy import DropCopyPublisher, drop_copy_sessions
+from sim_clock import WallClock, fix_timestamp
 
 
 class MessageLogger:
-    def __init__(self, name):
+    # FIX_LOG_ANNOTATE=1 adds a line with field and enum names under every logged message
+    annotate = os.environ.get('FIX_LOG_ANNOTATE') == '1'
+
+    def __init__(self, name, clock=None):
         self.name = name
+        self.clock = clock or WallClock()
         self.log_dir = f"logs/{name.lower()}"
+        self._handles = {}
         self.ensure_log_directories()
 
     def ensure_log_directories(self):
@@ -24,29 +37,52 @@ class MessageLogger:
 
     def log_session(self, event_type, details):
         """Log session events"""
-        timestamp = datetime.now().strftime('%Y%m%d-%H:%M:%S.%f')
+        timestamp = self.clock.now().strftime('%Y%m%d-%H:%M:%S.%f')
         log_file = f"{self.log_dir}/session/sessions.log"
 
         with open(log_file, 'a') as f:
             f.write(f"{timestamp} : {event_type} : {details}\n")
 
-    def log_message(self, direction, message, parsed_content=None):
-        """Log FIX messages with parsed content"""
-        timestamp = datetime.now().strftime('%Y%m%d-%H:%M:%S.%f')
+    def log_message(self, direction, message, parsed_content=None, flush=True):
+        """Log FIX messages with parsed content
+
+        Message logs keep their file open; pass flush=False while sending a batch
+        and call flush() once at the end."""
+        timestamp = self.clock.now().strftime('%Y%m%d-%H:%M:%S.%f')
         log_file = f"{self.log_dir}/messages/{direction}.log"
 
         msg_type = self.get_message_type(message)
-        formatted_msg = message.toString().replace(chr(1), ' | ')
-
-        with open(log_file, 'a') as f:
-            f.write(f"{timestamp} : {msg_type} : {formatted_msg}\n")
-            if parsed_content:
-                f.write(f"Parsed Content: {parsed_content}\n")
-            f.write("-" * 80 + "\n")
+        raw = message.toString()
+        formatted_msg = fix_codec.to_pipe(raw)
+
+        record = f"{timestamp} : {msg_type} : {formatted_msg}\n"
+        if parsed_content:
+            record += f"Parsed Content: {parsed_content}\n"
+        if self.annotate:
+            record += f"Fields: {fix_dictionary.load().annotate(raw)}\n"
+        record += "-" * 80 + "\n"
+
+        f = self._handles.get(log_file)
+        if f is None:
+            f = self._handles[log_file] = open(log_file, 'a')
+        f.write(record)
+        if flush:
+            f.flush()
+
+    def flush(self):
+        """Flush buffered message logs"""
+        for f in list(self._handles.values()):
+            f.flush()
+
+    def close(self):
+        """Flush and close message logs"""
+        handles, self._handles = self._handles, {}
+        for f in handles.values():
+            f.close()
 
     def log_event(self, event_type, details):
         """Log business events"""
-        timestamp = datetime.now().strftime('%Y%m%d-%H:%M:%S.%f')
+        timestamp = self.clock.now().strftime('%Y%m%d-%H:%M:%S.%f')
         log_file = f"{self.log_dir}/events/events.log"
 
         with open(log_file, 'a') as f:
@@ -102,42 +138,81 @@ class MessageLogger:
 class CustomApplication:
     def format_and_print_message(self, prefix, message):
         try:
-            formatted_message = message.toString().replace(chr(1), ' | ')
+            formatted_message = fix_codec.to_pipe(message.toString())
             print(f"{prefix}: {formatted_message}")
         except Exception as e:
             print(f"Error formatting message: {e}")
             print(f"{prefix}: {message}")
 
-def gen_order_id():
-    return str(random.randint(1000, 9999))
+# Seconds between price updates, and the pause after each market data snapshot
+PRICE_INTERVAL = 6
+MARKET_DATA_PAUSE = 10
 
 class MarketMaker(fix.Application, CustomApplication):
-    def __init__(self):
+    def __init__(self, clock=None, rng=None):
         super().__init__()
-        self.logger = MessageLogger(self.__class__.__name__)
+        # All timestamps, timers, prices and ids come from these; see sim_clock.py
+        self.clock = clock or WallClock()
+        self.rng = rng or random.Random()
+        # Sequential ids so that thousands of resting orders never collide in self.orders
+        self._order_ids = itertools.count(self.rng.randint(1000, 9999) * 1000)
+        self.logger = MessageLogger(self.__class__.__name__, self.clock)
+        # The first trading session created (CLIENT in Server.cfg); load generator
+        # and drop copy sessions never replace it
         self.session_id = None
         self.symbol_value = "USD/BRL"
-        self.prices = {self.symbol_value: random.uniform(4.5, 5.5)}
+        self.prices = {self.symbol_value: self.rng.uniform(4.5, 5.5)}
         self.subscriptions = set()
+        # MDReqID -> the session that subscribed, which receives its updates
+        self.subscriber_sessions = {}
         self.orders = {}
+        # Secondary indexes over self.orders (OrderID keyed) for O(1) lookups
+        self.orders_by_clordid = {}
+        self.orders_by_session = {}
+        self.orders_by_symbol = {}
+        self.orders_by_side = {}
         self.last_heartbeat_time = None
+        # Session ID -> last heartbeat time / last interval between heartbeats (seconds)
+        self.last_heartbeat_times = {}
+        self.heartbeat_intervals = {}
+        self.health = None  # optional SessionHealthMonitor
         self.is_running = True
         self.is_paused = False
+        self._local = threading.local()
+        # Set once any counterparty has logged on
+        self.logged_on = threading.Event()
+        # History of every quote update_prices publishes
+        self.ticks = TickStore()
+        # Every ExecutionReport sent, for downstream risk and booking; see drop_copy.py
+        self.drop_copy = DropCopyPublisher(send=self.send_drop_copies)
+
+    def is_drop_copy(self, session_id):
+        return self.drop_copy is not None and self.drop_copy.is_drop_copy(session_id)
+
     def onCreate(self, session_id):
-        self.session_id = session_id
+        if self.session_id is None and not self.is_drop_copy(session_id):
+            self.session_id = session_id
         self.logger.log_session("Created", f"Session ID: {session_id}")
         print(f"Session created - {session_id}")
 
     def onLogon(self, session_id):
-        self.session_id = session_id
+        if self.health:
+            self.health.on_logon(session_id)
         print(f"Logon - {session_id}")
+        if self.is_drop_copy(session_id):
+            print("Drop copy consumer logged on.")
+            return
         print("Market Maker logged on and ready to receive requests.")
+        self.logged_on.set()
 
     def onLogout(self, session_id):
+        if self.health:
+            self.health.on_logout(session_id)
         self.logger.log_session("Logon", f"Session ID: {session_id}")
         print(f"Logout - {session_id}")
 
     def toAdmin(self, message, session_id):
+        metrics.count_message('market_maker', 'out', message)
         parsed = self.logger.parse_message_content(message)
         self.logger.log_message("outgoing_admin", message, parsed)
         msgType = fix.MsgType()
@@ -145,35 +220,75 @@ class MarketMaker(fix.Application, CustomApplication):
 
         if msgType.getValue() == fix.MsgType_Heartbeat:
             print("Sending Heartbeat")
+        if self.health:
+            self.health.on_outgoing_admin(msgType.getValue(), session_id)
 
         self.format_and_print_message("Sending admin", message)
 
     def fromAdmin(self, message, session_id):
+        metrics.count_message('market_maker', 'in', message)
         parsed = self.logger.parse_message_content(message)
         self.logger.log_message("incoming_admin", message, parsed)
         msgType = fix.MsgType()
         message.getHeader().getField(msgType)
 
         if msgType.getValue() == fix.MsgType_Heartbeat:
-            current_time = datetime.now()
-            if self.last_heartbeat_time:
-                interval = (current_time - self.last_heartbeat_time).total_seconds()
+            current_time = self.clock.now()
+            session_key = session_id.toString()
+            last_heartbeat_time = self.last_heartbeat_times.get(session_key)
+            if last_heartbeat_time:
+                interval = (current_time - last_heartbeat_time).total_seconds()
                 print(f"Heartbeat received. Interval: {interval:.2f} seconds")
+                self.heartbeat_intervals[session_key] = interval
+            self.last_heartbeat_times[session_key] = current_time
             self.last_heartbeat_time = current_time
+        if self.health:
+            self.health.on_incoming_admin(message, msgType.getValue(), session_id)
 
         self.format_and_print_message("Received admin", message)
 
     def toApp(self, message, session_id):
+        metrics.count_message('market_maker', 'out', message)
+        quiet = getattr(self._local, 'quiet', False)
         parsed = self.logger.parse_message_content(message)
-        self.logger.log_message("outgoing_app", message, parsed)
-        self.format_and_print_message("Sending app", message)
-
+        self.logger.log_message("outgoing_app", message, parsed, flush=not quiet)
+        if not quiet:
+            self.format_and_print_message("Sending app", message)
+        if tracer.enabled:
+            message.setField(TAG_MM_SEND_TIME, str(time.time_ns()))
+            tracer.stamp(self.get_optional_field(message, fix.ClOrdID()), 'mm_sent')
+
+    def trace_received(self, message):
+        """Stamp arrival of a request and record the client -> market maker wire leg"""
+        now = time.perf_counter_ns()
+        wall_now = time.time_ns()
+        trace_key = self.get_optional_field(message, fix.ClOrdID())
+        tracer.stamp(trace_key, 'mm_received', now)
+        if message.isSetField(TAG_CLIENT_SEND_TIME):
+            tracer.record('wire client->mm', wall_now - int(message.getField(TAG_CLIENT_SEND_TIME)))
+        else:
+            sending_time = fix.SendingTime()
+            if message.getHeader().isSetField(sending_time):
+                message.getHeader().getField(sending_time)
+                tracer.record('wire client->mm (SendingTime)', wall_now - sending_time_ns(sending_time.getString()))
+        return trace_key
 
     def fromApp(self, message, session_id):
+        started = time.perf_counter_ns()
+        msg_type = metrics.count_message('market_maker', 'in', message)
+        trace_key = self.trace_received(message) if tracer.enabled else None
         try:
             parsed = self.logger.parse_message_content(message)
             self.logger.log_message("incoming_app", message, parsed)
+            if trace_key:
+                tracer.stamp(trace_key, 'mm_logged')
             self.format_and_print_message("Received raw app message", message)
+            if trace_key:
+                tracer.stamp(trace_key, 'mm_printed')
+
+            if self.is_drop_copy(session_id):
+                print(f"Ignoring application message from drop copy session {session_id}")
+                return
 
             msgType = fix.MsgType()
             if message.getHeader().isSetField(msgType):
@@ -184,12 +299,20 @@ class MarketMaker(fix.Application, CustomApplication):
 
             if msgType.getValue() == fix.MsgType_NewOrderSingle:
                 self.handle_new_order(message, session_id)
+            elif msgType.getValue() == fix.MsgType_NewOrderList:
+                self.handle_new_order_list(message, session_id)
             elif msgType.getValue() == fix.MsgType_OrderCancelRequest:
                 self.handle_cancel_request(message, session_id)
+            elif msgType.getValue() == fix.MsgType_OrderCancelReplaceRequest:
+                self.handle_replace_request(message, session_id)
             elif msgType.getValue() == fix.MsgType_MarketDataRequest:
                 self.handle_market_data_request(message, session_id)
             elif msgType.getValue() == fix.MsgType_OrderStatusRequest:
                 self.handle_order_status_request(message, session_id)
+            elif msgType.getValue() == fix.MsgType_OrderMassCancelRequest:
+                self.handle_mass_cancel_request(message, session_id)
+            elif msgType.getValue() == fix.MsgType_OrderMassStatusRequest:
+                self.handle_mass_status_request(message, session_id)
             else:
                 print(f"Unhandled message type: {msgType.getValue()}")
 
@@ -198,98 +321,263 @@ class MarketMaker(fix.Application, CustomApplication):
             print(f"Message content: {message}")
         except Exception as e:
             print(f"")
+        finally:
+            if trace_key:
+                tracer.stamp(trace_key, 'mm_handled')
+            metrics.handler_latency.record(('market_maker', msg_type), time.perf_counter_ns() - started)
+
+    def next_order_id(self):
+        return str(next(self._order_ids))
+
+    def transact_time(self):
+        transact_time = fix.TransactTime()
+        transact_time.setString(fix_timestamp(self.clock))
+        return transact_time
 
     def log_business_event(self, event_type, details):
         self.logger.log_event(event_type, details)
-    def handle_new_order(self, message, session_id):
-        # Display the received order message in pure FIX format
-        print("Received order in FIX format:")
-        self.format_and_print_message("New Order", message)
 
-        order = fix44.ExecutionReport()
+    def send(self, message, session_id):
+        """Every outbound application message goes through here; replay.py overrides it to capture them"""
+        fix.Session.sendToTarget(message, session_id)
+        # After sending, so the drop copy adds nothing to the trading session's latency
+        if self.drop_copy is not None and message.getHeader().getField(35) == fix.MsgType_ExecutionReport:
+            self.drop_copy.publish(message.toString(), session_id, self.clock.time_ns())
+
+    def send_batch(self, messages, session_id):
+        """Send a stream of messages without echoing each one to the console"""
+        self._local.quiet = True
+        sent = 0
+        try:
+            for message in messages:
+                self.send(message, session_id)
+                sent += 1
+        finally:
+            self._local.quiet = False
+            self.logger.flush()
+        return sent
+
+    def send_drop_copies(self, copies, session_id):
+        """Send drop copies without echoing each one, like send_batch; runs on the drop copy writer thread"""
+        # Not through send(): copies are ExecutionReports too and would be copied again
+        self._local.quiet = True
+        try:
+            for copy in copies:
+                fix.Session.sendToTarget(copy, session_id)
+        finally:
+            self._local.quiet = False
+            self.logger.flush()
+
+    def index_order(self, orderID, session_id):
+        """Register a resting order in the ClOrdID, session, symbol and side indexes"""
+        order = self.orders[orderID]
+        order['session'] = session_id.toString()
+        self.orders_by_clordid[order['clOrdID']] = orderID
+        self.orders_by_session.setdefault(order['session'], set()).add(orderID)
+        self.orders_by_symbol.setdefault(order['symbol'], set()).add(orderID)
+        self.orders_by_side.setdefault(order['side'], set()).add(orderID)
+
+    def remove_order(self, orderID):
+        """Drop an order from self.orders and every index"""
+        order = self.orders.pop(orderID, None)
+        if order is None:
+            return None
+        if self.orders_by_clordid.get(order['clOrdID']) == orderID:
+            del self.orders_by_clordid[order['clOrdID']]
+        for index, key in ((self.orders_by_session, order.get('session')),
+                           (self.orders_by_symbol, order['symbol']),
+                           (self.orders_by_side, order['side'])):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(orderID)
+                if not ids:
+                    del index[key]
+        return order
+
+    def find_order(self, cl_ord_id):
+        """Return (OrderID, order) for a ClOrdID, or (None, None)"""
+        orderID = self.orders_by_clordid.get(cl_ord_id)
+        if orderID is None:
+            return None, None
+        return orderID, self.orders[orderID]
+
+    def select_orders(self, session_id, symbol=None, side=None):
+        """OrderIDs owned by a session, optionally narrowed by symbol and side"""
+        selected = self.orders_by_session.get(session_id.toString(), set())
+        if symbol is not None:
+            selected = selected & self.orders_by_symbol.get(symbol, set())
+        if side is not None:
+            selected = selected & self.orders_by_side.get(side, set())
+        return sorted(selected, key=int)
+
+    def order_report(self, orderID, exec_type, ord_status):
+        """Build an ExecutionReport describing the current state of an order"""
+        order = self.orders[orderID]
+        report = fix44.ExecutionReport()
+        report.setField(fix.OrderID(orderID))
+        report.setField(fix.ExecID(self.next_order_id()))
+        report.setField(fix.ExecType(exec_type))
+        report.setField(fix.OrdStatus(ord_status))
+        report.setField(fix.ClOrdID(order['clOrdID']))
+        report.setField(fix.Symbol(order['symbol']))
+        report.setField(fix.Side(order['side']))
+        report.setField(fix.OrderQty(order['orderQty']))
+        report.setField(fix.OrdType(order['ordType']))
+        report.setField(fix.LeavesQty(order['leavesQty']))
+        report.setField(fix.CumQty(order['cumQty']))
+        report.setField(fix.AvgPx(order['avgPx']))
+        report.setField(self.transact_time())
+        return report
+
+    def read_order(self, fields):
+        """Order record from a NewOrderSingle or a NewOrderList NoOrders entry.
+
+        Reads every field the order type needs, so a missing one raises
+        FieldNotFound before anything is stored."""
         clOrdID = fix.ClOrdID()
         side = fix.Side()
         orderQty = fix.OrderQty()
-        ordType = fix.OrdType()
 
-        message.getField(clOrdID)
-        message.getField(side)
-        message.getField(orderQty)
-        message.getField(ordType)
+        fields.getField(clOrdID)
+        fields.getField(side)
+        fields.getField(orderQty)
+        ordType = self.get_optional_field(fields, fix.OrdType()) or fix.OrdType_MARKET
+        symbol_value = self.get_optional_field(fields, fix.Symbol()) or self.symbol_value
 
-        orderID = gen_order_id()
-        self.orders[orderID] = {
+        order = {
             'clOrdID': clOrdID.getValue(),
-            'symbol': self.symbol_value,
+            'symbol': symbol_value,
             'side': side.getValue(),
             'orderQty': orderQty.getValue(),
-            'ordType': ordType.getValue(),
+            'ordType': ordType,
             'leavesQty': orderQty.getValue(),
             'cumQty': 0,
             'avgPx': 0
         }
 
         # Handle different order types
-        if ordType.getValue() == fix.OrdType_LIMIT:
+        if ordType == fix.OrdType_LIMIT:
             price = fix.Price()
-            message.getField(price)
-            self.orders[orderID]['price'] = price.getValue()
-        elif ordType.getValue() in [fix.OrdType_STOP, fix.OrdType_STOP_LIMIT]:
+            fields.getField(price)
+            order['price'] = price.getValue()
+        elif ordType in [fix.OrdType_STOP, fix.OrdType_STOP_LIMIT]:
             stopPx = fix.StopPx()
-            message.getField(stopPx)
-            self.orders[orderID]['stopPx'] = stopPx.getValue()
-            if ordType.getValue() == fix.OrdType_STOP_LIMIT:
+            fields.getField(stopPx)
+            order['stopPx'] = stopPx.getValue()
+            if ordType == fix.OrdType_STOP_LIMIT:
                 price = fix.Price()
-                message.getField(price)
-                self.orders[orderID]['price'] = price.getValue()
-
-        order.setField(fix.OrderID(orderID))
-        order.setField(fix.ExecID(gen_order_id()))
-        order.setField(fix.ExecType(fix.ExecType_NEW))
-        order.setField(fix.OrdStatus(fix.OrdStatus_NEW))
-        order.setField(clOrdID)
-        order.setField(fix.Symbol(self.symbol_value))
-        order.setField(side)
-        order.setField(orderQty)
-        order.setField(ordType)
-        order.setField(fix.LeavesQty(orderQty.getValue()))
-        order.setField(fix.CumQty(0))
-        order.setField(fix.AvgPx(0))
+                fields.getField(price)
+                order['price'] = price.getValue()
+        return order
+
+    def add_order(self, fields, session_id):
+        """Validate, store and index a resting order; raises FieldNotFound and stores nothing if a field is missing"""
+        order = self.read_order(fields)
+        orderID = self.next_order_id()
+        self.orders[orderID] = order
+        self.index_order(orderID, session_id)
+        return orderID
+
+    def order_reject(self, fields, text):
+        """ExecutionReport rejecting an order that was never stored"""
+        report = fix44.ExecutionReport()
+        report.setField(fix.OrderID("NONE"))
+        report.setField(fix.ExecID(self.next_order_id()))
+        report.setField(fix.ExecType(fix.ExecType_REJECTED))
+        report.setField(fix.OrdStatus(fix.OrdStatus_REJECTED))
+        report.setField(fix.ClOrdID(self.get_optional_field(fields, fix.ClOrdID()) or "NONE"))
+        report.setField(fix.Symbol(self.get_optional_field(fields, fix.Symbol()) or self.symbol_value))
+        report.setField(fix.Side(self.get_optional_field(fields, fix.Side()) or fix.Side_BUY))
+        report.setField(fix.OrdRejReason(fix.OrdRejReason_OTHER))
+        report.setField(fix.LeavesQty(0))
+        report.setField(fix.CumQty(0))
+        report.setField(fix.AvgPx(0))
+        report.setField(fix.Text(text))
+        report.setField(self.transact_time())
+        return report
+
+    def new_order_report(self, orderID):
+        """ExecutionReport acknowledging a freshly added order"""
+        order = self.order_report(orderID, fix.ExecType_NEW, fix.OrdStatus_NEW)
 
         # Add fields specific to order types
         if 'price' in self.orders[orderID]:
             order.setField(fix.Price(self.orders[orderID]['price']))
         if 'stopPx' in self.orders[orderID]:
             order.setField(fix.StopPx(self.orders[orderID]['stopPx']))
+        return order
 
-        fix.Session.sendToTarget(order, session_id)
-        print(f"New order received and processed: OrderID={orderID}, ClOrdID={clOrdID.getValue()}, "
-              f"Symbol={self.symbol_value}, Side={'Buy' if side.getValue() == fix.Side_BUY else 'Sell'}, "
-              f"Quantity={orderQty.getValue()}, OrderType={ordType.getValue()}")
+    def handle_new_order(self, message, session_id):
+        # Display the received order message in pure FIX format
+        print("Received order in FIX format:")
+        self.format_and_print_message("New Order", message)
+
+        try:
+            orderID = self.add_order(message, session_id)
+        except fix.FieldNotFound as e:
+            self.send(self.order_reject(message, f"Missing required field {getattr(e, 'field', '')}".strip()), session_id)
+            print(f"Rejected order: missing required field - {e}")
+            return
+        order = self.orders[orderID]
+
+        self.send(self.new_order_report(orderID), session_id)
+        print(f"New order received and processed: OrderID={orderID}, ClOrdID={order['clOrdID']}, "
+              f"Symbol={order['symbol']}, Side={'Buy' if order['side'] == fix.Side_BUY else 'Sell'}, "
+              f"Quantity={order['orderQty']}, OrderType={order['ordType']}")
+
+    def handle_new_order_list(self, message, session_id):
+        listID = fix.ListID()
+        noOrders = fix.NoOrders()
+        message.getField(listID)
+        message.getField(noOrders)
+
+        # Each entry is accepted or rejected on its own: an OrderID, or the reject to send
+        results = []
+        for i in range(noOrders.getValue()):
+            # A fresh group per entry, so a reject never carries the previous entry's fields
+            group = fix44.NewOrderList.NoOrders()
+            try:
+                message.getGroup(i + 1, group)
+                results.append(self.add_order(group, session_id))
+            except fix.FieldNotFound as e:
+                results.append(self.order_reject(group, f"List entry {i + 1}: missing required field "
+                                                        f"{getattr(e, 'field', '')}".strip()))
+
+        def reports():
+            for result in results:
+                report = self.new_order_report(result) if isinstance(result, str) else result
+                report.setField(listID)
+                yield report
+
+        self.send_batch(reports(), session_id)
+        accepted = sum(1 for result in results if isinstance(result, str))
+        print(f"New order list {listID.getValue()} processed: {accepted} orders accepted, "
+              f"{len(results) - accepted} rejected")
 
 
     def handle_cancel_request(self, message, session_id):
         origClOrdID = fix.OrigClOrdID()
         message.getField(origClOrdID)
 
-        order = next((order for order in self.orders.values() if order['clOrdID'] == origClOrdID.getValue()), None)
+        orderID, order = self.find_order(origClOrdID.getValue())
 
         if order:
-            orderID = next(id for id, o in self.orders.items() if o == order)
             cancel = fix44.ExecutionReport()
             cancel.setField(fix.OrderID(orderID))
-            cancel.setField(fix.ExecID(gen_order_id()))
+            cancel.setField(fix.ExecID(self.next_order_id()))
             cancel.setField(fix.ExecType(fix.ExecType_CANCELED))
             cancel.setField(fix.OrdStatus(fix.OrdStatus_CANCELED))
+            cancel.setField(fix.ClOrdID(self.get_optional_field(message, fix.ClOrdID()) or order['clOrdID']))
             cancel.setField(origClOrdID)
-            cancel.setField(fix.Symbol(self.symbol_value))
+            cancel.setField(fix.Symbol(order['symbol']))
             cancel.setField(fix.Side(order['side']))
             cancel.setField(fix.LeavesQty(0))
             cancel.setField(fix.CumQty(order['cumQty']))
             cancel.setField(fix.AvgPx(order['avgPx']))
+            cancel.setField(self.transact_time())
 
-            del self.orders[orderID]
-            fix.Session.sendToTarget(cancel, session_id)
+            self.remove_order(orderID)
+            self.send(cancel, session_id)
         else:
             reject = fix44.OrderCancelReject()
             reject.setField(fix.OrderID("NONE"))
@@ -299,7 +587,44 @@ class MarketMaker(fix.Application, CustomApplication):
             reject.setField(fix.CxlRejResponseTo(fix.CxlRejResponseTo_ORDER_CANCEL_REQUEST))
             reject.setField(fix.CxlRejReason(fix.CxlRejReason_UNKNOWN_ORDER))
 
-            fix.Session.sendToTarget(reject, session_id)
+            self.send(reject, session_id)
+
+    def handle_replace_request(self, message, session_id):
+        """Change the quantity and/or price of a resting order; it keeps its OrderID under the new ClOrdID"""
+        origClOrdID = fix.OrigClOrdID()
+        clOrdID = fix.ClOrdID()
+        orderQty = fix.OrderQty()
+        message.getField(origClOrdID)
+        message.getField(clOrdID)
+        message.getField(orderQty)
+
+        orderID, order = self.find_order(origClOrdID.getValue())
+        if not order or orderQty.getValue() < order['cumQty']:
+            reject = fix44.OrderCancelReject()
+            reject.setField(fix.OrderID(orderID or "NONE"))
+            reject.setField(clOrdID)
+            reject.setField(origClOrdID)
+            reject.setField(fix.OrdStatus(fix.OrdStatus_NEW if order else fix.OrdStatus_REJECTED))
+            reject.setField(fix.CxlRejResponseTo(fix.CxlRejResponseTo_ORDER_CANCEL_REPLACE_REQUEST))
+            reject.setField(fix.CxlRejReason(fix.CxlRejReason_OTHER if order else fix.CxlRejReason_UNKNOWN_ORDER))
+            self.send(reject, session_id)
+            return
+
+        del self.orders_by_clordid[order['clOrdID']]
+        order['clOrdID'] = clOrdID.getValue()
+        self.orders_by_clordid[order['clOrdID']] = orderID
+        order['orderQty'] = orderQty.getValue()
+        order['leavesQty'] = orderQty.getValue() - order['cumQty']
+        price = self.get_optional_field(message, fix.Price())
+        if price is not None and 'price' in order:
+            order['price'] = price
+
+        report = self.new_order_report(orderID)
+        report.setField(fix.ExecType(fix.ExecType_REPLACED))
+        report.setField(origClOrdID)
+        self.send(report, session_id)
+        print(f"Order replaced: OrderID={orderID}, ClOrdID={order['clOrdID']}, "
+              f"OrigClOrdID={origClOrdID.getValue()}, Quantity={order['orderQty']}, Price={order.get('price')}")
 
     def handle_market_data_request(self, message, session_id):
         try:
@@ -315,6 +640,7 @@ class MarketMaker(fix.Application, CustomApplication):
 
             if subscription_type.getValue() == fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES:
                 self.subscriptions.add((md_req_id.getValue(), self.symbol_value))
+                self.subscriber_sessions[md_req_id.getValue()] = session_id
                 print(f"Added subscription for {self.symbol_value} with MDReqID {md_req_id.getValue()}")
                 self.send_market_data(md_req_id.getValue(), session_id, self.symbol_value)
                 self.is_paused = False  # Unpause when subscribing
@@ -328,6 +654,7 @@ class MarketMaker(fix.Application, CustomApplication):
 
     def handle_unsubscription(self, md_req_id, symbol):
         self.subscriptions = {sub for sub in self.subscriptions if sub[0] != md_req_id}
+        self.subscriber_sessions.pop(md_req_id, None)
         print(f"Removed subscription for {symbol} with MDReqID {md_req_id}")
         if not self.subscriptions:
             self.is_paused = True
@@ -338,6 +665,11 @@ class MarketMaker(fix.Application, CustomApplication):
             print(f"Symbol {symbol_value} not found in price data")
             return
 
+        self.send(self.market_data_snapshot(md_req_id, symbol_value), session_id)
+        print(f"Sent market data for {symbol_value}: Bid={self.prices[symbol_value] - 0.01}, Offer={self.prices[symbol_value] + 0.01}")
+        self.clock.sleep(MARKET_DATA_PAUSE)
+
+    def market_data_snapshot(self, md_req_id, symbol_value):
         snapshot = fix.Message()
         snapshot.getHeader().setField(fix.MsgType(fix.MsgType_MarketDataSnapshotFullRefresh))
         snapshot.setField(fix.MDReqID(md_req_id))
@@ -353,72 +685,184 @@ class MarketMaker(fix.Application, CustomApplication):
         group.setField(fix.MDEntryPx(self.prices[symbol_value] + 0.01))
         group.setField(fix.MDEntrySize(100))
         snapshot.addGroup(group)
-
-        fix.Session.sendToTarget(snapshot, session_id)
-        print(f"Sent market data for {symbol_value}: Bid={self.prices[symbol_value] - 0.01}, Offer={self.prices[symbol_value] + 0.01}")
-        time.sleep(10)
+        return snapshot
 
     def handle_order_status_request(self, message, session_id):
         clOrdID = fix.ClOrdID()
         message.getField(clOrdID)
 
-        order = next((order for order in self.orders.values() if order['clOrdID'] == clOrdID.getValue()), None)
+        orderID, order = self.find_order(clOrdID.getValue())
 
         if order:
-            orderID = next(id for id, o in self.orders.items() if o == order)
             status = fix44.ExecutionReport()
             status.setField(fix.OrderID(orderID))
-            status.setField(fix.ExecID(gen_order_id()))
+            status.setField(fix.ExecID(self.next_order_id()))
             status.setField(fix.ExecType(fix.ExecType_ORDER_STATUS))
             status.setField(fix.OrdStatus(fix.OrdStatus_NEW))
             status.setField(clOrdID)
-            status.setField(fix.Symbol(self.symbol_value))
+            status.setField(fix.Symbol(order['symbol']))
             status.setField(fix.Side(order['side']))
             status.setField(fix.OrderQty(order['orderQty']))
             status.setField(fix.LeavesQty(order['leavesQty']))
             status.setField(fix.CumQty(order['cumQty']))
             status.setField(fix.AvgPx(order['avgPx']))
 
-            fix.Session.sendToTarget(status, session_id)
+            self.send(status, session_id)
         else:
             reject = fix44.BusinessMessageReject()
             reject.setField(fix.RefMsgType(fix.MsgType_OrderStatusRequest))
+            reject.setField(fix.BusinessRejectRefID(clOrdID.getValue()))
             reject.setField(fix.BusinessRejectReason(fix.BusinessRejectReason_UNKNOWN_ID))
             reject.setField(fix.Text("Unknown order"))
 
-            fix.Session.sendToTarget(reject, session_id)
+            self.send(reject, session_id)
+
+    def handle_mass_cancel_request(self, message, session_id):
+        clOrdID = fix.ClOrdID()
+        request_type = fix.MassCancelRequestType()
+        message.getField(clOrdID)
+        message.getField(request_type)
+
+        symbol = self.get_optional_field(message, fix.Symbol())
+        side = self.get_optional_field(message, fix.Side())
+
+        report = fix44.OrderMassCancelReport()
+        report.setField(fix.OrderID(self.next_order_id()))
+        report.setField(clOrdID)
+        report.setField(request_type)
+        if symbol is not None:
+            report.setField(fix.Symbol(symbol))
+        if side is not None:
+            report.setField(fix.Side(side))
+        report.setField(self.transact_time())
+
+        reject_reason = None
+        if request_type.getValue() == fix.MassCancelRequestType_CANCEL_ALL_ORDERS:
+            symbol = None
+        elif request_type.getValue() != fix.MassCancelRequestType_CANCEL_ORDERS_FOR_A_SECURITY:
+            reject_reason = fix.MassCancelRejectReason_MASS_CANCEL_NOT_SUPPORTED
+        elif symbol is None:
+            reject_reason = fix.MassCancelRejectReason_INVALID_OR_UNKNOWN_SECURITY
+
+        if reject_reason is not None:
+            report.setField(fix.MassCancelResponse(fix.MassCancelResponse_CANCEL_REQUEST_REJECTED))
+            report.setField(fix.MassCancelRejectReason(reject_reason))
+            self.send(report, session_id)
+            return
+
+        orderIDs = self.select_orders(session_id, symbol, side)
+        report.setField(fix.MassCancelResponse(request_type.getValue()))
+        report.setField(fix.TotalAffectedOrders(len(orderIDs)))
+        self.send(report, session_id)
+
+        def cancellations():
+            for orderID in orderIDs:
+                cancel = self.order_report(orderID, fix.ExecType_CANCELED, fix.OrdStatus_CANCELED)
+                cancel.setField(fix.OrigClOrdID(self.orders[orderID]['clOrdID']))
+                cancel.setField(fix.LeavesQty(0))
+                self.remove_order(orderID)
+                yield cancel
+
+        self.send_batch(cancellations(), session_id)
+        print(f"Mass cancel {clOrdID.getValue()}: canceled {len(orderIDs)} orders "
+              f"(Symbol={symbol or 'ALL'}, Side={side or 'ALL'})")
+
+    def handle_mass_status_request(self, message, session_id):
+        mass_status_req_id = fix.MassStatusReqID()
+        request_type = fix.MassStatusReqType()
+        message.getField(mass_status_req_id)
+        message.getField(request_type)
+
+        symbol = self.get_optional_field(message, fix.Symbol())
+        side = self.get_optional_field(message, fix.Side())
+        if request_type.getValue() == fix.MassStatusReqType_STATUS_FOR_ALL_ORDERS:
+            symbol = None
+
+        orderIDs = self.select_orders(session_id, symbol, side)
+        if not orderIDs:
+            # Nothing to report is still a complete answer: one report with TotNumReports=0
+            report = fix44.ExecutionReport()
+            report.setField(fix.OrderID("NONE"))
+            report.setField(fix.ExecID(self.next_order_id()))
+            report.setField(fix.ExecType(fix.ExecType_ORDER_STATUS))
+            report.setField(fix.OrdStatus(fix.OrdStatus_REJECTED))
+            report.setField(fix.Symbol(symbol or self.symbol_value))
+            report.setField(fix.Side(side or fix.Side_BUY))
+            report.setField(fix.LeavesQty(0))
+            report.setField(fix.CumQty(0))
+            report.setField(fix.AvgPx(0))
+            report.setField(mass_status_req_id)
+            report.setField(fix.TotNumReports(0))
+            report.setField(fix.LastRptRequested(True))
+            report.setField(fix.Text("No orders match mass status request"))
+            report.setField(self.transact_time())
+            self.send(report, session_id)
+            print(f"Mass status {mass_status_req_id.getValue()}: no orders match "
+                  f"(Symbol={symbol or 'ALL'}, Side={side or 'ALL'})")
+            return
+
+        total = len(orderIDs)
+
+        def reports():
+            for number, orderID in enumerate(orderIDs, 1):
+                status = self.order_report(orderID, fix.ExecType_ORDER_STATUS, fix.OrdStatus_NEW)
+                status.setField(mass_status_req_id)
+                status.setField(fix.TotNumReports(total))
+                if number == total:
+                    status.setField(fix.LastRptRequested(True))
+                yield status
+
+        self.send_batch(reports(), session_id)
+        print(f"Mass status {mass_status_req_id.getValue()}: reported {total} orders "
+              f"(Symbol={symbol or 'ALL'}, Side={side or 'ALL'})")
+
+    def get_optional_field(self, message, field):
+        if message.isSetField(field):
+            message.getField(field)
+            return field.getValue()
+        return None
+
+    def price_tick(self):
+        """One step of the price walk: record the quote and publish it to subscribers"""
+        self.prices[self.symbol_value] += self.rng.uniform(-0.05, 0.05)
+        self.prices[self.symbol_value] = max(4.0, min(self.prices[self.symbol_value], 6.0))
+        if self.ticks is not None:
+            self.ticks.append(self.symbol_value, self.prices[self.symbol_value] - 0.01,
+                              self.prices[self.symbol_value] + 0.01, 100, 100, self.clock.time_ns())
+
+        for md_req_id, symbol in list(self.subscriptions):
+            session_id = self.subscriber_sessions.get(md_req_id, self.session_id)
+            if symbol == self.symbol_value and session_id:
+                try:
+                    self.send_market_data(md_req_id, session_id, self.symbol_value)
+                except fix.SessionNotFound:
+                    print(
+                        f"Session {session_id} not found. Removing subscription for {self.symbol_value}")
+                    self.subscriptions.remove((md_req_id, self.symbol_value))
+                    self.subscriber_sessions.pop(md_req_id, None)
+                except Exception as e:
+                    print(f"Error sending market data for {self.symbol_value}: {e}")
 
     def update_prices(self):
         while self.is_running:
             try:
                 if not self.is_paused:  # Only update and send data if not paused
-                    self.prices[self.symbol_value] += random.uniform(-0.05, 0.05)
-                    self.prices[self.symbol_value] = max(4.0, min(self.prices[self.symbol_value], 6.0))
-
-                    for md_req_id, symbol in list(self.subscriptions):
-                        if symbol == self.symbol_value and self.session_id:
-                            try:
-                                self.send_market_data(md_req_id, self.session_id, self.symbol_value)
-                            except fix.SessionNotFound:
-                                print(
-                                    f"Session {self.session_id} not found. Removing subscription for {self.symbol_value}")
-                                self.subscriptions.remove((md_req_id, self.symbol_value))
-                            except Exception as e:
-                                print(f"Error sending market data for {self.symbol_value}: {e}")
-
-                time.sleep(6)
+                    self.price_tick()
+                self.clock.sleep(PRICE_INTERVAL)
             except Exception as e:
                 print(f"Error in update_prices: {e}")
-                time.sleep(1)
+                self.clock.sleep(1)
 
     def start(self):
         try:
-            settings = fix.SessionSettings("Server.cfg")
-            store_factory = fix.FileStoreFactory(settings)
+            store_factory, settings = message_store.store_factory(fix.SessionSettings("Server.cfg"))
             log_factory = fix.ScreenLogFactory(settings)
+            self.drop_copy.sessions = drop_copy_sessions(settings)
             acceptor = fix.SocketAcceptor(self, store_factory, settings, log_factory)
+            self.health = SessionHealthMonitor("MARKET_MAKER", test_request_interval(settings))
 
             acceptor.start()
+            self.health.start()
 
             threading.Thread(target=self.update_prices, daemon=True).start()
 
@@ -430,6 +874,7 @@ class MarketMaker(fix.Application, CustomApplication):
             sys.exit(1)
 
 def main():
+    application = None
     try:
         application = MarketMaker()
         application.start()
@@ -438,6 +883,11 @@ def main():
     except Exception as e:
         print(f"Error in Market Maker: {e}")
         sys.exit(1)
+    finally:
+        if application is not None:
+            application.drop_copy.close()
+        if tracer.enabled:
+            tracer.dump()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
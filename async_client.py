@@ -0,0 +1,163 @@
+'''Asyncio facade over Client.
+
+    client = AsyncClient(Client())
+    report = await client.submit(fix.Side_BUY, "USD/BRL", 100)
+    async for tick in client.market_data("USD/BRL"):
+        ...
+
+Acknowledgements arrive on the QuickFIX thread through Client.add_listener and
+are handed to the event loop with call_soon_threadsafe, where they resolve the
+Future waiting on that ClOrdID. Nothing polls.'''
+
+import asyncio
+import quickfix as fix
+
+
+class OrderRejected(Exception):
+    """Raised when an order, cancel or status request is rejected by the market maker"""
+
+    def __init__(self, report):
+        super().__init__(report.get('text') or f"Request rejected: {report}")
+        self.report = report
+
+
+class AsyncClient:
+    def __init__(self, client, loop=None):
+        self.client = client
+        self.loop = loop or asyncio.get_event_loop()
+        # Request ClOrdID -> Future, only touched on the event loop thread; wait() or forget() removes
+        # the entry, so a reply that arrives before wait() is called is still there for it
+        self._pending = {}
+        # OrigClOrdID -> cancel ClOrdID, since cancel acks only echo the original id
+        self._cancels = {}
+        self._md_queues = set()
+        client.add_listener(self._on_event)
+
+    def close(self):
+        self.client.remove_listener(self._on_event)
+        for future in self._pending.values():
+            if not future.done():
+                future.cancel()
+        self._pending.clear()
+        self._cancels.clear()
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    def _on_event(self, kind, data):
+        # QuickFIX thread: hand over to the loop and return immediately
+        self.loop.call_soon_threadsafe(self._dispatch, kind, data)
+
+    def _dispatch(self, kind, data):
+        if kind == 'execution_report':
+            self._on_execution_report(data)
+        elif kind == 'cancel_reject':
+            self._cancels.pop(data['origClOrdID'], None)
+            self._resolve(data['clOrdID'], error=OrderRejected(data))
+        elif kind == 'business_reject':
+            self._resolve(data['refID'], error=OrderRejected(data))
+        elif kind == 'market_data':
+            self._publish_market_data(data)
+
+    def _on_execution_report(self, report):
+        rejected = report['execType'] == fix.ExecType_REJECTED or report['ordStatus'] == fix.OrdStatus_REJECTED
+        if report['execType'] == fix.ExecType_CANCELED:
+            key = self._cancels.pop(report['origClOrdID'] or report['clOrdID'], None)
+            if key is not None:
+                self._resolve(key, report)
+                return
+        self._resolve(report['clOrdID'] or report['origClOrdID'], report,
+                      OrderRejected(report) if rejected else None)
+
+    def _resolve(self, key, result=None, error=None):
+        future = self._pending.get(key)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def expect(self, key):
+        """Register interest in the reply to a request sent from this loop; call before yielding"""
+        if key is not None:
+            self._pending[key] = self.loop.create_future()
+        return key
+
+    def forget(self, key):
+        """Drop a request registered with expect() that was not sent after all"""
+        future = self._pending.pop(key, None)
+        if future is not None and not future.done():
+            future.cancel()
+
+    async def wait(self, key, timeout):
+        """Wait for the reply to a request registered with expect()"""
+        future = self._pending.get(key)
+        if future is None:
+            raise fix.RuntimeError(f"Request {key} could not be sent")
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    async def submit(self, side, symbol, quantity, order_type=fix.OrdType_MARKET, price=None, stop_price=None,
+                     timeout=5.0):
+        """Send a NewOrderSingle and wait for its first ExecutionReport.
+
+        Returns the report as a dict, raises OrderRejected for a reject and
+        asyncio.TimeoutError if no acknowledgement arrives within timeout."""
+        # The ack is dispatched on this loop, so registering after the send cannot miss it
+        cl_ord_id = self.expect(self.client.place_order(side, symbol, quantity, order_type, price, stop_price,
+                                                        quiet=True))
+        return await self.wait(cl_ord_id, timeout)
+
+    async def submit_many(self, orders, timeout=5.0, as_list=False):
+        """Send a batch with Client.place_orders and wait for every acknowledgement.
+
+        Results come back in order; rejects and timeouts are returned as exceptions."""
+        cl_ord_ids = [self.expect(cl_ord_id) for cl_ord_id in self.client.place_orders(orders, as_list=as_list)]
+        return await asyncio.gather(*(self.wait(cl_ord_id, timeout) for cl_ord_id in cl_ord_ids),
+                                    return_exceptions=True)
+
+    async def cancel(self, orig_cl_ord_id, timeout=5.0):
+        """Cancel an order and wait for the cancel ExecutionReport or OrderCancelReject"""
+        cancel_id = self.expect(self.client.cancel_order(orig_cl_ord_id))
+        self._cancels[orig_cl_ord_id] = cancel_id
+        try:
+            return await self.wait(cancel_id, timeout)
+        finally:
+            self._cancels.pop(orig_cl_ord_id, None)
+
+    async def status(self, cl_ord_id, timeout=5.0):
+        """Ask the market maker for the status of an order and wait for the reply"""
+        self.expect(cl_ord_id)
+        self.client.order_status_request(cl_ord_id)
+        return await self.wait(cl_ord_id, timeout)
+
+    def order(self, cl_ord_id):
+        """Cached state of an order from the Client's local order book"""
+        return self.client.get_order(cl_ord_id)
+
+    def _publish_market_data(self, snapshot):
+        for symbol, queue in self._md_queues:
+            if symbol is not None and symbol != snapshot['symbol']:
+                continue
+            if queue.full():
+                # Slow consumer: keep the newest ticks
+                queue.get_nowait()
+            queue.put_nowait(snapshot)
+
+    async def market_data(self, symbol=None, maxsize=1000):
+        """Async iterator over market data snapshots, for one symbol or all.
+
+        Subscribe first with client.subscribe_market_data(symbol). When the
+        consumer falls more than maxsize snapshots behind the oldest are dropped."""
+        entry = (symbol, asyncio.Queue(maxsize))
+        self._md_queues.add(entry)
+        try:
+            while True:
+                yield await entry[1].get()
+        finally:
+            self._md_queues.discard(entry)
@@ -0,0 +1,508 @@
+'''Benchmarks for the FIX hot paths, in isolation and end to end.
+
+    python benchmarks/hot_paths.py --json results.json
+    python benchmarks/hot_paths.py --quick --only new_order,cancel
+    python benchmarks/hot_paths.py --baseline results.json --tolerance 0.2
+
+In-process benchmarks call the handlers directly on a ReplayMarketMaker (see
+replay.py), so every outbound message is serialized but no session is needed;
+console output goes to /dev/null. The end-to-end benchmarks run in a copy of
+the repository (so logs and FileStores here are left alone) and use the
+ports from the cfg files:
+
+    loopback     Market_maker.py in its own process, load_generator sessions (port 5001)
+    api_command  python main.py, POST /api/command over HTTP (ports 8000 and 5001)
+
+Each result has a name, its parameters, a rate (operations per second) and
+latency percentiles in microseconds. With --baseline, rates more than
+--tolerance below the baseline run are reported and the exit status is 1.'''
+
+import argparse
+import asyncio
+import contextlib
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import quickfix as fix
+import quickfix44 as fix44
+
+from Market_maker import MessageLogger
+from latency import LatencyHistogram
+import fix_codec
+from replay import ReplayMarketMaker
+
+SESSION_ID = fix.SessionID("FIX.4.4", "MARKET_MAKER", "CLIENT")
+SYMBOL = "USD/BRL"
+HTTP_PORT = 8000
+
+
+def result(name, params, count, seconds, histogram=None):
+    return {
+        "name": name,
+        "params": params,
+        "count": count,
+        "seconds": round(seconds, 4),
+        "rate": round(count / seconds, 1) if seconds else None,
+        "latency_us": histogram.summary() if histogram is not None else None
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+@contextlib.contextmanager
+def sandbox():
+    """Run in a throwaway copy of the repository"""
+    directory = tempfile.mkdtemp(prefix="fix_bench_")
+    tree = os.path.join(directory, "tree")
+    shutil.copytree(ROOT, tree, ignore=shutil.ignore_patterns(
+        ".git", "__pycache__", "logs", "store*", "log_*", "benchmarks"))
+    cwd = os.getcwd()
+    os.chdir(tree)
+    try:
+        yield tree
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def new_order_single(cl_ord_id="0"):
+    order = fix44.NewOrderSingle()
+    order.setField(fix.ClOrdID(cl_ord_id))
+    order.setField(fix.Symbol(SYMBOL))
+    order.setField(fix.Side(fix.Side_BUY))
+    order.setField(fix.OrderQty(100))
+    order.setField(fix.OrdType(fix.OrdType_LIMIT))
+    order.setField(fix.Price(5.1))
+    order.setField(fix.TransactTime())
+    return order
+
+
+def rest_order(market_maker, cl_ord_id):
+    """Add a resting limit order straight into the book, bypassing message parsing"""
+    orderID = market_maker.next_order_id()
+    market_maker.orders[orderID] = {
+        'clOrdID': cl_ord_id,
+        'symbol': SYMBOL,
+        'side': fix.Side_BUY,
+        'orderQty': 100,
+        'ordType': fix.OrdType_LIMIT,
+        'leavesQty': 100,
+        'cumQty': 0,
+        'avgPx': 0,
+        'price': 5.1
+    }
+    market_maker.index_order(orderID, SESSION_ID)
+
+
+def bench_new_order(args):
+    market_maker = ReplayMarketMaker()
+    order = new_order_single()
+    histogram = LatencyHistogram()
+    elapsed = 0
+    with quiet():
+        for i in range(args.count):
+            order.setField(fix.ClOrdID(f"N{i}"))
+            started = time.perf_counter_ns()
+            market_maker.handle_new_order(order, SESSION_ID)
+            took = time.perf_counter_ns() - started
+            histogram.record(took)
+            elapsed += took
+            if len(market_maker.sent) >= 10000:
+                market_maker.sent.clear()
+    return [result("handle_new_order", {}, args.count, elapsed / 1e9, histogram)]
+
+
+def bench_cancel(args):
+    results = []
+    for resting in args.resting:
+        market_maker = ReplayMarketMaker()
+        for i in range(resting):
+            rest_order(market_maker, f"R{i}")
+        rng = random.Random(args.seed)
+        cancel = fix44.OrderCancelRequest()
+        cancel.setField(fix.Symbol(SYMBOL))
+        cancel.setField(fix.Side(fix.Side_BUY))
+        cancel.setField(fix.TransactTime())
+        histogram = LatencyHistogram()
+        elapsed = 0
+        for i in range(args.count):
+            target = f"R{rng.randrange(resting)}"
+            cancel.setField(fix.OrigClOrdID(target))
+            cancel.setField(fix.ClOrdID(f"C{i}"))
+            started = time.perf_counter_ns()
+            market_maker.handle_cancel_request(cancel, SESSION_ID)
+            took = time.perf_counter_ns() - started
+            histogram.record(took)
+            elapsed += took
+            # Put the order back so the book stays at `resting` orders
+            rest_order(market_maker, target)
+            if len(market_maker.sent) >= 10000:
+                market_maker.sent.clear()
+        results.append(result("handle_cancel_request", {"resting": resting}, args.count, elapsed / 1e9, histogram))
+        print(f"  {resting} resting orders done")
+    return results
+
+
+def execution_report():
+    report = fix44.ExecutionReport()
+    for field in (fix.OrderID("1000001"), fix.ExecID("1000002"), fix.ExecType(fix.ExecType_NEW),
+                  fix.OrdStatus(fix.OrdStatus_NEW), fix.ClOrdID("BENCH-1"), fix.Symbol(SYMBOL),
+                  fix.Side(fix.Side_BUY), fix.OrderQty(100), fix.OrdType(fix.OrdType_LIMIT),
+                  fix.Price(5.1), fix.LeavesQty(100), fix.CumQty(0), fix.AvgPx(0)):
+        report.setField(field)
+    report.getHeader().setField(fix.SenderCompID("MARKET_MAKER"))
+    report.getHeader().setField(fix.TargetCompID("CLIENT"))
+    return report
+
+
+def timed(name, params, count, call):
+    histogram = LatencyHistogram()
+    elapsed = 0
+    for _ in range(count):
+        started = time.perf_counter_ns()
+        call()
+        took = time.perf_counter_ns() - started
+        histogram.record(took)
+        elapsed += took
+    return result(name, params, count, elapsed / 1e9, histogram)
+
+
+def bench_logger(args):
+    report = execution_report()
+    results = []
+    with sandbox():
+        logger = MessageLogger("bench")
+        parsed = logger.parse_message_content(report)
+        cases = (
+            ("parse_message_content", {}, lambda: logger.parse_message_content(report)),
+            ("log_message", {"flush": True}, lambda: logger.log_message("outgoing_app", report, parsed)),
+            ("log_message", {"flush": False}, lambda: logger.log_message("outgoing_app", report, parsed, flush=False)),
+        )
+        for name, params, call in cases:
+            results.append(timed(name, params, args.count, call))
+            logger.flush()
+        logger.close()
+    return results
+
+
+def bench_codec(args):
+    raw = execution_report().toString()
+    data = raw.encode("latin-1")
+    return [
+        timed("fix_codec.to_pipe", {}, args.count, lambda: fix_codec.to_pipe(raw)),
+        timed("fix_codec.scan", {}, args.count, lambda: fix_codec.scan(raw)),
+        timed("fix_codec.fields", {"input": "bytes"}, args.count, lambda: sum(1 for _ in fix_codec.fields(data))),
+        timed("fix_codec.get_field", {}, args.count, lambda: fix_codec.get_field(data, 11)),
+        timed("fix_codec.validate", {}, args.count, lambda: fix_codec.validate(data)),
+    ]
+
+
+def bench_market_data(args):
+    """One price update fanned out to every subscription, as update_prices does"""
+    results = []
+    for subscribers in args.subscribers:
+        market_maker = ReplayMarketMaker()
+        market_maker.session_id = SESSION_ID
+        market_maker.subscriptions = {(f"MD{i}", SYMBOL) for i in range(subscribers)}
+        ticks = max(10, min(1000, args.count // subscribers))
+        histogram = LatencyHistogram()
+        elapsed = 0
+        for _ in range(ticks):
+            started = time.perf_counter_ns()
+            for md_req_id, symbol in list(market_maker.subscriptions):
+                market_maker.send_market_data(md_req_id, market_maker.session_id, symbol)
+            took = time.perf_counter_ns() - started
+            histogram.record(took)
+            elapsed += took
+            market_maker.sent.clear()
+        # rate is snapshots per second; latency is per update, across all subscribers
+        results.append(result("send_market_data", {"subscribers": subscribers}, ticks * subscribers,
+                              elapsed / 1e9, histogram))
+    return results
+
+
+class NullWebSocket:
+    """Accepts and discards everything a ConnectionManager sends"""
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        pass
+
+    async def send_bytes(self, message):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+
+def bench_broadcast(args):
+    from fastapi_app import ConnectionManager
+
+    async def run(clients, messages):
+        manager = ConnectionManager(queue_size=messages + 1)
+        for _ in range(clients):
+            await manager.connect(NullWebSocket())
+        while any(not connection.queue.empty() for connection in manager.active_connections.values()):
+            await asyncio.sleep(0)
+
+        payload = json.dumps({"type": "order_update", "order": "8=FIX.4.4 | 35=8 | 11=BENCH-1 | 55=USD/BRL"})
+        histogram = LatencyHistogram()
+        started = time.perf_counter_ns()
+        for _ in range(messages):
+            call_started = time.perf_counter_ns()
+            await manager.broadcast(payload)
+            histogram.record(time.perf_counter_ns() - call_started)
+        # Delivered once every sender task has drained its queue
+        while any(not connection.queue.empty() for connection in manager.active_connections.values()):
+            await asyncio.sleep(0)
+        elapsed = time.perf_counter_ns() - started
+        for websocket in list(manager.active_connections):
+            manager.disconnect(websocket)
+        return result("broadcast", {"clients": clients, "dropped": manager.dropped_messages},
+                      clients * messages, elapsed / 1e9, histogram)
+
+    results = []
+    for clients in args.clients:
+        messages = max(10, min(1000, args.count // clients))
+        results.append(asyncio.run(run(clients, messages)))
+    return results
+
+
+def start_process(script, ready, timeout=60):
+    """Start a repository script in the current directory and wait until ready() is true"""
+    process = subprocess.Popen([sys.executable, script], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while not ready():
+        if process.poll() is not None:
+            raise fix.RuntimeError(f"{script} exited with status {process.returncode}")
+        if time.monotonic() > deadline:
+            stop_process(process)
+            raise fix.RuntimeError(f"{script} not ready after {timeout}s")
+        time.sleep(0.2)
+    return process
+
+
+def stop_process(process):
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def bench_loopback(args):
+    from load_generator import LoadGenerator
+
+    with sandbox():
+        market_maker = start_process("Market_maker.py", lambda: True)
+        generator = LoadGenerator("LoadGen.cfg", args.sessions, seed=args.seed)
+        try:
+            generator.start(timeout=60)
+            started = time.perf_counter()
+            report = generator.run(args.count, rate=0, drain=60)
+            elapsed = time.perf_counter() - started
+        finally:
+            generator.stop()
+            stop_process(market_maker)
+
+    histogram = LatencyHistogram()
+    for client in generator.clients:
+        for client_histogram in client.histograms.values():
+            histogram.merge(client_histogram)
+    return [result("loopback", {"sessions": args.sessions, "unanswered": report["unanswered"]},
+                   report["acked"], elapsed, histogram)]
+
+
+def http_get(path):
+    connection = http.client.HTTPConnection("127.0.0.1", HTTP_PORT, timeout=5)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, response.read().decode()
+    finally:
+        connection.close()
+
+
+def is_ready():
+    try:
+        return http_get("/ready")[0] == 200
+    except OSError:
+        return False
+
+
+def client_execution_reports():
+    """ExecutionReports received by the client so far, from /metrics"""
+    sample = 'fix_messages_total{app="client",direction="in",msg_type="8"} '
+    for line in http_get("/metrics")[1].splitlines():
+        if line.startswith(sample):
+            return int(line[len(sample):])
+    return 0
+
+
+def bench_api_command(args):
+    body = json.dumps({"command": f"buy {SYMBOL} 100 market"})
+    headers = {"Content-Type": "application/json"}
+    per_connection = args.count // args.connections
+    histograms = [LatencyHistogram() for _ in range(args.connections)]
+
+    def post_commands(histogram):
+        connection = http.client.HTTPConnection("127.0.0.1", HTTP_PORT, timeout=30)
+        try:
+            for _ in range(per_connection):
+                started = time.perf_counter_ns()
+                connection.request("POST", "/api/command", body, headers)
+                connection.getresponse().read()
+                histogram.record(time.perf_counter_ns() - started)
+        finally:
+            connection.close()
+
+    with sandbox():
+        server = start_process("main.py", is_ready)
+        try:
+            reports_before = client_execution_reports()
+            threads = [threading.Thread(target=post_commands, args=(histogram,)) for histogram in histograms]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            accepted = time.perf_counter() - started
+            sent = per_connection * args.connections
+
+            deadline = time.monotonic() + 60
+            acked = 0
+            while time.monotonic() < deadline:
+                acked = client_execution_reports() - reports_before
+                if acked >= sent:
+                    break
+                time.sleep(0.1)
+            elapsed = time.perf_counter() - started
+        finally:
+            stop_process(server)
+
+    histogram = LatencyHistogram()
+    for connection_histogram in histograms:
+        histogram.merge(connection_histogram)
+    return [
+        result("api_command", {"connections": args.connections}, sent, accepted, histogram),
+        result("api_command_acked", {"connections": args.connections, "sent": sent}, acked, elapsed)
+    ]
+
+
+BENCHMARKS = {
+    "new_order": bench_new_order,
+    "cancel": bench_cancel,
+    "logger": bench_logger,
+    "codec": bench_codec,
+    "market_data": bench_market_data,
+    "broadcast": bench_broadcast,
+    "loopback": bench_loopback,
+    "api_command": bench_api_command,
+}
+
+
+def result_key(entry):
+    return entry["name"], json.dumps({key: value for key, value in entry["params"].items()
+                                      if key not in ("dropped", "unanswered", "sent")}, sort_keys=True)
+
+
+def compare(baseline, results, tolerance):
+    """Print rate changes against a baseline run; returns the regressed results"""
+    previous = {result_key(entry): entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        old = previous.get(result_key(entry))
+        if old is None or not old["rate"] or entry["rate"] is None:
+            continue
+        change = entry["rate"] / old["rate"] - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(entry)
+            flag = "  REGRESSION"
+        print(f"{entry['name']:<24}{json.dumps(entry['params']):<40}{old['rate']:>14.0f}{entry['rate']:>14.0f}"
+              f"{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FIX hot paths")
+    parser.add_argument("--only", help=f"comma separated subset of: {','.join(BENCHMARKS)}")
+    parser.add_argument("--quick", action="store_true", help="smaller runs, no 1M order book")
+    parser.add_argument("--count", type=int, help="operations per benchmark")
+    parser.add_argument("--sessions", type=int, default=1, help="load generator sessions for loopback")
+    parser.add_argument("--connections", type=int, default=4, help="HTTP connections for api_command")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed rate drop against the baseline")
+    args = parser.parse_args()
+
+    args.count = args.count or (5000 if args.quick else 50000)
+    args.resting = (10, 10000) if args.quick else (10, 10000, 1000000)
+    args.subscribers = (1, 10, 100) if args.quick else (1, 10, 100, 1000)
+    args.clients = (1, 10, 100) if args.quick else (1, 10, 100, 1000)
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = []
+    for name in names:
+        print(f"Running {name}...")
+        try:
+            entries = BENCHMARKS[name](args)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        except (fix.ConfigError, fix.RuntimeError) as e:
+            print(f"Error in {name}: {e}")
+            continue
+        for entry in entries:
+            latency = entry["latency_us"] or {}
+            print(f"  {entry['name']:<24}{json.dumps(entry['params']):<40}{entry['rate'] or 0:>14.0f}/s"
+                  f"  p50 {latency.get('p50', '-')}us  p99 {latency.get('p99', '-')}us")
+        results.extend(entries)
+
+    output = {
+        "benchmark": "hot_paths",
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "results": results
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(output, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\n{'name':<24}{'params':<40}{'baseline/s':>14}{'now/s':>14}{'change':>9}")
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
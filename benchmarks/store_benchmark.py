@@ -0,0 +1,187 @@
+'''Message throughput per message store backend.
+
+Runs an initiator and an acceptor in this process over localhost, once per
+backend, sends NewOrderSingles as fast as possible and times how long the
+acceptor takes to receive all of them. Both sides persist every message with
+the backend under test.
+
+    python benchmarks/store_benchmark.py --count 20000
+    python benchmarks/store_benchmark.py --backends file,memory --json store.json'''
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quickfix as fix
+import quickfix44 as fix44
+
+import message_store
+
+SETTINGS = """[DEFAULT]
+StartTime=00:00:00
+EndTime=23:59:59
+HeartBtInt=30
+ResetOnLogon=Y
+PersistMessages=Y
+UseDataDictionary=N
+MessageStoreBackend={backend}
+FileStorePath={store}
+
+[SESSION]
+BeginString=FIX.4.4
+ConnectionType={connection_type}
+SenderCompID={sender}
+TargetCompID={target}
+{socket}
+"""
+
+
+class Acceptor(fix.Application):
+    def __init__(self, expected):
+        super().__init__()
+        self.expected = expected
+        self.received = 0
+        self.done = threading.Event()
+
+    def onCreate(self, session_id):
+        pass
+
+    def onLogon(self, session_id):
+        pass
+
+    def onLogout(self, session_id):
+        pass
+
+    def toAdmin(self, message, session_id):
+        pass
+
+    def fromAdmin(self, message, session_id):
+        pass
+
+    def toApp(self, message, session_id):
+        pass
+
+    def fromApp(self, message, session_id):
+        self.received += 1
+        if self.received >= self.expected:
+            self.done.set()
+
+
+class Initiator(fix.Application):
+    def __init__(self):
+        super().__init__()
+        self.session_id = None
+        self.logged_on = threading.Event()
+
+    def onCreate(self, session_id):
+        pass
+
+    def onLogon(self, session_id):
+        self.session_id = session_id
+        self.logged_on.set()
+
+    def onLogout(self, session_id):
+        pass
+
+    def toAdmin(self, message, session_id):
+        pass
+
+    def fromAdmin(self, message, session_id):
+        pass
+
+    def toApp(self, message, session_id):
+        pass
+
+    def fromApp(self, message, session_id):
+        pass
+
+
+def write_settings(directory, name, backend, **fields):
+    path = os.path.join(directory, f"{name}.cfg")
+    with open(path, "w") as f:
+        f.write(SETTINGS.format(backend=backend, store=os.path.join(directory, f"store_{name}"), **fields))
+    return fix.SessionSettings(path)
+
+
+def run_backend(backend, count, port):
+    directory = tempfile.mkdtemp(prefix=f"store_bench_{backend}_")
+    acceptor_app = Acceptor(count)
+    initiator_app = Initiator()
+    acceptor_factory, acceptor_settings = message_store.store_factory(write_settings(
+        directory, "acceptor", backend, connection_type="acceptor", sender="BENCH_MM", target="BENCH_CLIENT",
+        socket=f"SocketAcceptPort={port}"))
+    initiator_factory, initiator_settings = message_store.store_factory(write_settings(
+        directory, "initiator", backend, connection_type="initiator", sender="BENCH_CLIENT", target="BENCH_MM",
+        socket=f"SocketConnectHost=127.0.0.1\nSocketConnectPort={port}\nReconnectInterval=1"))
+    acceptor = fix.SocketAcceptor(acceptor_app, acceptor_factory, acceptor_settings)
+    initiator = fix.SocketInitiator(initiator_app, initiator_factory, initiator_settings)
+    try:
+        acceptor.start()
+        initiator.start()
+        if not initiator_app.logged_on.wait(30):
+            raise fix.RuntimeError(f"{backend}: loopback session did not log on")
+
+        order = fix44.NewOrderSingle()
+        order.setField(fix.Symbol("USD/BRL"))
+        order.setField(fix.Side(fix.Side_BUY))
+        order.setField(fix.OrderQty(100))
+        order.setField(fix.OrdType(fix.OrdType_LIMIT))
+        order.setField(fix.Price(5.1))
+        started = time.perf_counter()
+        for i in range(count):
+            order.setField(fix.ClOrdID(str(i)))
+            order.setField(fix.TransactTime())
+            fix.Session.sendToTarget(order, initiator_app.session_id)
+        sent = time.perf_counter() - started
+        acceptor_app.done.wait(max(60, count / 1000))
+        elapsed = time.perf_counter() - started
+    finally:
+        initiator.stop()
+        acceptor.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+        shutil.rmtree(os.path.join(message_store.SHM_ROOT, directory.lstrip("/")), ignore_errors=True)
+
+    return {
+        "backend": backend,
+        "count": count,
+        "received": acceptor_app.received,
+        "send_seconds": round(sent, 4),
+        "seconds": round(elapsed, 4),
+        "send_rate": round(count / sent, 1) if sent else None,
+        "rate": round(acceptor_app.received / elapsed, 1) if elapsed else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare message throughput across message store backends")
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--backends", default=",".join(message_store.BACKENDS))
+    parser.add_argument("--port", type=int, default=5101)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for offset, backend in enumerate(args.backends.split(",")):
+        if backend == "shm" and not os.path.isdir(message_store.SHM_ROOT):
+            print(f"Skipping shm: {message_store.SHM_ROOT} not available")
+            continue
+        # A fresh port per run so a lingering socket from the previous backend cannot interfere
+        result = run_backend(backend, args.count, args.port + offset)
+        results.append(result)
+        print(f"{backend:<8} {result['received']:>8}/{result['count']} messages in {result['seconds']:.3f}s "
+              f"({result['rate']:.0f} msg/s, sending {result['send_rate']:.0f} msg/s)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "message_store", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
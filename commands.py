@@ -0,0 +1,157 @@
+'''The order entry command language, shared by the CLI, the GUI and playback.
+
+    buy|sell SYMBOL QUANTITY [market | limit PRICE | stop STOP_PRICE | stop_limit STOP_PRICE PRICE]
+    cancel CLORDID                  status CLORDID
+    cancel all [SYMBOL] [buy|sell]  status all [SYMBOL] [buy|sell]
+    replace CLORDID QUANTITY [PRICE]
+    subscribe [SYMBOL]              unsubscribe
+
+parse() turns a line into a command dict, for example
+
+    parse("buy USD/BRL 100 limit 5.1")
+    {'action': 'order', 'side': '1', 'symbol': 'USD/BRL', 'quantity': '100',
+     'orderType': '2', 'price': '5.1', 'stopPrice': None}
+
+and Client.execute() carries it out. Values stay strings, as typed; FIX
+enums are the raw tag values so this module does not need quickfix.
+to_fields() renders a command as FIX (tag, value) pairs for display, and
+to_pipe() a command line as the order feed shows it.'''
+
+import fix_codec
+
+SIDES = {'buy': '1', 'sell': '2'}
+# Order type word -> (OrdType, the price fields it takes in order)
+ORDER_TYPES = {
+    'market': ('1', ()),
+    'limit': ('2', ('price',)),
+    'stop': ('3', ('stopPrice',)),
+    'stop_limit': ('4', ('stopPrice', 'price'))
+}
+USAGE = {
+    'order': "buy/sell symbol quantity [order_type] [price] [stop_price]",
+    'cancel': "cancel [OrigClOrdID]",
+    'status': "status [ClOrdID]",
+    'replace': "replace [OrigClOrdID] quantity [price]"
+}
+
+
+class CommandError(ValueError):
+    pass
+
+
+def parse(line):
+    """Command dict for one command line; raises CommandError if it is not valid"""
+    parts = line.split()
+    if not parts:
+        raise CommandError("Empty command")
+    parser = _PARSERS.get(parts[0].lower())
+    if parser is None:
+        raise CommandError(f"Invalid action: {parts[0]}. Please try again.")
+    return parser(parts[0].lower(), parts[1:])
+
+
+def missing(command):
+    """Price fields the command's order type needs but were not given"""
+    if command['action'] != 'order':
+        return []
+    for order_type, names in ORDER_TYPES.values():
+        if order_type == command['orderType']:
+            return [name for name in names if command.get(name) is None]
+    return []
+
+
+def parse_order(word, args):
+    if len(args) < 2:
+        raise CommandError(f"Invalid order command. Use format: {USAGE['order']}")
+    command = {'action': 'order', 'side': SIDES[word], 'symbol': args[0], 'quantity': args[1],
+               'orderType': '1', 'price': None, 'stopPrice': None}
+    if len(args) > 2:
+        order_type = ORDER_TYPES.get(args[2].lower())
+        if order_type is None:
+            # The CLI has always fallen back to a market order here
+            command['warning'] = "Invalid order type. Using market order."
+        else:
+            command['orderType'] = order_type[0]
+            for name, value in zip(order_type[1], args[3:]):
+                command[name] = value
+    return command
+
+
+def parse_cancel_or_status(word, args):
+    if args and args[0].lower() == 'all':
+        symbol, side = parse_mass_scope(args[1:])
+        return {'action': f"{word}_all", 'symbol': symbol, 'side': side}
+    if not args:
+        raise CommandError(f"Invalid {word} command. Use format: {USAGE[word]}")
+    return {'action': word, 'clOrdID': args[0]}
+
+
+def parse_replace(word, args):
+    if len(args) < 2:
+        raise CommandError(f"Invalid replace command. Use format: {USAGE['replace']}")
+    return {'action': 'replace', 'clOrdID': args[0], 'quantity': args[1], 'price': args[2] if len(args) > 2 else None}
+
+
+def parse_subscribe(word, args):
+    return {'action': 'subscribe', 'symbol': args[0] if args else 'USD/BRL'}
+
+
+def parse_unsubscribe(word, args):
+    return {'action': 'unsubscribe'}
+
+
+def parse_mass_scope(args):
+    """Parse the optional '[symbol] [buy|sell]' scope of 'cancel all' / 'status all'"""
+    symbol = None
+    side = None
+    for arg in args:
+        if arg.lower() in SIDES:
+            side = SIDES[arg.lower()]
+        else:
+            symbol = arg
+    return symbol, side
+
+
+_PARSERS = {
+    'buy': parse_order,
+    'sell': parse_order,
+    'cancel': parse_cancel_or_status,
+    'status': parse_cancel_or_status,
+    'replace': parse_replace,
+    'subscribe': parse_subscribe,
+    'unsubscribe': parse_unsubscribe
+}
+
+
+def to_fields(command):
+    """FIX (tag, value) pairs describing a parsed command, for the order feed display"""
+    action = command['action']
+    if action == 'order':
+        fields = [(35, 'buy' if command['side'] == '1' else 'sell'), (54, command['side']),
+                  (55, command['symbol']), (38, command['quantity']), (40, command['orderType'])]
+        if command['stopPrice'] is not None:
+            fields.append((99, command['stopPrice']))
+        if command['price'] is not None:
+            fields.append((44, command['price']))
+        return fields
+    if action in ('cancel', 'status'):
+        return [(35, action), (11, command['clOrdID'])]
+    if action == 'replace':
+        fields = [(35, action), (41, command['clOrdID']), (38, command['quantity'])]
+        if command['price'] is not None:
+            fields.append((44, command['price']))
+        return fields
+    fields = [(35, action.replace('_all', ' all'))]
+    if command.get('symbol'):
+        fields.append((55, command['symbol']))
+    if command.get('side'):
+        fields.append((54, command['side']))
+    return fields
+
+
+def to_pipe(line):
+    """A command line as " | " delimited FIX fields, or the line as typed if it does not parse"""
+    try:
+        return fix_codec.render_pipe(to_fields(parse(line)))
+    except CommandError:
+        return line
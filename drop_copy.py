@@ -0,0 +1,272 @@
+'''Drop copy: every ExecutionReport the market maker sends, for risk and booking.
+
+MarketMaker.send hands each ExecutionReport, after it has gone out on the
+trading session, to a DropCopyPublisher. A writer thread takes them off a
+queue in batches, numbers them and appends one JSON object per line to
+FIX_DROP_COPY_DIR/executions.jsonl (default drop_copy/):
+
+    {"seq": 1, "time": 1704153600123456789, "session": "FIX.4.4:MARKET_MAKER->CLIENT",
+     "fields": {"8": "FIX.4.4", "35": "8", "37": "4321000", "11": "...", "150": "0", ...}}
+
+seq starts at 1 and continues across restarts. An index (executions.idx,
+int64 seq/offset pairs every INDEX_INTERVAL records) lets a consumer that
+reconnects resume after the last seq it processed without reading the whole
+file:
+
+    python drop_copy.py tail --after 1500 --follow
+
+The same batches are also sent as FIX copies (CopyMsgIndicator=Y, with the
+original counterparty in DeliverToCompID) on every Server.cfg session marked
+DropCopy=Y. A FIX consumer resumes with its normal sequence numbers: copies
+sent while it is logged out are kept in the session's message store and
+resent when it asks for them.
+
+Nothing is done on the trading session's thread beyond serializing the
+report and queueing it, after the report has been sent.'''
+
+import argparse
+import bisect
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import quickfix as fix
+
+import fix_codec
+
+DROP_COPY_DIRECTORY = os.environ.get('FIX_DROP_COPY_DIR', 'drop_copy')
+FEED_NAME = 'executions.jsonl'
+INDEX_NAME = 'executions.idx'
+INDEX_INTERVAL = 1024
+INDEX_ENTRY = struct.Struct('<qq')
+WRITE_BATCH = 1000
+POLL_INTERVAL = 0.2
+# Bytes read back from the end of the feed on startup to find the last record; doubled until it holds one
+RECOVER_WINDOW = 65536
+
+
+def drop_copy_sessions(settings):
+    """SessionIDs (as strings) of the sessions marked DropCopy=Y in a SessionSettings"""
+    sessions = set()
+    for session_id in settings.getSessions():
+        dictionary = settings.get(session_id)
+        if dictionary.has('DropCopy') and dictionary.getString('DropCopy').upper() == 'Y':
+            sessions.add(session_id.toString())
+    return sessions
+
+
+def send_copies(copies, session_id):
+    """Send FIX copies to one drop copy session"""
+    for copy in copies:
+        fix.Session.sendToTarget(copy, session_id)
+
+
+def feed_paths(root=DROP_COPY_DIRECTORY):
+    return os.path.join(root, FEED_NAME), os.path.join(root, INDEX_NAME)
+
+
+def read_index(index_path):
+    """[(seq, offset), ...] of the indexed records, in seq order"""
+    if not os.path.exists(index_path):
+        return []
+    with open(index_path, 'rb') as f:
+        data = f.read()
+    usable = len(data) - len(data) % INDEX_ENTRY.size
+    return list(INDEX_ENTRY.iter_unpack(data[:usable]))
+
+
+class DropCopyPublisher:
+    def __init__(self, root=DROP_COPY_DIRECTORY, sessions=(), send=send_copies):
+        self.root = root
+        # SessionIDs (strings) that receive FIX copies
+        self.sessions = set(sessions)
+        # send(copies, session_id), called on the writer thread; MarketMaker sends them quietly, see send_drop_copies
+        self.send = send
+        # Unbounded: a drop copy must not lose executions, and put() never blocks
+        self.queue = queue.SimpleQueue()
+        self.published = 0
+        self.written = 0
+        self.errors = 0
+        self.last_seq = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def is_drop_copy(self, session_id):
+        return session_id.toString() in self.sessions
+
+    def publish(self, raw, session_id, sent_at=None):
+        """Queue one sent ExecutionReport; sent_at is ns since epoch"""
+        if self._writer is None:
+            self.start()
+        self.queue.put((time.time_ns() if sent_at is None else sent_at, raw, session_id.toString()))
+        self.published += 1
+
+    def start(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write, name="drop-copy-writer", daemon=True)
+                self._writer.start()
+
+    def close(self, timeout=5):
+        """Write out what is queued and stop the writer"""
+        if self._writer is not None:
+            self.queue.put(None)
+            self._writer.join(timeout)
+            self._writer = None
+
+    def _write(self):
+        os.makedirs(self.root, exist_ok=True)
+        feed_path, index_path = feed_paths(self.root)
+        self.last_seq = self._recover(feed_path, index_path)
+        with open(feed_path, 'ab') as feed, open(index_path, 'ab') as index:
+            while True:
+                entry = self.queue.get()
+                if entry is None:
+                    return
+                batch = [entry]
+                closing = False
+                while len(batch) < WRITE_BATCH:
+                    try:
+                        entry = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is None:
+                        closing = True
+                        break
+                    batch.append(entry)
+                try:
+                    self._append(feed, index, batch)
+                    self._send_copies(batch)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error publishing drop copy: {e}")
+                if closing:
+                    return
+
+    def _append(self, feed, index, batch):
+        lines = []
+        index_entries = []
+        offset = feed.tell()
+        for sent_at, raw, session in batch:
+            self.last_seq += 1
+            line = json.dumps({
+                'seq': self.last_seq,
+                'time': sent_at,
+                'session': session,
+                'fields': {str(tag): value for tag, value in fix_codec.scan(raw)}
+            }, separators=(',', ':')).encode() + b'\n'
+            if self.last_seq % INDEX_INTERVAL == 1:
+                index_entries.append(INDEX_ENTRY.pack(self.last_seq, offset))
+            offset += len(line)
+            lines.append(line)
+        feed.write(b''.join(lines))
+        feed.flush()
+        if index_entries:
+            index.write(b''.join(index_entries))
+            index.flush()
+        self.written += len(batch)
+
+    def _send_copies(self, batch):
+        for session in sorted(self.sessions):
+            copies = []
+            for sent_at, raw, _ in batch:
+                copy = fix.Message(raw)
+                target = fix_codec.get_field(raw, 56)
+                if target:
+                    copy.getHeader().setField(128, target)  # DeliverToCompID
+                copy.setField(797, 'Y')  # CopyMsgIndicator
+                copies.append(copy)
+            session_id = fix.SessionID(*session_key(session))
+            try:
+                self.send(copies, session_id)
+            except fix.SessionNotFound as e:
+                print(f"Drop copy session {session_id} not found: {e}")
+
+    def _recover(self, feed_path, index_path):
+        """Last seq in the feed; drops a record or index entry left half written by a crash"""
+        last_seq = 0
+        size = 0
+        if os.path.exists(feed_path):
+            with open(feed_path, 'rb+') as f:
+                size = f.seek(0, os.SEEK_END)
+                window = RECOVER_WINDOW
+                while True:
+                    position = max(0, size - window)
+                    f.seek(position)
+                    tail = f.read()
+                    end = tail.rfind(b'\n')
+                    # Done once the tail holds the last complete line from its start
+                    if position == 0 or (end >= 0 and tail.rfind(b'\n', 0, end) >= 0):
+                        break
+                    window *= 2
+                if end + 1 < len(tail):
+                    size = position + end + 1
+                    f.truncate(size)
+                    print(f"Dropped a partial drop copy record at offset {size}")
+                    tail = tail[:end + 1]
+                lines = tail.splitlines()
+                if lines:
+                    last_seq = json.loads(lines[-1])['seq']
+
+        entries = [entry for entry in read_index(index_path) if entry[1] < size]
+        if os.path.exists(index_path) and os.path.getsize(index_path) != len(entries) * INDEX_ENTRY.size:
+            with open(index_path, 'wb') as f:
+                f.write(b''.join(INDEX_ENTRY.pack(*entry) for entry in entries))
+        return last_seq
+
+
+def session_key(session_id):
+    """(BeginString, SenderCompID, TargetCompID) from a 'FIX.4.4:SENDER->TARGET' SessionID string"""
+    begin_string, _, rest = session_id.partition(':')
+    sender, _, target = rest.partition('->')
+    return begin_string, sender, target
+
+
+def read(after=0, root=DROP_COPY_DIRECTORY):
+    """Records with seq > after, in order"""
+    feed_path, index_path = feed_paths(root)
+    if not os.path.exists(feed_path):
+        return
+    index = read_index(index_path)
+    position = bisect.bisect_right(index, (after + 1, float('inf'))) - 1
+    offset = index[position][1] if position >= 0 else 0
+    with open(feed_path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                return  # still being written
+            record = json.loads(line)
+            if record['seq'] > after:
+                yield record
+
+
+def follow(after=0, root=DROP_COPY_DIRECTORY, poll_interval=POLL_INTERVAL):
+    """Like read(), then keep waiting for new records"""
+    while True:
+        for record in read(after, root):
+            after = record['seq']
+            yield record
+        time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the market maker's drop copy feed")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    tail_parser = subparsers.add_parser('tail', help="print records as JSON lines")
+    tail_parser.add_argument('--after', type=int, default=0, help="resume after this seq")
+    tail_parser.add_argument('--follow', action='store_true', help="keep printing new records")
+    tail_parser.add_argument('--directory', default=DROP_COPY_DIRECTORY)
+    args = parser.parse_args()
+
+    records = (follow if args.follow else read)(args.after, args.directory)
+    try:
+        for record in records:
+            print(json.dumps(record, separators=(',', ':')), flush=True)
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+
+
+if __name__ == '__main__':
+    main()
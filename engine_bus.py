@@ -0,0 +1,239 @@
+'''Event bus between the FIX engine process and the web tier.
+
+The engine process (fix_engine.py) listens on a Unix domain socket; every web
+worker connects to it. Messages are newline-delimited JSON in both directions:
+
+    engine -> web    {"type": "order_update", ...}        event, fanned out to every worker
+    web -> engine    {"id": 7, "op": "place_order", "args": {...}}
+    engine -> web    {"id": 7, "result": ...} or {"id": 7, "error": "..."}
+
+Each event is serialized once and queued on every worker connection; a worker
+that stops reading loses its oldest events rather than stalling the FIX
+threads that publish them.'''
+
+import asyncio
+import itertools
+import json
+import os
+import queue
+import socket
+import threading
+
+DEFAULT_SOCKET = "/tmp/fix_engine.sock"
+# Events queued per web worker before the oldest are dropped
+CONNECTION_QUEUE_SIZE = 10000
+# How often an idle writer checks whether its worker is still connected
+WRITER_POLL_INTERVAL = 1.0
+
+
+def engine_socket_path():
+    """Socket from FIX_ENGINE_SOCKET; set in the web tier it also selects remote engine mode"""
+    return os.environ.get("FIX_ENGINE_SOCKET")
+
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode()
+
+
+def offer(outbox, payload):
+    """Queue payload without blocking, dropping the oldest entries while the queue is full.
+
+    Returns how many entries were dropped. Safe with several threads offering
+    to the same queue at once."""
+    dropped = 0
+    while True:
+        try:
+            outbox.put_nowait(payload)
+            return dropped
+        except queue.Full:
+            try:
+                outbox.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class EngineServer:
+    """Engine side: accepts web workers, fans events out and runs their requests through handler(op, args)"""
+
+    def __init__(self, path, handler, queue_size=CONNECTION_QUEUE_SIZE):
+        self.path = path
+        self.handler = handler
+        self.queue_size = queue_size
+        self.connections = set()
+        self.dropped_events = 0
+        self._lock = threading.Lock()
+        self._socket = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.bind(self.path)
+        # Workers can place orders through the socket: only this user may connect, and not before this
+        os.chmod(self.path, 0o600)
+        self._socket.listen()
+        threading.Thread(target=self._accept, name="engine-bus-accept", daemon=True).start()
+        print(f"Engine bus listening on {self.path}")
+
+    def stop(self):
+        self._stop.set()
+        if self._socket is not None:
+            self._socket.close()
+        with self._lock:
+            connections = list(self.connections)
+        for connection in connections:
+            offer(connection, None)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def publish(self, event):
+        """Queue an event for every connected worker; safe to call from any thread"""
+        payload = encode(event)
+        with self._lock:
+            connections = list(self.connections)
+        for outbox in connections:
+            self.dropped_events += offer(outbox, payload)
+
+    def _accept(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._socket.accept()
+            except OSError:
+                break
+            outbox = queue.Queue(self.queue_size)
+            with self._lock:
+                self.connections.add(outbox)
+            threading.Thread(target=self._write, args=(conn, outbox), name="engine-bus-writer", daemon=True).start()
+            threading.Thread(target=self._read, args=(conn, outbox), name="engine-bus-reader", daemon=True).start()
+            print(f"Web worker connected to engine bus ({len(self.connections)} connected)")
+
+    def _write(self, conn, outbox):
+        try:
+            while True:
+                try:
+                    payload = outbox.get(timeout=WRITER_POLL_INTERVAL)
+                except queue.Empty:
+                    # The None that ends the connection can itself be dropped by a full outbox
+                    if self._stop.is_set() or outbox not in self.connections:
+                        break
+                    continue
+                if payload is None:
+                    break
+                # Coalesce whatever else is already queued into one send
+                chunks = [payload]
+                while len(chunks) < 256:
+                    try:
+                        payload = outbox.get_nowait()
+                    except queue.Empty:
+                        break
+                    if payload is None:
+                        break
+                    chunks.append(payload)
+                conn.sendall(b"".join(chunks))
+                if payload is None:
+                    break
+        except OSError:
+            pass
+        finally:
+            self._drop(conn, outbox)
+
+    def _read(self, conn, outbox):
+        try:
+            for line in conn.makefile("rb"):
+                request = {}
+                try:
+                    request = json.loads(line)
+                    reply = {"id": request.get("id"), "result": self.handler(request["op"], request.get("args") or {})}
+                except Exception as e:
+                    reply = {"id": request.get("id") if isinstance(request, dict) else None, "error": str(e)}
+                # Never block the reader on a worker that stops reading; its oldest events go first
+                self.dropped_events += offer(outbox, encode(reply))
+        except (OSError, ValueError):
+            pass
+        finally:
+            offer(outbox, None)
+            self._drop(conn, outbox)
+
+    def _drop(self, conn, outbox):
+        with self._lock:
+            if outbox not in self.connections:
+                return
+            self.connections.discard(outbox)
+        try:
+            conn.close()
+        except OSError:
+            pass
+        print(f"Web worker disconnected from engine bus ({len(self.connections)} connected)")
+
+
+class EngineConnection:
+    """Web tier side: receives engine events on the event loop and sends requests to the engine"""
+
+    def __init__(self, path, on_event):
+        self.path = path
+        self.on_event = on_event
+        self.connected = False
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._reader = None
+        self._writer = None
+        self._task = None
+
+    async def connect(self, timeout=30.0, retry_interval=0.5):
+        """Connect, retrying until the engine process has created its socket"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            try:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.path, limit=2 ** 24)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if asyncio.get_running_loop().time() > deadline:
+                    raise
+                await asyncio.sleep(retry_interval)
+        self.connected = True
+        self._task = asyncio.create_task(self._read())
+
+    async def close(self):
+        self.connected = False
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+    async def call(self, op, timeout=10.0, **args):
+        """Run op in the engine process and return its result"""
+        if not self.connected:
+            raise ConnectionError("Not connected to the FIX engine")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(encode({"id": request_id, "op": op, "args": args}))
+            await self._writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _read(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if "type" in message:
+                    await self.on_event(message)
+                    continue
+                future = self._pending.get(message.get("id"))
+                if future is not None and not future.done():
+                    if "error" in message:
+                        future.set_exception(RuntimeError(message["error"]))
+                    else:
+                        future.set_result(message.get("result"))
+        finally:
+            self.connected = False
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("FIX engine connection closed"))
@@ -2,9 +2,13 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import itertools
 import logging
 import os
 import json
+from collections import deque
+from market_data import MarketDataCache, encode_json, encode_binary
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -13,97 +17,285 @@ app = FastAPI()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Outbound queue per WebSocket; a client that falls this far behind is a slow consumer
+WS_QUEUE_SIZE = int(os.environ.get("WS_QUEUE_SIZE", "1000"))
+# "drop_oldest" discards the oldest queued message, "disconnect" closes the connection
+WS_SLOW_CONSUMER_POLICY = os.environ.get("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+# Events kept for replay to new and reconnecting clients
+WS_REPLAY_CAPACITY = int(os.environ.get("WS_REPLAY_CAPACITY", "5000"))
+# Replayed events per WebSocket frame
+WS_REPLAY_BATCH = 500
+# Default cap on conflated market data frames per second per client; clients can ask for less with ?md_rate=
+WS_MD_MAX_RATE = float(os.environ.get("WS_MD_MAX_RATE", "4"))
+
+# Topic that matches every event; new connections subscribe to it unless they ask for topics
+ALL_TOPICS = "*"
+# FIX tag -> topic prefix; session topics are both CompIDs
+TOPIC_TAGS = {"35": "msgtype", "55": "symbol", "11": "clordid", "41": "clordid", "49": "session", "56": "session"}
+
+
+def event_topics(channel: str, message: str) -> frozenset[str]:
+    """Topics of a " | " delimited FIX message, e.g. msgtype:8, symbol:USD/BRL, clordid:123, session:CLIENT"""
+    topics = {f"channel:{channel}"}
+    for part in message.split(" | "):
+        tag, _, value = part.partition("=")
+        prefix = TOPIC_TAGS.get(tag.strip())
+        if prefix and value:
+            topics.add(f"{prefix}:{value.strip()}")
+    return frozenset(topics)
+
+
+class EventLog:
+    """Fixed-capacity ring of serialized events numbered by a monotonically increasing seq"""
+
+    def __init__(self, capacity: int = WS_REPLAY_CAPACITY):
+        # (payload, topics)
+        self.events: deque[tuple[str, frozenset[str]]] = deque(maxlen=capacity)
+        self.last_seq = 0
+
+    @property
+    def first_seq(self) -> int:
+        return self.last_seq - len(self.events) + 1
+
+    def append(self, event: dict, topics: frozenset[str] = frozenset()) -> str:
+        """Number and serialize an event once; the payload is what every client is sent"""
+        self.last_seq += 1
+        event["seq"] = self.last_seq
+        payload = json.dumps(event, separators=(",", ":"))
+        self.events.append((payload, topics))
+        return payload
+
+    def since(self, seq: int | None = None, topics: set[str] | None = None) -> tuple[list[str], bool]:
+        """Events after seq (all retained events if None) matching topics, and whether none were lost to the ring"""
+        if seq is not None and seq >= self.last_seq:
+            return [], True
+        skip = 0 if seq is None else max(0, seq + 1 - self.first_seq)
+        complete = seq is None or seq + 1 >= self.first_seq
+        events = itertools.islice(self.events, skip, None)
+        if topics is None or ALL_TOPICS in topics:
+            return [payload for payload, _ in events], complete
+        return [payload for payload, event_topics in events if not topics.isdisjoint(event_topics)], complete
+
+
+class ClientConnection:
+    """A WebSocket with its own bounded outbound queue drained by a sender task"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.sender: asyncio.Task | None = None
+        # Conflated market data: min seconds between frames (None: not subscribed), encoding, last version sent
+        self.md_interval: float | None = None
+        self.md_format = "json"
+        self.md_version = 0
+        self.md_next = 0.0
+        self.topics: set[str] = set()
+
+    def symbols(self) -> set[str] | None:
+        """Symbols this client wants market data for, None for all"""
+        if ALL_TOPICS in self.topics:
+            return None
+        return {topic[7:] for topic in self.topics if topic.startswith("symbol:")}
+
+
 # Add ConnectionManager class
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: set[WebSocket] = set()
-        self.market_maker_output = []
+    def __init__(self, queue_size: int = WS_QUEUE_SIZE, slow_consumer_policy: str = WS_SLOW_CONSUMER_POLICY):
+        self.active_connections: dict[WebSocket, ClientConnection] = {}
+        # topic -> connections subscribed to it
+        self.subscribers: dict[str, set[ClientConnection]] = {}
+        self.event_log = EventLog()
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.send_failures = 0
+        self.dropped_messages = 0
+        self.slow_consumer_disconnects = 0
+        self.market_data: MarketDataCache | None = None
+        self.market_data_wakeup = asyncio.Event()
 
-    def format_fix_message(self, message: str) -> str:
-        """Format FIX message with proper delimiters and clean structure"""
-        try:
-            # Split the message into parts
-            parts = message.split(chr(1))
-            # Filter out empty parts and format each tag-value pair
-            formatted_parts = []
-            for part in parts:
-                if part.strip():
-                    if '=' in part:
-                        tag, value = part.split('=', 1)
-                        formatted_parts.append(f"{tag.strip()}={value.strip()}")
-            # Join with proper delimiter
-            return " | ".join(formatted_parts)
-        except Exception as e:
-            logger.error(f"Error formatting FIX message: {e}")
-            return message
-
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, since: int | None = None,
+                      md_rate: float = WS_MD_MAX_RATE, md_format: str = "json", topics: list[str] | None = None):
+        """Register a client and queue the events it missed: everything retained, or only those after since"""
         await websocket.accept()
-        self.active_connections.add(websocket)
+        connection = ClientConnection(websocket, self.queue_size)
+        self.subscribe(connection, topics or [ALL_TOPICS])
+        if md_rate > 0:
+            connection.md_interval = 1.0 / min(md_rate, WS_MD_MAX_RATE)
+            connection.md_format = "binary" if md_format == "binary" else "json"
+        self.active_connections[websocket] = connection
+        connection.sender = asyncio.create_task(self._sender(connection))
         logger.info(f"New WebSocket connection. Total connections: {len(self.active_connections)}")
-        # Send initial market maker output history with formatted messages
-        for message in self.market_maker_output:
-            await websocket.send_json({
-                "type": "maker_output",
-                "message": self.format_fix_message(message)
-            })
-
-
+        # Nothing awaits between the snapshot and registration, so live events follow the replay without a gap
+        events, complete = self.event_log.since(since, connection.topics)
+        for start in range(0, len(events), WS_REPLAY_BATCH):
+            batch = events[start:start + WS_REPLAY_BATCH]
+            self._enqueue(connection, '{"type":"replay","complete":%s,"events":[%s]}'
+                          % ("true" if complete else "false", ",".join(batch)))
+        if not events:
+            self._enqueue(connection, json.dumps({"type": "replay", "complete": complete, "events": [],
+                                                  "seq": self.event_log.last_seq}))
+        if connection.md_interval is not None and self.market_data is not None:
+            # md_version 0: the next market data frame carries every symbol
+            self.market_data_wakeup.set()
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        connection = self.active_connections.pop(websocket, None)
+        if connection is None:
+            return
+        self.unsubscribe(connection, list(connection.topics))
+        if connection.sender is not None and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
         logger.info(f"WebSocket disconnected. Remaining connections: {len(self.active_connections)}")
 
-    async def broadcast_market_data(self, data: str):
-        """Specifically handle market data messages"""
-        message = {
-            "type": "market_data",
-            "data": data
-        }
-        await self.broadcast(json.dumps(message))
+    def subscribe(self, connection: ClientConnection, topics: list[str]):
+        for topic in topics:
+            self.subscribers.setdefault(topic, set()).add(connection)
+            connection.topics.add(topic)
+
+    def unsubscribe(self, connection: ClientConnection, topics: list[str]):
+        for topic in topics:
+            connection.topics.discard(topic)
+            subscribers = self.subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self.subscribers[topic]
+
+    async def handle_control(self, websocket: WebSocket, text: str):
+        """Apply a {"action": "subscribe"|"unsubscribe", "topics": [...]} frame and echo the subscriptions"""
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return
+        try:
+            frame = json.loads(text)
+            action = frame["action"]
+            topics = [str(topic) for topic in frame.get("topics", [])]
+        except (ValueError, KeyError, TypeError):
+            self._enqueue(connection, json.dumps({"type": "error", "message": f"Invalid control frame: {text}"}))
+            return
+        if action == "subscribe":
+            self.subscribe(connection, topics)
+        elif action == "unsubscribe":
+            self.unsubscribe(connection, topics)
+        else:
+            self._enqueue(connection, json.dumps({"type": "error", "message": f"Unknown action: {action}"}))
+            return
+        connection.md_version = 0
+        self.market_data_wakeup.set()
+        self._enqueue(connection, json.dumps({"type": "subscriptions", "topics": sorted(connection.topics)}))
+
+    def audience(self, topics: frozenset[str]) -> set[ClientConnection]:
+        """Connections subscribed to any of topics, or to everything"""
+        audience = set(self.subscribers.get(ALL_TOPICS, ()))
+        for topic in topics:
+            subscribers = self.subscribers.get(topic)
+            if subscribers:
+                audience |= subscribers
+        return audience
+
+    async def _sender(self, connection: ClientConnection):
+        """Drain one connection's queue; only this task ever awaits on its socket"""
+        try:
+            while True:
+                message = await connection.queue.get()
+                if isinstance(message, bytes):
+                    await connection.websocket.send_bytes(message)
+                else:
+                    await connection.websocket.send_text(message)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error sending to WebSocket: {e}")
+            self.send_failures += 1
+            self.disconnect(connection.websocket)
+
+    def _enqueue(self, connection: ClientConnection, message: str):
+        try:
+            connection.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            if self.slow_consumer_policy == "disconnect":
+                self.slow_consumer_disconnects += 1
+                self.disconnect(connection.websocket)
+                asyncio.create_task(self._close(connection.websocket))
+                return
+            connection.queue.get_nowait()
+            connection.queue.put_nowait(message)
+            connection.dropped += 1
+            self.dropped_messages += 1
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            # 1008 policy violation: the client could not keep up
+            await websocket.close(code=1008)
+        except Exception:
+            pass
 
     async def broadcast_maker_output(self, message: str):
-        """Handle market maker output messages"""
-        # Only broadcast non-market data messages as maker output
-        if not self._is_market_data_message(message):
-            ws_message = {
-                "type": "maker_output",
-                "message": message
-            }
-            await self.broadcast(json.dumps(ws_message))
+        """Publish a formatted market maker message; callers leave out market data (see market_data.is_market_data)"""
+        await self.publish({
+            "type": "maker_output",
+            "message": message
+        }, event_topics("maker_output", message))
 
     async def broadcast_order_update(self, message: str):
-        """Handle order update messages"""
-        # Only broadcast if it's a genuine order update
-        if not self._is_market_data_message(message):
-            ws_message = {
-                "type": "order_update",
-                "order": message
-            }
-            await self.broadcast(json.dumps(ws_message))
-
-    def _is_market_data_message(self, message: str) -> bool:
-        """Helper method to identify market data messages"""
-        # Check if message contains market data indicators
-        market_data_indicators = [
-            "MarketDataSnapshotFullRefresh",
-            "MDEntryType",
-            "MDReqID",
-            "NoMDEntries"
-        ]
-        return any(indicator in message for indicator in market_data_indicators)
+        """Publish a formatted client message; callers leave out market data (see market_data.is_market_data)"""
+        await self.publish({
+            "type": "order_update",
+            "order": message
+        }, event_topics("order_update", message))
 
-    async def broadcast(self, message: str):
-        disconnected = set()
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except Exception as e:
-                logger.error(f"Error broadcasting message: {e}")
-                disconnected.add(connection)
+    def attach_market_data(self, cache: MarketDataCache, loop: asyncio.AbstractEventLoop):
+        """Serve cache over the conflated market data channel; on_change fires on the FIX thread"""
+        self.market_data = cache
+        cache.on_change = lambda: loop.call_soon_threadsafe(self.market_data_wakeup.set)
+
+    async def run_market_data(self):
+        """Push the symbols changed since each client's last frame, at most once per md_interval.
 
-        for connection in disconnected:
-            self.active_connections.remove(connection)
+        Clients at the same version with the same encoding share one encoded frame."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.market_data_wakeup.wait()
+            self.market_data_wakeup.clear()
+            if self.market_data is None:
+                continue
+            self.market_data.acknowledge()
+            now = loop.time()
+            frames = {}
+            next_due = None
+            for connection in list(self.active_connections.values()):
+                if connection.md_interval is None or connection.md_version == self.market_data.version:
+                    continue
+                if now < connection.md_next:
+                    next_due = connection.md_next if next_due is None else min(next_due, connection.md_next)
+                    continue
+                symbols = connection.symbols()
+                key = (connection.md_version, connection.md_format, frozenset(symbols) if symbols is not None else None)
+                frame = frames.get(key)
+                if frame is None:
+                    changed, version = self.market_data.changed_since(connection.md_version)
+                    if symbols is not None:
+                        changed = [(symbol, book) for symbol, book in changed if symbol in symbols]
+                    encode = encode_binary if connection.md_format == "binary" else encode_json
+                    frame = frames[key] = (encode(changed, version) if changed else None, version)
+                if frame[0] is not None:
+                    self._enqueue(connection, frame[0])
+                connection.md_version = frame[1]
+                connection.md_next = now + connection.md_interval
+            if next_due is not None:
+                loop.call_at(next_due, self.market_data_wakeup.set)
+
+    async def publish(self, event: dict, topics: frozenset[str] = frozenset()):
+        """Record an event in the replay log and send it to the clients subscribed to its topics"""
+        payload = self.event_log.append(event, topics)
+        for connection in self.audience(topics):
+            self._enqueue(connection, payload)
+
+    async def broadcast(self, message: str):
+        """Queue an already serialized message on every connection; never waits on a socket"""
+        for connection in list(self.active_connections.values()):
+            self._enqueue(connection, message)
 
 # Create manager instance
 manager = ConnectionManager()
@@ -126,11 +318,13 @@ async def get():
         return HTMLResponse(content=f.read())
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, since: int | None = None,
+                             md_rate: float = WS_MD_MAX_RATE, md_format: str = "json", topics: str | None = None):
+    """?topics=symbol:USD/BRL,msgtype:8 subscribes to those topics only (default: everything)"""
+    await manager.connect(websocket, since, md_rate, md_format, topics.split(",") if topics else None)
     try:
         while True:
             data = await websocket.receive_text()
-            logger.info(f"Received message from WebSocket: {data}")
+            await manager.handle_control(websocket, data)
     except WebSocketDisconnect:
         manager.disconnect(websocket)
\ No newline at end of file
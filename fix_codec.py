@@ -0,0 +1,162 @@
+'''FIX tag=value codec for logging, the GUI feed and offline tools.
+
+QuickFIX parses the messages the engines act on; this module is for the
+places that only need to look at or render a message: console and log
+output, WebSocket events, replay and store tooling. Raw messages may be
+str, bytes, bytearray or mmap. A raw message is scanned once: fields are
+yielded as (tag, value) with the value a memoryview slice of the input, so
+nothing is copied until a value is actually needed as text.
+
+    for tag, value in fields(raw):
+        if tag == 35: ...
+    to_pipe(raw)                 '8=FIX.4.4 | 9=65 | 35=D | ... | 10=123 | '
+    render_json(scan(raw))       '{"8": "FIX.4.4", "9": "65", "35": "D", ...}'
+    validate(raw)                raises FixCodecError on a bad BodyLength or CheckSum'''
+
+import json
+
+SOH = b'\x01'
+PIPE = ' | '
+CHECKSUM_FIELD = b'\x0110='
+
+
+class FixCodecError(ValueError):
+    """A raw message that is not well formed tag=value FIX"""
+
+
+def _buffer(message):
+    """message as something with find(): str is encoded once, memoryviews are copied once"""
+    if isinstance(message, str):
+        return message.encode('latin-1')
+    if isinstance(message, memoryview):
+        return message.tobytes()
+    return message
+
+
+def text(value):
+    """A field value (memoryview slice) as str"""
+    return str(value, 'latin-1')
+
+
+def fields(message):
+    """(tag, value) for every field in order; values are memoryview slices of the message"""
+    data = _buffer(message)
+    view = memoryview(data)
+    end = len(data)
+    pos = 0
+    while pos < end:
+        equals = data.find(b'=', pos, end)
+        if equals < 0:
+            if data[pos:end].strip():
+                raise FixCodecError(f"Field without '=' at offset {pos}")
+            return
+        soh = data.find(SOH, equals + 1, end)
+        if soh < 0:
+            soh = end  # tolerate a missing final SOH
+        try:
+            tag = int(data[pos:equals])
+        except ValueError:
+            raise FixCodecError(f"Bad tag {bytes(data[pos:equals])!r} at offset {pos}") from None
+        yield tag, view[equals + 1:soh]
+        pos = soh + 1
+
+
+def scan(message):
+    """[(tag, value as str), ...] from one pass over the message"""
+    return [(tag, str(value, 'latin-1')) for tag, value in fields(message)]
+
+
+def get_field(message, tag):
+    """Value of the first occurrence of tag as str, or None; does not scan the other fields"""
+    data = _buffer(message)
+    needle = f"{tag}=".encode()
+    if data.startswith(needle):
+        start = len(needle)
+    else:
+        start = data.find(SOH + needle)
+        if start < 0:
+            return None
+        start += len(needle) + 1
+    end = data.find(SOH, start)
+    return str(data[start:end if end >= 0 else len(data)], 'latin-1')
+
+
+def to_dict(message):
+    """{tag: value} with int tags; a repeated tag (repeating groups) keeps its last value"""
+    return {tag: value for tag, value in scan(message)}
+
+
+def to_pipe(message):
+    """The console/log form, every SOH replaced by ' | '"""
+    if isinstance(message, str):
+        return message.replace('\x01', PIPE)
+    return str(_buffer(message).replace(SOH, PIPE.encode()), 'latin-1')
+
+
+def from_pipe(formatted):
+    """Raw message back from its console/log form"""
+    raw = formatted.rstrip().replace(' | ', '\x01').replace(' |', '\x01')
+    return raw if raw.endswith('\x01') else raw + '\x01'
+
+
+def render_pipe(pairs):
+    """'tag=value | tag=value' from (tag, value) pairs, without a trailing separator"""
+    return PIPE.join(f"{tag}={value}" for tag, value in pairs)
+
+
+def render_json(pairs):
+    """JSON object keyed by tag; repeated tags become lists in message order"""
+    rendered = {}
+    for tag, value in pairs:
+        key = str(tag)
+        if key in rendered:
+            previous = rendered[key]
+            if isinstance(previous, list):
+                previous.append(value)
+            else:
+                rendered[key] = [previous, value]
+        else:
+            rendered[key] = value
+    return json.dumps(rendered)
+
+
+def checksum(message, end=None):
+    """Sum of the bytes before end (default: the whole message) modulo 256"""
+    data = _buffer(message)
+    return sum(memoryview(data)[:len(data) if end is None else end]) % 256
+
+
+def validate(message):
+    """Check BeginString, BodyLength(9) and CheckSum(10); returns the message length in bytes"""
+    data = _buffer(message)
+    if not data.startswith(b'8='):
+        raise FixCodecError("Message does not start with BeginString(8)")
+    first = data.find(SOH)
+    if first < 0 or not data.startswith(b'9=', first + 1):
+        raise FixCodecError("BodyLength(9) is not the second field")
+    second = data.find(SOH, first + 1)
+    trailer = data.rfind(CHECKSUM_FIELD)
+    if second < 0 or trailer < second:
+        raise FixCodecError("CheckSum(10) not found")
+    try:
+        body_length = int(data[first + 3:second])
+        end = data.find(SOH, trailer + 4)
+        expected = int(data[trailer + 4:end if end >= 0 else len(data)])
+    except ValueError:
+        raise FixCodecError("BodyLength(9) or CheckSum(10) is not a number") from None
+
+    # The body runs from the field after BodyLength up to and including the SOH before CheckSum
+    if trailer - second != body_length:
+        raise FixCodecError(f"BodyLength(9) is {body_length}, body is {trailer - second} bytes")
+    actual = checksum(data, trailer + 1)
+    if actual != expected:
+        raise FixCodecError(f"CheckSum(10) is {expected:03d}, computed {actual:03d}")
+    return end + 1 if end >= 0 else len(data)
+
+
+def is_valid(message):
+    try:
+        validate(message)
+        return True
+    except FixCodecError:
+        return False
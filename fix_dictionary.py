@@ -0,0 +1,212 @@
+'''Field, enum and message names from FIX44.xml for human-readable rendering.
+
+FIX44.xml is compiled once into flat lookup tables (field name and enum
+names indexed by tag, message names by MsgType, repeating group members by
+their NoXxx tag) and cached in .fix_cache/ next to the XML. The cache is keyed
+by the XML's SHA-256, so editing the XML rebuilds it on the next load and
+nothing parses XML otherwise.
+
+    dictionary = fix_dictionary.load()
+    dictionary.annotate(raw)     'BeginString(8)=FIX.4.4 | ... | MsgType(35)=ExecutionReport | ExecType(150)=NEW | ...'
+    dictionary.label(150)        'ExecType(150)'
+
+    python fix_dictionary.py compile FIX44.xml
+    python fix_dictionary.py annotate logs/marketmaker/messages/incoming_app.log'''
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import threading
+import xml.etree.ElementTree as ElementTree
+
+import fix_codec
+
+# Bump when the compiled layout changes so old caches are rebuilt
+FORMAT_VERSION = 1
+CACHE_DIRECTORY = '.fix_cache'
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def compile_xml(xml_path):
+    """Lookup tables from a QuickFIX data dictionary"""
+    root = ElementTree.parse(xml_path).getroot()
+    numbers = {}
+    max_tag = 0
+    for field in root.find('fields'):
+        tag = int(field.get('number'))
+        numbers[field.get('name')] = tag
+        max_tag = max(max_tag, tag)
+
+    names = [None] * (max_tag + 1)
+    values = [None] * (max_tag + 1)
+    for field in root.find('fields'):
+        tag = int(field.get('number'))
+        names[tag] = field.get('name')
+        enums = {value.get('enum'): value.get('description') for value in field.findall('value')}
+        if enums:
+            values[tag] = enums
+
+    messages = {message.get('msgtype'): message.get('name') for message in root.find('messages')}
+    # MsgType reads better as the message name than as the XML's upper case description
+    values[numbers['MsgType']] = messages
+
+    components = {component.get('name'): component for component in root.find('components')}
+    groups = {}
+
+    def members(element):
+        tags = []
+        for child in element:
+            if child.tag == 'field':
+                tags.append(numbers[child.get('name')])
+            elif child.tag == 'group':
+                count_tag = numbers[child.get('name')]
+                tags.append(count_tag)
+                groups.setdefault(count_tag, members(child))
+            elif child.tag == 'component':
+                tags.extend(members(components[child.get('name')]))
+        return tags
+
+    for section in ('header', 'trailer', 'messages'):
+        element = root.find(section)
+        if section == 'messages':
+            for message in element:
+                members(message)
+        else:
+            members(element)
+
+    return {'names': names, 'values': values, 'messages': messages, 'groups': groups}
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def cache_path(xml_path):
+    directory, name = os.path.split(os.path.abspath(xml_path))
+    return os.path.join(directory, CACHE_DIRECTORY, name + '.pickle')
+
+
+def load(xml_path='FIX44.xml'):
+    """The FixDictionary for xml_path, from the on-disk cache when it matches the XML"""
+    key = os.path.abspath(xml_path)
+    dictionary = _loaded.get(key)
+    if dictionary is not None:
+        return dictionary
+    with _lock:
+        dictionary = _loaded.get(key)
+        if dictionary is None:
+            dictionary = _loaded[key] = FixDictionary(*_cached_tables(xml_path))
+    return dictionary
+
+
+def _cached_tables(xml_path):
+    digest = file_hash(xml_path)
+    path = cache_path(xml_path)
+    try:
+        with open(path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('format') == FORMAT_VERSION and cached.get('sha256') == digest:
+            return cached['tables'], digest
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    tables = compile_xml(xml_path)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump({'format': FORMAT_VERSION, 'sha256': digest, 'tables': tables}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        print(f"Could not cache FIX dictionary at {path}: {e}")
+    return tables, digest
+
+
+class FixDictionary:
+    def __init__(self, tables, sha256=None):
+        self.names = tables['names']
+        self.values = tables['values']
+        self.messages = tables['messages']
+        self.groups = tables['groups']
+        self.sha256 = sha256
+        self._json = None
+
+    def field_name(self, tag):
+        return self.names[tag] if 0 <= tag < len(self.names) else None
+
+    def value_name(self, tag, value):
+        """Enum name of a field value, None for free-form fields and unknown values"""
+        enums = self.values[tag] if 0 <= tag < len(self.values) else None
+        return enums.get(value) if enums else None
+
+    def label(self, tag):
+        """'ExecType(150)', or just the tag for user-defined fields"""
+        name = self.field_name(tag)
+        return f"{name}({tag})" if name else str(tag)
+
+    def group_members(self, tag):
+        """Member tags of the repeating group counted by tag (NoXxx), None if tag is not a group"""
+        return self.groups.get(tag)
+
+    def annotate_field(self, tag, value):
+        names, values = self.names, self.values
+        if tag < len(names) and names[tag]:
+            enums = values[tag]
+            return f"{names[tag]}({tag})={enums.get(value, value) if enums else value}"
+        return f"{tag}={value}"
+
+    def annotate(self, message):
+        """Raw message as ' | ' separated Name(tag)=value, enum values by name"""
+        return fix_codec.PIPE.join(self.annotate_field(tag, value) for tag, value in fix_codec.scan(message))
+
+    def annotate_pipe(self, formatted):
+        """Annotate a message already in its ' | ' console/log form"""
+        return self.annotate(fix_codec.from_pipe(formatted))
+
+    def to_json(self):
+        """The tables as JSON for the web GUI; enum and group maps keyed by tag"""
+        if self._json is None:
+            self._json = json.dumps({
+                'sha256': self.sha256,
+                'names': self.names,
+                'values': {str(tag): enums for tag, enums in enumerate(self.values) if enums},
+                'groups': {str(tag): members for tag, members in self.groups.items()}
+            }, separators=(',', ':'))
+        return self._json
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FIX data dictionary cache and message annotation")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compile_parser = subparsers.add_parser('compile', help="rebuild the cache for a data dictionary")
+    compile_parser.add_argument('xml', nargs='?', default='FIX44.xml')
+    annotate_parser = subparsers.add_parser('annotate', help="print the messages of a message log with field names")
+    annotate_parser.add_argument('log', help="a logs/*/messages/*.log file")
+    annotate_parser.add_argument('--xml', default='FIX44.xml')
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        if os.path.exists(cache_path(args.xml)):
+            os.unlink(cache_path(args.xml))
+        dictionary = load(args.xml)
+        print(f"Compiled {args.xml} ({sum(1 for name in dictionary.names if name)} fields, "
+              f"{len(dictionary.messages)} messages, {len(dictionary.groups)} groups) to {cache_path(args.xml)}")
+        return
+
+    dictionary = load(args.xml)
+    with open(args.log) as f:
+        for line in f:
+            timestamp, sep, rest = line.partition(' : ')
+            if not sep or not timestamp[:8].isdigit():
+                continue
+            msg_type, _, formatted = rest.partition(' : ')
+            print(f"{timestamp} {dictionary.annotate_pipe(formatted)}")
+
+
+if __name__ == '__main__':
+    main()
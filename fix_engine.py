@@ -0,0 +1,153 @@
+'''Runs the FIX engines outside the web server process.
+
+    python fix_engine.py                                   # market maker and client, one process
+    python fix_engine.py --role market_maker --socket /tmp/fix_mm.sock
+    python fix_engine.py --role client --socket /tmp/fix_client.sock
+
+The web tier is then started with FIX_ENGINE_SOCKET set to the socket(s),
+comma separated, and can run several workers:
+
+    FIX_ENGINE_SOCKET=/tmp/fix_engine.sock uvicorn main:app --workers 4
+
+Engine output reaches the web workers as events over engine_bus; GUI commands
+and REST orders come back as requests. JSON encoding and WebSocket I/O then
+never hold the GIL of the process running the FIX callbacks.'''
+
+import argparse
+import signal
+import threading
+import quickfix as fix
+
+from Market_maker import MarketMaker
+from Client import Client
+from engine_bus import EngineServer, DEFAULT_SOCKET
+from session_health import SessionHealthMonitor, test_request_interval
+from drop_copy import drop_copy_sessions
+from latency import tracer
+import message_store
+import fix_codec
+import commands
+from market_data import is_market_data
+
+
+# Client methods the web tier may call, with keyword arguments
+CLIENT_OPS = ("place_order", "place_orders", "cancel_order", "get_order")
+
+
+class FixEngine:
+    def __init__(self, role="both", socket_path=DEFAULT_SOCKET):
+        self.role = role
+        self.market_maker = None
+        self.client = None
+        self.acceptor = None
+        self.initiator = None
+        self.bus = EngineServer(socket_path, self.handle_request)
+        self.stopped = threading.Event()
+
+    def start(self):
+        self.bus.start()
+        if self.role in ("both", "market_maker"):
+            self.start_market_maker()
+        if self.role in ("both", "client"):
+            self.start_client()
+
+    def start_market_maker(self):
+        store_factory, settings = message_store.store_factory(fix.SessionSettings("Server.cfg"))
+        self.market_maker = MarketMaker()
+        self.market_maker.format_and_print_message = self.market_maker_message_handler
+        self.market_maker.health = SessionHealthMonitor("MARKET_MAKER", test_request_interval(settings))
+        self.market_maker.drop_copy.sessions = drop_copy_sessions(settings)
+        self.acceptor = fix.SocketAcceptor(self.market_maker, store_factory, settings,
+                                           fix.ScreenLogFactory(settings))
+        self.acceptor.start()
+        self.market_maker.health.start()
+
+    def start_client(self):
+        store_factory, settings = message_store.store_factory(fix.SessionSettings("Client.cfg"))
+        self.client = Client()
+        self.client.format_and_print_message = self.client_message_handler
+        self.client.health = SessionHealthMonitor("CLIENT", test_request_interval(settings))
+        self.client.add_listener(self.on_client_event)
+        self.initiator = fix.SocketInitiator(self.client, store_factory, settings,
+                                             fix.ScreenLogFactory(settings))
+        self.initiator.start()
+        self.client.health.start()
+
+    def stop(self):
+        if self.initiator:
+            self.initiator.stop()
+        if self.market_maker:
+            self.market_maker.is_running = False
+            self.market_maker.ticks.close()
+            self.market_maker.drop_copy.close()
+        if self.acceptor:
+            self.acceptor.stop()
+        self.bus.stop()
+        self.stopped.set()
+
+    def client_message_handler(self, prefix, message):
+        raw_message = message.toString()
+        formatted_message = fix_codec.to_pipe(raw_message)
+        print(f"{prefix}: {formatted_message}")
+        # Market data reaches the web tier as conflated market_data events only
+        if not is_market_data(raw_message):
+            self.bus.publish({"type": "order_update", "message": formatted_message})
+        return formatted_message
+
+    def market_maker_message_handler(self, prefix, message):
+        raw_message = message.toString()
+        formatted_message = fix_codec.to_pipe(raw_message)
+        print(f"{prefix}: {formatted_message}")
+        if not is_market_data(raw_message):
+            self.bus.publish({"type": "maker_output", "message": formatted_message})
+        return formatted_message
+
+    def on_client_event(self, kind, data):
+        if kind == 'market_data':
+            self.bus.publish({"type": "market_data", "quote": data})
+
+    def handle_request(self, op, args):
+        """Requests from the web tier; runs on the bus reader thread of the requesting worker"""
+        if op == "status":
+            return {
+                "role": self.role,
+                "market_maker": self.market_maker is not None,
+                "client_logged_on": self.client is not None and self.client.logged_on.is_set(),
+                "workers": len(self.bus.connections)
+            }
+        if self.client is None:
+            raise fix.RuntimeError(f"{op} needs the client engine, this process runs {self.role}")
+        if op == "command":
+            self.client.process_command(args["command"])
+            self.bus.publish({"type": "order_update", "message": commands.to_pipe(args["command"])})
+            return None
+        if op in CLIENT_OPS:
+            return getattr(self.client, op)(**args)
+        raise ValueError(f"Unknown engine request: {op}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the FIX engines for a separate web tier")
+    parser.add_argument("--role", choices=("both", "market_maker", "client"), default="both")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix domain socket the web tier connects to")
+    args = parser.parse_args()
+
+    engine = FixEngine(args.role, args.socket)
+    signal.signal(signal.SIGTERM, lambda signum, frame: engine.stopped.set())
+    try:
+        engine.start()
+        print(f"FIX engine ({args.role}) started.")
+        while not engine.stopped.wait(1):
+            pass
+    except KeyboardInterrupt:
+        print("FIX engine stopped.")
+    except (fix.ConfigError, fix.RuntimeError) as e:
+        print(f"Error in FIX engine: {e}")
+    finally:
+        engine.stop()
+        if tracer.enabled:
+            tracer.dump()
+
+
+if __name__ == "__main__":
+    main()
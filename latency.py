@@ -0,0 +1,251 @@
+'''Latency histograms.
+
+LatencyHistogram is a small HDR-style histogram: values (nanoseconds) are
+counted in log-linear buckets, 2**(SUB_BUCKET_BITS - 1) buckets per power of
+two, so every recorded value is kept to within ~3% regardless of magnitude and
+recording is a couple of integer operations and a list increment.
+
+A histogram is not locked; give every recording thread its own and merge()
+them when reporting.'''
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+SUB_BUCKET_BITS = 6
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+
+
+def bucket_index(value):
+    """Bucket for a non-negative integer value"""
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + (value >> shift) - SUB_BUCKET_HALF
+
+
+def bucket_value(index):
+    """Midpoint of the values counted in a bucket"""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift, offset = divmod(index - SUB_BUCKET_COUNT, SUB_BUCKET_HALF)
+    shift += 1
+    return ((offset + SUB_BUCKET_HALF) << shift) + ((1 << shift) >> 1)
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value):
+        """Record one latency in nanoseconds"""
+        value = int(value)
+        if value < 0:
+            value = 0
+        index = bucket_index(value)
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Add the counts of another histogram to this one"""
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def reset(self):
+        self.__init__()
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, percent):
+        """Value at the given percentile (0-100), in nanoseconds"""
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * percent // 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(max(bucket_value(index), self.min), self.max)
+        return self.max
+
+    def summary(self, unit=1000):
+        """count, mean, min, p50, p90, p99, p99.9 and max, divided by unit (default: microseconds)"""
+        return {
+            'count': self.count,
+            'mean': round(self.mean() / unit, 3),
+            'min': round((self.min or 0) / unit, 3),
+            'p50': round(self.percentile(50) / unit, 3),
+            'p90': round(self.percentile(90) / unit, 3),
+            'p99': round(self.percentile(99) / unit, 3),
+            'p99.9': round(self.percentile(99.9) / unit, 3),
+            'max': round((self.max or 0) / unit, 3)
+        }
+
+
+class HistogramSet:
+    """LatencyHistograms keyed by name, kept per recording thread and merged on read"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._per_thread = []
+        self._lock = threading.Lock()
+
+    def histogram(self, key):
+        """The calling thread's histogram for key"""
+        histograms = getattr(self._local, 'histograms', None)
+        if histograms is None:
+            histograms = self._local.histograms = {}
+            with self._lock:
+                self._per_thread.append(histograms)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = LatencyHistogram()
+        return histogram
+
+    def record(self, key, value):
+        self.histogram(key).record(value)
+
+    def merged(self):
+        """{key: LatencyHistogram} summed over all threads"""
+        merged = {}
+        with self._lock:
+            per_thread = list(self._per_thread)
+        for histograms in per_thread:
+            for key, histogram in list(histograms.items()):
+                merged.setdefault(key, LatencyHistogram()).merge(histogram)
+        return merged
+
+    def clear(self):
+        with self._lock:
+            for histograms in self._per_thread:
+                histograms.clear()
+
+
+def format_summary_table(histograms, unit=1000, unit_name='us'):
+    """Render {name: LatencyHistogram} as a fixed width text table"""
+    lines = [f"{'type':<12}{'count':>10}{'p50':>12}{'p99':>12}{'p99.9':>12}{'max':>12}   ({unit_name})"]
+    for name, histogram in sorted(histograms.items()):
+        s = histogram.summary(unit)
+        lines.append(f"{name:<12}{s['count']:>10}{s['p50']:>12}{s['p99']:>12}{s['p99.9']:>12}{s['max']:>12}")
+    return "\n".join(lines)
+
+
+# User-defined tags carrying wall-clock send times (ns since epoch) so the
+# client and market maker can measure the wire legs across processes
+TAG_CLIENT_SEND_TIME = 9100
+TAG_MM_SEND_TIME = 9101
+
+# stage -> the stage it is measured from
+ORDER_STAGES = {
+    'mm_received': 'client_send',
+    'mm_logged': 'mm_received',
+    'mm_printed': 'mm_logged',
+    'mm_sent': 'mm_printed',
+    'mm_handled': 'mm_sent',
+    'client_receive': 'mm_sent',
+}
+
+
+class StageTracer:
+    """Monotonic timestamps per ClOrdID turned into per-stage latency histograms.
+
+    Call sites check tracer.enabled before doing any work, so a disabled tracer
+    costs one attribute lookup. Histograms are kept per thread and merged in
+    snapshot(); in-flight keys are capped at max_open, oldest dropped first."""
+
+    def __init__(self, stages=ORDER_STAGES, first_stage='client_send', last_stage='client_receive',
+                 max_open=100000):
+        self.enabled = False
+        self.stages = stages
+        self.first_stage = first_stage
+        self.last_stage = last_stage
+        self.max_open = max_open
+        self._open = {}
+        self.histograms = HistogramSet()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def record(self, name, value):
+        """Record a latency (ns) that was measured elsewhere, e.g. a wire leg"""
+        self.histograms.record(name, value)
+
+    def stamp(self, key, stage, now=None):
+        """Timestamp a stage for a ClOrdID and record its latency from the reference stage"""
+        if not key:
+            return
+        now = time.perf_counter_ns() if now is None else now
+        stamps = self._open.get(key)
+        if stamps is None:
+            if len(self._open) >= self.max_open:
+                self._open.pop(next(iter(self._open)), None)
+            stamps = self._open[key] = {}
+        stamps[stage] = now
+
+        reference = stamps.get(self.stages.get(stage))
+        if reference is not None:
+            self.histograms.record(f"{self.stages[stage]}->{stage}", now - reference)
+        if stage == self.last_stage:
+            first = stamps.get(self.first_stage)
+            if first is not None:
+                self.histograms.record('total', now - first)
+            self._open.pop(key, None)
+
+    def snapshot(self, unit=1000):
+        """Merged per-stage summaries (default unit: microseconds)"""
+        return {name: histogram.summary(unit) for name, histogram in self.histograms.merged().items()}
+
+    def reset(self):
+        self.histograms.clear()
+        self._open.clear()
+
+    def dump(self):
+        """Print the per-stage table, e.g. at shutdown"""
+        summaries = self.snapshot()
+        if not summaries:
+            return
+        print("Latency by stage (us):")
+        print(f"{'stage':<28}{'count':>10}{'p50':>12}{'p99':>12}{'p99.9':>12}{'max':>12}")
+        for name, s in sorted(summaries.items()):
+            print(f"{name:<28}{s['count']:>10}{s['p50']:>12}{s['p99']:>12}{s['p99.9']:>12}{s['max']:>12}")
+
+
+def sending_time_ns(value):
+    """Parse a FIX UTCTimestamp (SendingTime) into ns since epoch"""
+    fmt = '%Y%m%d-%H:%M:%S.%f' if '.' in value else '%Y%m%d-%H:%M:%S'
+    parsed = datetime.strptime(value, fmt).replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp()) * 1000000000 + parsed.microsecond * 1000
+
+
+# Shared by every application in the process; enable with FIX_LATENCY_TRACE=1
+tracer = StageTracer()
+if os.environ.get('FIX_LATENCY_TRACE') == '1':
+    tracer.enable()
@@ -0,0 +1,242 @@
+'''Load generator for the market maker.
+
+Drives a configurable mix of orders, cancels and status requests over one or
+more FIX sessions, at a target rate or as fast as possible, and reports
+send -> ack latency per message type plus throughput:
+
+    python load_generator.py --count 10000 --rate 2000 --sessions 2
+    python load_generator.py --duration 30 --rate 0 --mix market=60,limit=30,cancel=5,status=5
+
+Sessions come from LoadGen.cfg (LOADGEN1..4, matching Server.cfg).'''
+
+import argparse
+import random
+import threading
+import time
+import quickfix as fix
+
+from Client import Client, gen_order_id
+import message_store
+from latency import LatencyHistogram, format_summary_table
+
+ORDER_TYPES = {
+    'market': fix.OrdType_MARKET,
+    'limit': fix.OrdType_LIMIT,
+    'stop': fix.OrdType_STOP,
+    'stop_limit': fix.OrdType_STOP_LIMIT
+}
+DEFAULT_MIX = "market=40,limit=30,stop=10,stop_limit=10,cancel=5,status=5"
+
+
+class LoadClient(Client):
+    """Client that skips console/log echo and records acknowledgement latency"""
+
+    def __init__(self):
+        super().__init__()
+        self.logged_on = threading.Event()
+        # (kind, ClOrdID) -> (histogram name, send time)
+        self.inflight = {}
+        self.histograms = {}
+        self.working = []
+        self.acked = 0
+
+    def onLogon(self, session_id):
+        self.session_id = session_id
+        self.logged_on.set()
+
+    def onLogout(self, session_id):
+        self.logged_on.clear()
+
+    def toAdmin(self, message, session_id):
+        pass
+
+    def fromAdmin(self, message, session_id):
+        pass
+
+    def toApp(self, message, session_id):
+        pass
+
+    def fromApp(self, message, session_id):
+        now = time.perf_counter_ns()
+        msg_type = fix.MsgType()
+        message.getHeader().getField(msg_type)
+        msg_type = msg_type.getValue()
+
+        if msg_type == fix.MsgType_ExecutionReport:
+            exec_type = self.get_field_value(message, fix.ExecType())
+            cl_ord_id = self.get_field_value(message, fix.ClOrdID())
+            if exec_type == fix.ExecType_CANCELED:
+                key = ('cancel', self.get_field_value(message, fix.OrigClOrdID()) or cl_ord_id)
+            elif exec_type == fix.ExecType_ORDER_STATUS:
+                key = ('status', cl_ord_id)
+            else:
+                key = ('new', cl_ord_id)
+                if exec_type == fix.ExecType_NEW:
+                    self.working.append(cl_ord_id)
+        elif msg_type == fix.MsgType_OrderCancelReject:
+            key = ('cancel', self.get_field_value(message, fix.OrigClOrdID()))
+        elif msg_type == fix.MsgType_BusinessMessageReject:
+            key = ('status', self.get_field_value(message, fix.BusinessRejectRefID()))
+        else:
+            return
+
+        pending = self.inflight.pop(key, None)
+        if pending is not None:
+            name, sent_at = pending
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(now - sent_at)
+            self.acked += 1
+
+
+class LoadGenerator:
+    def __init__(self, config="LoadGen.cfg", sessions=1, mix=DEFAULT_MIX, symbol="USD/BRL", seed=None):
+        self.config = config
+        self.session_count = sessions
+        self.mix = parse_mix(mix)
+        self.symbol = symbol
+        self.rng = random.Random(seed)
+        self.clients = []
+        self.initiators = []
+        self.sent = {}
+
+    def start(self, timeout=30):
+        settings = fix.SessionSettings(self.config)
+        session_ids = sorted(settings.getSessions(), key=lambda s: s.toString())[:self.session_count]
+        for session_id in session_ids:
+            # One initiator per session so each LoadClient owns exactly one session
+            session_settings = fix.SessionSettings()
+            session_settings.set(settings.get())
+            session_settings.set(session_id, settings.get(session_id))
+            client = LoadClient()
+            store_factory, session_settings = message_store.store_factory(session_settings)
+            initiator = fix.SocketInitiator(client, store_factory, session_settings)
+            initiator.start()
+            self.clients.append(client)
+            self.initiators.append(initiator)
+
+        deadline = time.monotonic() + timeout
+        for client in self.clients:
+            if not client.logged_on.wait(max(0, deadline - time.monotonic())):
+                raise fix.RuntimeError("Timed out waiting for load generator sessions to log on")
+        print(f"Load generator: {len(self.clients)} session(s) logged on")
+
+    def stop(self):
+        for initiator in self.initiators:
+            initiator.stop()
+
+    def send_one(self, client):
+        name = self.rng.choices(self.mix[0], self.mix[1])[0]
+        if name in ('cancel', 'status') and not client.working:
+            name = 'limit'
+
+        if name == 'cancel':
+            orig_cl_ord_id = client.working.pop()
+            client.inflight[('cancel', orig_cl_ord_id)] = (name, time.perf_counter_ns())
+            client.cancel_order(orig_cl_ord_id)
+        elif name == 'status':
+            cl_ord_id = self.rng.choice(client.working)
+            client.inflight[('status', cl_ord_id)] = (name, time.perf_counter_ns())
+            client.order_status_request(cl_ord_id)
+        else:
+            side = self.rng.choice((fix.Side_BUY, fix.Side_SELL))
+            price = round(self.rng.uniform(4.5, 5.5), 4)
+            stop_price = round(price + (0.05 if side == fix.Side_BUY else -0.05), 4)
+            order_type = ORDER_TYPES[name]
+            # In flight before it is sent: the ack can be handled before place_order returns
+            cl_ord_id = gen_order_id()
+            client.inflight[('new', cl_ord_id)] = (name, time.perf_counter_ns())
+            if client.place_order(side, self.symbol, 100, order_type,
+                                  price if order_type != fix.OrdType_MARKET else None,
+                                  stop_price if order_type in (fix.OrdType_STOP, fix.OrdType_STOP_LIMIT) else None,
+                                  quiet=True, cl_ord_id=cl_ord_id) is None:
+                client.inflight.pop(('new', cl_ord_id), None)
+                return
+        self.sent[name] = self.sent.get(name, 0) + 1
+
+    def run(self, count=None, duration=None, rate=0, drain=10):
+        """Send until count messages or duration seconds; rate 0 means as fast as possible"""
+        interval = 1.0 / rate if rate else 0
+        started = time.perf_counter()
+        end = started + duration if duration else None
+        sent = 0
+        while (count is None or sent < count) and (end is None or time.perf_counter() < end):
+            if interval:
+                delay = started + sent * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.send_one(self.clients[sent % len(self.clients)])
+            sent += 1
+        send_elapsed = time.perf_counter() - started
+
+        drain_end = time.perf_counter() + drain
+        while any(client.inflight for client in self.clients) and time.perf_counter() < drain_end:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        return self.report(sent, send_elapsed, elapsed)
+
+    def report(self, sent, send_elapsed, elapsed):
+        histograms = {}
+        for client in self.clients:
+            for name, histogram in client.histograms.items():
+                histograms.setdefault(name, LatencyHistogram()).merge(histogram)
+        acked = sum(client.acked for client in self.clients)
+        unanswered = sum(len(client.inflight) for client in self.clients)
+
+        print(format_summary_table(histograms))
+        print(f"Sent {sent} messages in {send_elapsed:.3f}s ({sent / send_elapsed if send_elapsed else 0:.0f} msg/s), "
+              f"acknowledged {acked} in {elapsed:.3f}s ({acked / elapsed if elapsed else 0:.0f} msg/s), "
+              f"unanswered {unanswered}")
+        return {
+            'sent': sent,
+            'acked': acked,
+            'unanswered': unanswered,
+            'send_rate': sent / send_elapsed if send_elapsed else 0,
+            'ack_rate': acked / elapsed if elapsed else 0,
+            'latency_us': {name: histogram.summary() for name, histogram in histograms.items()}
+        }
+
+
+def parse_mix(mix):
+    """'market=40,limit=30,cancel=5' -> (names, weights)"""
+    names, weights = [], []
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip().lower()
+        if name not in ORDER_TYPES and name not in ('cancel', 'status'):
+            raise ValueError(f"Unknown message type in mix: {name}")
+        names.append(name)
+        weights.append(float(weight or 1))
+    return names, weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FIX load generator for the market maker")
+    parser.add_argument("--config", default="LoadGen.cfg")
+    parser.add_argument("--sessions", type=int, default=1)
+    parser.add_argument("--count", type=int, help="number of messages to send")
+    parser.add_argument("--duration", type=float, help="seconds to send for")
+    parser.add_argument("--rate", type=float, default=0, help="messages per second, 0 for as fast as possible")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--symbol", default="USD/BRL")
+    parser.add_argument("--drain", type=float, default=10, help="seconds to wait for outstanding acks")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    if args.count is None and args.duration is None:
+        args.count = 10000
+
+    generator = LoadGenerator(args.config, args.sessions, args.mix, args.symbol, args.seed)
+    try:
+        generator.start()
+        generator.run(args.count, args.duration, args.rate, args.drain)
+    except (fix.ConfigError, fix.RuntimeError, ValueError) as e:
+        print(f"Error in load generator: {e}")
+    except KeyboardInterrupt:
+        print("Load generator interrupted by user.")
+    finally:
+        generator.stop()
+
+
+if __name__ == "__main__":
+    main()
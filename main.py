@@ -3,14 +3,33 @@ import uvicorn
 import threading
 import logging
 import time
+import itertools
 import quickfix as fix
 import os
 import shutil
 from datetime import datetime
 from contextlib import asynccontextmanager
 from Market_maker import MarketMaker
-from Client import Client
+from Client import Client, TERMINAL_STATUSES, gen_order_id
+from async_client import AsyncClient, OrderRejected
+from fastapi import HTTPException, Request, Response
+from pydantic import BaseModel, Field
+from typing import Literal, Optional
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi_app import app, manager
+from latency import tracer
+from engine_bus import EngineConnection, engine_socket_path
+from market_data import MarketDataCache, is_market_data
+from session_health import SessionHealthMonitor, test_request_interval
+from profiler import (SamplingProfiler, enable_handler_timing, disable_handler_timing, handler_timings,
+                      MARKET_MAKER_HANDLERS, CLIENT_HANDLERS)
+import metrics
+import message_store
+import fix_codec
+import commands
+import fix_dictionary
+import tick_store
+import drop_copy
 import signal
 
 logging.basicConfig(level=logging.INFO)
@@ -29,17 +48,37 @@ class GlobalState:
         self.market_maker_thread = None
         self.client_thread = None
         self.initiator = None
+        self.acceptor = None
+        self.async_client = None
+        # Lifecycle: set when the acceptor is listening / the client object exists / it is time to stop
+        self.acceptor_started = threading.Event()
+        self.client_created = threading.Event()
+        self.shutdown = threading.Event()
+        # Set on shutdown: new commands and orders are refused while queued ones finish
+        self.draining = False
+        # Remote engine mode: connections to fix_engine.py processes, and the one running the client
+        self.engines = []
+        self.engine = None
 
 state = GlobalState()
+# Most GUI commands handed to one worker thread call
+COMMAND_BATCH_SIZE = 100
+# Most orders accepted by one POST /api/orders:batch; larger batches get a 422
+MAX_BATCH_ORDERS = 5000
+# Seconds to wait for the acceptor and the client logon at startup, and for queued commands at shutdown
+STARTUP_TIMEOUT = 30
+DRAIN_TIMEOUT = 10
+profiler = SamplingProfiler()
 
 
 def client_message_handler(prefix, message):
     try:
         raw_message = message.toString()
-        formatted_message = raw_message.replace(chr(1), ' | ')
+        formatted_message = fix_codec.to_pipe(raw_message)
         print(f"{prefix}: {formatted_message}")
 
-        if state.loop:
+        # Market data goes to the GUI through the conflated channel only
+        if state.loop and not is_market_data(raw_message):
             asyncio.run_coroutine_threadsafe(
                 manager.broadcast_order_update(formatted_message),
                 state.loop
@@ -51,10 +90,10 @@ def client_message_handler(prefix, message):
 def market_maker_message_handler(prefix, message):
     try:
         raw_message = message.toString()
-        formatted_message = raw_message.replace(chr(1), ' | ')
+        formatted_message = fix_codec.to_pipe(raw_message)
         print(f"{prefix}: {formatted_message}")
 
-        if state.loop:
+        if state.loop and not is_market_data(raw_message):
             asyncio.run_coroutine_threadsafe(
                 manager.broadcast_maker_output(formatted_message),
                 state.loop
@@ -70,20 +109,25 @@ def run_market_maker():
 
         settings = fix.SessionSettings("server.cfg")
         market_maker = MarketMaker()
-        store_factory = fix.FileStoreFactory(settings)
+        store_factory, settings = message_store.store_factory(settings)
         log_factory = fix.ScreenLogFactory(settings)
         market_maker.format_and_print_message = market_maker_message_handler
+        market_maker.health = SessionHealthMonitor("MARKET_MAKER", test_request_interval(settings))
+        market_maker.drop_copy.sessions = drop_copy.drop_copy_sessions(settings)
+        market_maker.health.start()
         state.market_maker = market_maker
 
-        acceptor = fix.SocketAcceptor(market_maker, store_factory, settings, log_factory)
-        acceptor.start()
-
-        while state.running:
-            time.sleep(1)
+        state.acceptor = fix.SocketAcceptor(market_maker, store_factory, settings, log_factory)
+        state.acceptor.start()
+        state.acceptor_started.set()
 
+        state.shutdown.wait()
     except Exception as e:
         logger.error(f"Error in market maker thread: {e}")
     finally:
+        # The client has logged out by now (stop_fix_threads stops the initiator first)
+        if state.acceptor:
+            state.acceptor.stop()
         logger.info("Market maker thread ending")
 
 
@@ -91,37 +135,48 @@ def run_client():
     try:
         settings = fix.SessionSettings("client.cfg")
         client = Client()
-        store_factory = fix.FileStoreFactory(settings)
+        store_factory, settings = message_store.store_factory(settings)
         log_factory = fix.ScreenLogFactory(settings)
         client.format_and_print_message = client_message_handler
+        client.health = SessionHealthMonitor("CLIENT", test_request_interval(settings))
+        client.health.start()
+        manager.attach_market_data(client.market_data, state.loop)
+        state.async_client = AsyncClient(client, state.loop)
         state.client = client
+        state.client_created.set()
 
         state.initiator = fix.SocketInitiator(client, store_factory, settings, log_factory)
         state.initiator.start()
 
-        while state.running:
-            time.sleep(1)
+        state.shutdown.wait()
     except Exception as e:
         logger.error(f"Error in client thread: {e}")
     finally:
-        if state.initiator:
-            state.initiator.stop()
+        state.client_created.set()
         logger.info("Client thread ending")
 
 
 def start_fix_threads():
+    """Start the market maker, then the client once the acceptor listens; returns when the client has logged on"""
     try:
         # Start MarketMaker in a thread
-        state.market_maker_thread = threading.Thread(target=run_market_maker, daemon=True)
+        state.market_maker_thread = threading.Thread(target=run_market_maker, name="market-maker", daemon=True)
         state.market_maker_thread.start()
+        # Connecting before the acceptor listens would leave the client waiting out its ReconnectInterval
+        if not state.acceptor_started.wait(STARTUP_TIMEOUT):
+            logger.error("Market maker acceptor did not start")
+            return False
 
         # Start Client in a thread
-        state.client_thread = threading.Thread(target=run_client, daemon=True)
+        state.client_thread = threading.Thread(target=run_client, name="client", daemon=True)
         state.client_thread.start()
-
-        # Give threads time to initialize
-        time.sleep(2)
-
+        state.client_created.wait(STARTUP_TIMEOUT)
+        if state.client is None:
+            logger.error("Client did not start")
+            return False
+        if not state.client.logged_on.wait(STARTUP_TIMEOUT):
+            # Keep serving; /ready reports the session as down until it logs on
+            logger.warning(f"Client not logged on after {STARTUP_TIMEOUT}s")
         return True
     except Exception as e:
         logger.error(f"Error starting FIX threads: {e}")
@@ -129,22 +184,45 @@ def start_fix_threads():
 
 
 def stop_fix_threads():
+    """Log the client out, stop the acceptor and flush and close the message logs"""
     try:
         state.running = False
         if state.market_maker:
             state.market_maker.is_running = False
         if state.initiator:
+            # Sends Logout and waits for the reply (or LogoutTimeout)
             state.initiator.stop()
+            state.initiator = None
+        state.shutdown.set()
 
         # Wait for threads to finish
         if state.market_maker_thread and state.market_maker_thread.is_alive():
             state.market_maker_thread.join(timeout=5)
         if state.client_thread and state.client_thread.is_alive():
             state.client_thread.join(timeout=5)
+
+        for application in (state.client, state.market_maker):
+            if application:
+                if application.health:
+                    application.health.stop()
+                application.logger.close()
+        if state.market_maker:
+            state.market_maker.ticks.close()
+            state.market_maker.drop_copy.close()
     except Exception as e:
         logger.error(f"Error stopping FIX threads: {e}")
 
 
+async def drain_commands():
+    """Refuse new commands and wait for the queued ones to be sent"""
+    state.draining = True
+    if state.command_queue:
+        try:
+            await asyncio.wait_for(state.command_queue.join(), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"{state.command_queue.qsize()} queued commands not sent before shutdown")
+
+
 @asynccontextmanager
 async def lifespan(app):
     # Startup: Initialize state and FIX system
@@ -152,28 +230,64 @@ async def lifespan(app):
     state.command_queue = asyncio.Queue()
     state.running = True
 
-    if not start_fix_threads():
+    socket_paths = engine_socket_path()
+    if socket_paths:
+        await connect_engines(socket_paths.split(","))
+    elif not await state.loop.run_in_executor(None, start_fix_threads):
         logger.error("Failed to initialize FIX system")
         exit(1)
 
     # Start command processor
     asyncio.create_task(command_processor())
+    asyncio.create_task(manager.run_market_data())
 
     yield
 
     # Cleanup
     logger.info("Shutting down FIX system...")
-    stop_fix_threads()
+    await drain_commands()
+    if state.engines:
+        for engine in state.engines:
+            await engine.close()
+    else:
+        await state.loop.run_in_executor(None, stop_fix_threads)
+    if tracer.enabled:
+        tracer.dump()
     logger.info("System shutdown complete")
 
 
 app.router.lifespan_context = lifespan
 
 
+async def connect_engines(paths):
+    """Remote engine mode: feed the WebSocket manager from fix_engine.py processes instead of local threads"""
+    market_data = MarketDataCache()
+    manager.attach_market_data(market_data, state.loop)
+
+    async def on_event(event):
+        if event["type"] == "order_update":
+            await manager.broadcast_order_update(event["message"])
+        elif event["type"] == "maker_output":
+            await manager.broadcast_maker_output(event["message"])
+        elif event["type"] == "market_data":
+            market_data.update(event["quote"])
+
+    for path in paths:
+        engine = EngineConnection(path, on_event)
+        await engine.connect()
+        state.engines.append(engine)
+        status = await engine.call("status")
+        logger.info(f"Connected to FIX engine at {path}: {status}")
+        if status["role"] in ("both", "client"):
+            state.engine = engine
+
+
 @app.post("/api/command")
 async def handle_command(command: dict):
     try:
         cmd = command["command"]
+        if state.draining:
+            return {"status": "error", "message": "Shutting down, command not accepted"}
         if state.command_queue:
             await state.command_queue.put(cmd)
             return {"status": "success", "message": f"Command received: {cmd}"}
@@ -184,42 +298,407 @@ async def handle_command(command: dict):
         return {"status": "error", "message": str(e)}
 
 
-async def command_processor():
-    while state.running:
+ORDER_SIDES = {"buy": fix.Side_BUY, "sell": fix.Side_SELL}
+ORDER_TYPES = {
+    "market": fix.OrdType_MARKET,
+    "limit": fix.OrdType_LIMIT,
+    "stop": fix.OrdType_STOP,
+    "stop_limit": fix.OrdType_STOP_LIMIT
+}
+
+
+class OrderRequest(BaseModel):
+    side: Literal["buy", "sell"]
+    symbol: str = Field(min_length=1)
+    quantity: float = Field(gt=0)
+    order_type: Literal["market", "limit", "stop", "stop_limit"] = "market"
+    price: Optional[float] = Field(default=None, gt=0)
+    stop_price: Optional[float] = Field(default=None, gt=0)
+
+
+class SingleOrderRequest(OrderRequest):
+    wait: bool = False
+    timeout: float = Field(default=5.0, gt=0, le=60)
+
+
+class BatchOrderRequest(BaseModel):
+    orders: list[OrderRequest] = Field(min_length=1, max_length=MAX_BATCH_ORDERS)
+    as_list: bool = False
+    wait: bool = False
+    timeout: float = Field(default=5.0, gt=0, le=60)
+
+
+class AckOptions(BaseModel):
+    wait: bool = False
+    timeout: float = Field(default=5.0, gt=0, le=60)
+
+
+def order_kwargs(order: OrderRequest):
+    """Client.place_order keyword arguments, or 422 for a missing price"""
+    if order.order_type in ("limit", "stop_limit") and order.price is None:
+        raise HTTPException(status_code=422, detail=f"{order.order_type} order requires price")
+    if order.order_type in ("stop", "stop_limit") and order.stop_price is None:
+        raise HTTPException(status_code=422, detail=f"{order.order_type} order requires stop_price")
+    return {
+        "side": ORDER_SIDES[order.side],
+        "symbol": order.symbol,
+        "quantity": order.quantity,
+        "order_type": ORDER_TYPES[order.order_type],
+        "price": order.price if order.order_type in ("limit", "stop_limit") else None,
+        "stop_price": order.stop_price if order.order_type in ("stop", "stop_limit") else None
+    }
+
+
+def require_session(wait=False):
+    if state.draining:
+        raise HTTPException(status_code=503, detail="Shutting down")
+    if state.engine:
+        if not state.engine.connected:
+            raise HTTPException(status_code=503, detail="FIX engine not connected")
+        if wait:
+            raise HTTPException(status_code=501, detail="Waiting for acks is not available with a remote FIX engine")
+        return
+    if not (state.client and state.async_client and state.client.session_id):
+        raise HTTPException(status_code=503, detail="Client session not ready")
+
+
+async def client_call(op, **args):
+    """Call a Client method in the FIX engine process, or on a worker thread when the engines run locally"""
+    if state.engine:
         try:
-            command = await state.command_queue.get()
-
-            parts = command.split()
-            action = parts[0].lower()
-
-            # Format as FIX message
-            formatted_command = []
-            if action in ["status", "cancel"]:
-                if len(parts) >= 2:
-                    formatted_command.append(f"35={action}")
-                    formatted_command.append(f"11={parts[1]}")  # ClOrdID
-            else:
-                formatted_command.append(f"35={action}")
-                for i in range(1, len(parts), 2):
-                    if i + 1 < len(parts):
-                        formatted_command.append(f"{parts[i]}={parts[i + 1]}")
-
-            formatted_message = " | ".join(formatted_command)
-
-            await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: process_command_sync(command, formatted_message)
-            )
-        except Exception as e:
-            logger.error(f"")
-        await asyncio.sleep(0.1)
+            return await state.engine.call(op, **args)
+        except (RuntimeError, ConnectionError, asyncio.TimeoutError) as e:
+            raise HTTPException(status_code=502, detail=f"FIX engine error: {e}")
+    return await asyncio.get_running_loop().run_in_executor(None, lambda: getattr(state.client, op)(**args))
+
+
+async def acknowledged(cl_ord_id, request):
+    """Wait on an AsyncClient request and map the outcome to a response"""
+    try:
+        report = await request
+    except OrderRejected as e:
+        raise HTTPException(status_code=409, detail={"clOrdID": cl_ord_id, "status": "rejected", "report": e.report})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail={"clOrdID": cl_ord_id, "status": "timeout"})
+    return {"clOrdID": cl_ord_id, "status": "acknowledged", "report": report}
+
+
+@app.post("/api/orders")
+async def create_order(order: SingleOrderRequest):
+    require_session(order.wait)
+    kwargs = order_kwargs(order)
+    if not order.wait:
+        cl_ord_id = await client_call("place_order", quiet=True, **kwargs)
+        if cl_ord_id is None:
+            raise HTTPException(status_code=502, detail="Order could not be sent")
+        return {"clOrdID": cl_ord_id, "status": "sent"}
+
+    # Registered before the send, which runs on a worker thread, so an early ack still finds it
+    cl_ord_id = state.async_client.expect(gen_order_id())
+    if await client_call("place_order", quiet=True, cl_ord_id=cl_ord_id, **kwargs) is None:
+        state.async_client.forget(cl_ord_id)
+        raise HTTPException(status_code=502, detail="Order could not be sent")
+    return await acknowledged(cl_ord_id, state.async_client.wait(cl_ord_id, order.timeout))
+
+
+@app.post("/api/orders:batch")
+async def create_orders(batch: BatchOrderRequest):
+    require_session(batch.wait)
+    orders = [order_kwargs(order) for order in batch.orders]
+    if not batch.wait:
+        cl_ord_ids = await client_call("place_orders", orders=orders, as_list=batch.as_list)
+        return {"clOrdIDs": cl_ord_ids, "sent": len(cl_ord_ids), "status": "sent"}
+
+    expected = [state.async_client.expect(gen_order_id()) for _ in orders]
+    cl_ord_ids = await client_call("place_orders", orders=orders, as_list=batch.as_list, cl_ord_ids=expected)
+    for cl_ord_id in expected[len(cl_ord_ids):]:
+        state.async_client.forget(cl_ord_id)
+    results = await asyncio.gather(*(state.async_client.wait(cl_ord_id, batch.timeout) for cl_ord_id in cl_ord_ids),
+                                   return_exceptions=True)
+    acks = []
+    for cl_ord_id, result in zip(cl_ord_ids, results):
+        if isinstance(result, OrderRejected):
+            acks.append({"clOrdID": cl_ord_id, "status": "rejected", "report": result.report})
+        elif isinstance(result, asyncio.TimeoutError):
+            acks.append({"clOrdID": cl_ord_id, "status": "timeout"})
+        elif isinstance(result, BaseException):
+            acks.append({"clOrdID": cl_ord_id, "status": "error", "error": str(result)})
+        else:
+            acks.append({"clOrdID": cl_ord_id, "status": "acknowledged", "report": result})
+    return {"clOrdIDs": cl_ord_ids, "sent": len(cl_ord_ids), "results": acks}
+
+
+@app.post("/api/orders/{cl_ord_id}/cancel")
+async def cancel_order(cl_ord_id: str, options: Optional[AckOptions] = None):
+    options = options or AckOptions()
+    require_session(options.wait)
+    if not options.wait:
+        cancel_id = await client_call("cancel_order", orig_cl_ord_id=cl_ord_id)
+        if cancel_id is None:
+            raise HTTPException(status_code=502, detail="Cancel could not be sent")
+        return {"clOrdID": cancel_id, "origClOrdID": cl_ord_id, "status": "sent"}
+    return await acknowledged(cl_ord_id, state.async_client.cancel(cl_ord_id, options.timeout))
+
+
+@app.get("/api/orders/{cl_ord_id}")
+async def get_order(cl_ord_id: str, refresh: bool = False, timeout: float = 5.0):
+    """Order from the client's local order book; refresh=true asks the market maker instead"""
+    require_session(refresh)
+    if refresh:
+        return await acknowledged(cl_ord_id, state.async_client.status(cl_ord_id, timeout))
+    order = await client_call("get_order", cl_ord_id=cl_ord_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ClOrdID: {cl_ord_id}")
+    return order
+
+
+@app.get("/health")
+async def health():
+    """Liveness: the process serves requests and no FIX thread has died"""
+    threads = {
+        "market_maker": state.market_maker_thread.is_alive() if state.market_maker_thread else None,
+        "client": state.client_thread.is_alive() if state.client_thread else None
+    }
+    if not state.engines and not state.draining and False in threads.values():
+        return JSONResponse({"status": "failed", "threads": threads}, status_code=503)
+    return {"status": "ok", "draining": state.draining, "threads": threads}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness: accepting orders, with the acceptor listening and the client session logged on"""
+    if state.engine:
+        try:
+            status = await state.engine.call("status", timeout=2)
+        except (RuntimeError, ConnectionError, asyncio.TimeoutError) as e:
+            status = {"error": str(e)}
+        checks = {"engine_connected": state.engine.connected, "client_logged_on": bool(status.get("client_logged_on"))}
+    else:
+        checks = {
+            "acceptor_started": state.acceptor_started.is_set(),
+            "client_logged_on": bool(state.client and state.client.logged_on.is_set())
+        }
+    checks["accepting_commands"] = not state.draining
+    if not all(checks.values()):
+        return JSONResponse({"status": "not_ready", **checks}, status_code=503)
+    return {"status": "ready", **checks}
+
+
+@app.post("/admin/drain")
+async def drain():
+    """Stop accepting commands and orders and wait for the queued ones; /ready turns 503 for the load balancer"""
+    await drain_commands()
+    return {"status": "draining", "queued": state.command_queue.qsize() if state.command_queue else 0}
+
+
+@app.get("/api/latency")
+async def get_latency():
+    """Per-stage latency summaries (microseconds) from the wire-to-wire tracer"""
+    return {"enabled": tracer.enabled, "stages": tracer.snapshot()}
+
+
+@app.post("/api/latency/{action}")
+async def control_latency(action: str):
+    if action == "enable":
+        tracer.enable()
+    elif action == "disable":
+        tracer.disable()
+    elif action == "reset":
+        tracer.reset()
+    else:
+        raise HTTPException(status_code=404, detail=f"Unknown action: {action}")
+    return {"enabled": tracer.enabled}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text-format metrics, aggregated from the per-thread counters at scrape time"""
+    out = metrics.PrometheusWriter()
+
+    out.metric("fix_messages_total", "counter", "FIX messages by application, direction and MsgType")
+    for (app_name, direction, msg_type), count in sorted(metrics.messages.totals().items()):
+        out.sample("fix_messages_total", count, app=app_name, direction=direction, msg_type=msg_type)
+
+    out.summary("fix_handler_latency_seconds", metrics.handler_latency.merged(), ("app", "msg_type"),
+                "Time spent in fromApp per MsgType")
+    if tracer.enabled:
+        out.summary("fix_stage_latency_seconds", tracer.histograms.merged(), ("stage",),
+                    "Wire-to-wire latency per stage")
+
+    out.metric("command_queue_depth", "gauge", "Commands waiting in the GUI command queue")
+    out.sample("command_queue_depth", state.command_queue.qsize() if state.command_queue else 0)
+    out.metric("websocket_clients", "gauge", "Connected WebSocket clients")
+    out.sample("websocket_clients", len(manager.active_connections))
+    out.metric("websocket_send_failures_total", "counter", "Failed WebSocket sends")
+    out.sample("websocket_send_failures_total", manager.send_failures)
+    out.metric("websocket_dropped_messages_total", "counter", "Messages dropped from full per-client queues")
+    out.sample("websocket_dropped_messages_total", manager.dropped_messages)
+    out.metric("websocket_slow_consumer_disconnects_total", "counter", "Clients disconnected for falling behind")
+    out.sample("websocket_slow_consumer_disconnects_total", manager.slow_consumer_disconnects)
+    out.metric("websocket_topics", "gauge", "Topics with at least one WebSocket subscriber")
+    out.sample("websocket_topics", len(manager.subscribers))
+    out.metric("websocket_last_event_seq", "counter", "Sequence number of the last event published to WebSocket clients")
+    out.sample("websocket_last_event_seq", manager.event_log.last_seq)
+    out.metric("websocket_queued_messages", "gauge", "Messages waiting in per-client queues")
+    out.sample("websocket_queued_messages",
+               sum(connection.queue.qsize() for connection in list(manager.active_connections.values())))
+
+    out.metric("open_orders", "gauge", "Working orders")
+    if state.market_maker:
+        out.sample("open_orders", len(state.market_maker.orders), app="market_maker")
+    if state.client:
+        working = sum(1 for order in list(state.client.orders.values())
+                      if order['ordStatus'] not in TERMINAL_STATUSES)
+        out.sample("open_orders", working, app="client")
+
+    out.metric("market_data_symbols", "gauge", "Symbols in the client's latest-value market data cache")
+    out.sample("market_data_symbols", len(state.client.market_data.books) if state.client else 0)
+    out.metric("market_data_subscriptions", "gauge", "Active market data subscriptions")
+    out.sample("market_data_subscriptions", len(state.market_maker.subscriptions) if state.market_maker else 0)
+    ticks = state.market_maker.ticks if state.market_maker else None
+    out.metric("tick_store_written_total", "counter", "Ticks appended to the tick history")
+    out.sample("tick_store_written_total", ticks.written if ticks else 0)
+    out.metric("tick_store_dropped_total", "counter", "Ticks dropped because the tick writer fell behind")
+    out.sample("tick_store_dropped_total", ticks.dropped if ticks else 0)
+    out.metric("tick_store_queued", "gauge", "Ticks waiting for the tick writer")
+    out.sample("tick_store_queued", ticks.queue.qsize() if ticks else 0)
+    copies = state.market_maker.drop_copy if state.market_maker else None
+    out.metric("drop_copy_written_total", "counter", "ExecutionReports appended to the drop copy feed")
+    out.sample("drop_copy_written_total", copies.written if copies else 0)
+    out.metric("drop_copy_queued", "gauge", "ExecutionReports waiting for the drop copy writer")
+    out.sample("drop_copy_queued", copies.published - copies.written if copies else 0)
+    out.metric("drop_copy_last_seq", "gauge", "Sequence number of the last drop copy record written")
+    out.sample("drop_copy_last_seq", (copies.last_seq or 0) if copies else 0)
+    out.metric("drop_copy_errors_total", "counter", "Drop copy batches that failed to write or send")
+    out.sample("drop_copy_errors_total", copies.errors if copies else 0)
+
+    session_rtt = {}
+    for app_name, application in (("market_maker", state.market_maker), ("client", state.client)):
+        if application and application.health:
+            for session, health in list(application.health.sessions.items()):
+                session_rtt[(app_name, session)] = health.rtt
+    out.summary("fix_session_rtt_seconds", session_rtt, ("app", "session"),
+                "TestRequest -> Heartbeat round trip per session")
+
+    out.metric("fix_heartbeat_interval_seconds", "gauge", "Last measured interval between received heartbeats")
+    for app_name, application in (("market_maker", state.market_maker), ("client", state.client)):
+        if application:
+            for session, interval in list(application.heartbeat_intervals.items()):
+                out.sample("fix_heartbeat_interval_seconds", interval, app=app_name, session=session)
+
+    return PlainTextResponse(out.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/market-data")
+async def get_market_data():
+    """Latest top of book per symbol"""
+    return manager.market_data.snapshot() if manager.market_data else {}
+
+
+@app.get("/api/ticks")
+async def get_ticks(symbol: str, start: Optional[float] = None, end: Optional[float] = None, limit: int = 1000):
+    """Recorded quotes for symbol between start and end (seconds since epoch), most recent limit"""
+    return await asyncio.get_running_loop().run_in_executor(
+        None, lambda: tick_store.ticks(symbol, seconds_to_ns(start), seconds_to_ns(end), limit))
+
+
+@app.get("/api/bars")
+async def get_bars(symbol: str, interval: float = 60, start: Optional[float] = None, end: Optional[float] = None):
+    """OHLC/VWAP bars of interval seconds; the last 24 hours unless start is given"""
+    if interval <= 0:
+        raise HTTPException(status_code=422, detail="interval must be positive")
+    if start is None:
+        start = (end or time.time()) - 86400
+    return await asyncio.get_running_loop().run_in_executor(
+        None, lambda: tick_store.bars(symbol, int(interval * 1e9), seconds_to_ns(start), seconds_to_ns(end)))
+
+
+@app.get("/api/drop-copy")
+async def get_drop_copy(after: int = 0, limit: int = 1000):
+    """Drop copy records with seq > after, so a consumer can resume where it stopped"""
+    if limit <= 0:
+        raise HTTPException(status_code=422, detail="limit must be positive")
+    return await asyncio.get_running_loop().run_in_executor(
+        None, lambda: list(itertools.islice(drop_copy.read(after), limit)))
+
+
+def seconds_to_ns(seconds):
+    return None if seconds is None else int(seconds * 1e9)
+
+
+@app.get("/api/fix-dictionary")
+async def get_fix_dictionary(request: Request):
+    """Field, enum and group tables from FIX44.xml for annotating messages in the GUI"""
+    dictionary = fix_dictionary.load()
+    etag = f'"{dictionary.sha256}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(dictionary.to_json(), media_type="application/json", headers={"ETag": etag})
+
+
+@app.get("/api/health/sessions")
+async def get_session_health():
+    """TestRequest round-trip and sequence gap statistics for every FIX session"""
+    return {
+        app_name: application.health.snapshot()
+        for app_name, application in (("market_maker", state.market_maker), ("client", state.client))
+        if application and application.health
+    }
+
+
+@app.post("/admin/profile/start")
+async def start_profile(seconds: float = 10.0, interval_ms: float = 5.0):
+    """Start sampling every thread for up to `seconds`"""
+    profiler.interval = interval_ms / 1000
+    profiler.start(seconds)
+    return {"status": "started", "seconds": seconds, "interval_ms": interval_ms}
+
+
+@app.post("/admin/profile/stop")
+async def stop_profile():
+    await asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+    return {"status": "stopped", "samples": profiler.samples, "threads": profiler.by_thread()}
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def get_profile(seconds: float = 0):
+    """Collapsed-stack profile (flamegraph.pl / speedscope input); seconds > 0 profiles first and waits"""
+    if seconds > 0:
+        profiler.start(seconds)
+        await asyncio.sleep(seconds)
+        await asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+    return PlainTextResponse(profiler.collapsed())
+
+
+@app.post("/admin/handler-timing/{action}")
+async def control_handler_timing(action: str):
+    targets = ((state.market_maker, "market_maker", MARKET_MAKER_HANDLERS), (state.client, "client", CLIENT_HANDLERS))
+    for application, app_name, names in targets:
+        if application is None:
+            continue
+        if action == "enable":
+            enable_handler_timing(application, app_name, names)
+        elif action == "disable":
+            disable_handler_timing(application, names)
+        elif action != "reset":
+            raise HTTPException(status_code=404, detail=f"Unknown action: {action}")
+    if action == "reset":
+        handler_timings.clear()
+    return {"status": action}
+
+
+@app.get("/admin/handler-timing")
+async def get_handler_timing():
+    """Per-handler call latency in microseconds"""
+    return {f"{app_name}.{name}": histogram.summary()
+            for (app_name, name), histogram in sorted(handler_timings.merged().items())}
 
 
 def process_command_sync(command):
     try:
         if state.client and state.client.session_id:
             # Format the command here before processing
-            formatted_message = format_fix_command(command)
+            formatted_message = commands.to_pipe(command)
             state.client.process_command(command)
 
             # Broadcast the formatted command to UI
@@ -232,60 +711,35 @@ def process_command_sync(command):
         logger.error(f"Error processing command synchronously: {e}")
 
 
-def format_fix_command(command: str) -> str:
-    """Format command into FIX message format with delimiters"""
-    try:
-        parts = command.split()
-        action = parts[0].lower()
-        formatted_parts = []
-
-        if action in ["status", "cancel"]:
-            if len(parts) >= 2:
-                formatted_parts.append(f"35={action}")
-                formatted_parts.append(f"11={parts[1]}")  # ClOrdID
-        else:
-            formatted_parts.append(f"35={action}")
-            # Handle order commands (buy/sell)
-            if action in ["buy", "sell"]:
-                if len(parts) >= 3:
-                    formatted_parts.append(f"54={'1' if action == 'buy' else '2'}")  # Side
-                    formatted_parts.append(f"55={parts[1]}")  # Symbol
-                    formatted_parts.append(f"38={parts[2]}")  # Quantity
-
-                    # Handle order type and price
-                    if len(parts) > 3:
-                        order_type = parts[3].lower()
-                        if order_type == "limit" and len(parts) > 4:
-                            formatted_parts.append("40=2")  # Order Type = Limit
-                            formatted_parts.append(f"44={parts[4]}")  # Price
-                        elif order_type == "market":
-                            formatted_parts.append("40=1")  # Order Type = Market
-                        elif order_type == "stop" and len(parts) > 4:
-                            formatted_parts.append("40=3")  # Order Type = Stop
-                            formatted_parts.append(f"99={parts[4]}")  # StopPx
-                        elif order_type == "stop_limit" and len(parts) > 5:
-                            formatted_parts.append("40=4")  # Order Type = Stop Limit
-                            formatted_parts.append(f"99={parts[4]}")  # StopPx
-                            formatted_parts.append(f"44={parts[5]}")  # Price
-
-        return " | ".join(formatted_parts)
-    except Exception as e:
-        logger.error(f"Error formatting command: {e}")
-        return command
-
 async def command_processor():
+    """Hand queued commands to a worker thread in batches, as fast as they arrive"""
     while state.running:
         try:
-            command = await state.command_queue.get()
-            await asyncio.get_event_loop().run_in_executor(None, process_command_sync, command)
+            batch = [await state.command_queue.get()]
+            while len(batch) < COMMAND_BATCH_SIZE and not state.command_queue.empty():
+                batch.append(state.command_queue.get_nowait())
+            try:
+                if state.engine:
+                    for command in batch:
+                        await state.engine.call("command", command=command)
+                else:
+                    await asyncio.get_running_loop().run_in_executor(None, process_commands_sync, batch)
+            finally:
+                for _ in batch:
+                    state.command_queue.task_done()
         except Exception as e:
-            logger.error(f"")
-        await asyncio.sleep(0.1)
+            logger.error(f"Error processing commands: {e}")
+
+
+def process_commands_sync(batch):
+    for command in batch:
+        process_command_sync(command)
 
 
 def signal_handler(signum, frame):
     logger.info("Received shutdown signal")
     state.running = False
+    state.shutdown.set()
 
 
 if __name__ == "__main__":
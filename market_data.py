@@ -0,0 +1,95 @@
+'''Latest-value market data cache and conflated encodings.
+
+The client writes a top-of-book dict per symbol into MarketDataCache on its
+QuickFIX thread. Every change bumps a cache-wide version; readers ask for the
+symbols changed since the version they last saw, so however many ticks arrive
+in between, a reader only ever gets the latest book for each changed symbol.'''
+
+import math
+import struct
+import threading
+from collections import OrderedDict
+
+import fix_codec
+
+QUOTE_FIELDS = ('bid', 'bidSize', 'offer', 'offerSize')
+# Snapshot and incremental refresh: these reach the GUI only through the conflated channel
+MARKET_DATA_MSG_TYPES = ('W', 'X')
+
+# Binary frame: b'M', uint32 version, uint16 count, then per quote
+# uint8 symbol length, symbol (utf-8), bid, bidSize, offer, offerSize as float64 (NaN when absent)
+BINARY_HEADER = struct.Struct('<cIH')
+BINARY_QUOTE = struct.Struct('<4d')
+
+
+class MarketDataCache:
+    def __init__(self):
+        self.books = {}
+        self.version = 0
+        # symbol -> version of its last change, least recently changed first
+        self._versions = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.on_change = None
+
+    def update(self, snapshot):
+        """Store the latest book for snapshot['symbol']; unchanged books are ignored"""
+        symbol = snapshot.get('symbol')
+        if not symbol:
+            return
+        book = {field: snapshot.get(field) for field in QUOTE_FIELDS}
+        with self._lock:
+            if self.books.get(symbol) == book:
+                return
+            self.books[symbol] = book
+            self.version += 1
+            self._versions[symbol] = self.version
+            self._versions.move_to_end(symbol)
+            # Wake the reader once per batch of changes rather than once per tick
+            wake = not self._dirty
+            self._dirty = True
+        if wake and self.on_change is not None:
+            self.on_change()
+
+    def acknowledge(self):
+        """Called by the reader before collecting changes, re-arming on_change"""
+        with self._lock:
+            self._dirty = False
+
+    def changed_since(self, version):
+        """([(symbol, book), ...] changed after version, current version)"""
+        with self._lock:
+            changed = []
+            for symbol in reversed(self._versions):
+                if self._versions[symbol] <= version:
+                    break
+                changed.append((symbol, self.books[symbol]))
+            return changed, self.version
+
+    def snapshot(self):
+        with self._lock:
+            return {symbol: dict(book) for symbol, book in self.books.items()}
+
+
+def is_market_data(raw):
+    """Whether a raw FIX message is market data, by its MsgType(35)"""
+    return fix_codec.get_field(raw, 35) in MARKET_DATA_MSG_TYPES
+
+
+def encode_json(changed, version):
+    """Compact JSON frame: {"type":"md","v":version,"q":[[symbol,bid,bidSize,offer,offerSize],...]}"""
+    quotes = ",".join(
+        '["%s",%s]' % (symbol.replace('\\', '\\\\').replace('"', '\\"'),
+                       ",".join("null" if book[field] is None else repr(book[field]) for field in QUOTE_FIELDS))
+        for symbol, book in changed)
+    return '{"type":"md","v":%d,"q":[%s]}' % (version, quotes)
+
+
+def encode_binary(changed, version):
+    parts = [BINARY_HEADER.pack(b'M', version & 0xFFFFFFFF, len(changed))]
+    for symbol, book in changed:
+        name = symbol.encode('utf-8')[:255]
+        parts.append(bytes((len(name),)) + name)
+        parts.append(BINARY_QUOTE.pack(*(math.nan if book[field] is None else book[field]
+                                         for field in QUOTE_FIELDS)))
+    return b"".join(parts)
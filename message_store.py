@@ -0,0 +1,141 @@
+'''Message store selection and FileStore compaction.
+
+The backend is chosen per cfg file with MessageStoreBackend in [DEFAULT]:
+
+    file    QuickFIX FileStore under FileStorePath (default). Survives restarts,
+            so resend requests are answered across restarts.
+    memory  QuickFIX MemoryStore. Nothing touches disk; sent messages are only
+            kept for resends while the process runs. For load tests.
+    shm     FileStore under /dev/shm (FileStorePath is placed below it). Writes
+            go to RAM-backed tmpfs; resends work across process restarts but
+            not across reboots.
+
+With MessageStoreCompactKeep=N a FileStore is compacted when the store
+factory is created, before any session opens its files, keeping the last N
+messages of each session. Resend requests for older messages are answered
+with a SequenceReset-GapFill, as for any message missing from the store.
+
+The compaction tool can also be run by hand while the engine is stopped:
+
+    python message_store.py compact store_market_maker --keep 10000'''
+
+import argparse
+import glob
+import os
+import quickfix as fix
+
+BACKENDS = ('file', 'memory', 'shm')
+SHM_ROOT = '/dev/shm'
+
+
+def setting(settings, key, default=None):
+    """A [DEFAULT] setting as a string"""
+    defaults = settings.get()
+    return defaults.getString(key) if defaults.has(key) else default
+
+
+def store_factory(settings):
+    """Store factory for the backend named by MessageStoreBackend; may return rewritten settings.
+
+    Returns (factory, settings): the shm backend moves FileStorePath, so callers
+    must build their acceptor/initiator from the settings returned here."""
+    backend = setting(settings, 'MessageStoreBackend', 'file').lower()
+    if backend not in BACKENDS:
+        raise fix.ConfigError(f"MessageStoreBackend must be one of {', '.join(BACKENDS)}, not {backend}")
+    if backend == 'memory':
+        return fix.MemoryStoreFactory(), settings
+
+    if backend == 'shm':
+        settings = with_store_root(settings, SHM_ROOT)
+    keep = setting(settings, 'MessageStoreCompactKeep')
+    if keep is not None:
+        for path in store_paths(settings):
+            compact_directory(path, int(keep))
+    return fix.FileStoreFactory(settings), settings
+
+
+def store_paths(settings):
+    paths = set()
+    for session_id in settings.getSessions():
+        dictionary = settings.get(session_id)
+        if dictionary.has('FileStorePath'):
+            paths.add(dictionary.getString('FileStorePath'))
+    return paths
+
+
+def with_store_root(settings, root):
+    """Copy of settings with every FileStorePath moved below root"""
+    rewritten = fix.SessionSettings()
+    defaults = settings.get()
+    if defaults.has('FileStorePath'):
+        defaults.setString('FileStorePath', os.path.join(root, defaults.getString('FileStorePath').lstrip('/')))
+    rewritten.set(defaults)
+    for session_id in settings.getSessions():
+        dictionary = settings.get(session_id)
+        if dictionary.has('FileStorePath'):
+            dictionary.setString('FileStorePath',
+                                 os.path.join(root, dictionary.getString('FileStorePath').lstrip('/')))
+        rewritten.set(session_id, dictionary)
+    return rewritten
+
+
+def read_header(header_path):
+    """FileStore .header entries: [(seq, offset, size), ...]"""
+    with open(header_path) as f:
+        return [tuple(int(value) for value in entry.split(',')) for entry in f.read().split()]
+
+
+def compact_store(body_path, keep):
+    """Keep the last `keep` messages of one FileStore session; returns (kept, dropped)"""
+    header_path = body_path[:-len('.body')] + '.header'
+    entries = read_header(header_path)
+    if len(entries) <= keep:
+        return len(entries), 0
+    kept = sorted(entries)[-keep:] if keep > 0 else []
+
+    with open(body_path, 'rb') as body:
+        frames = []
+        for seq, offset, size in kept:
+            body.seek(offset)
+            frames.append((seq, body.read(size)))
+
+    # Write new files beside the old ones and swap, so a crash leaves a usable store
+    offset = 0
+    header = []
+    with open(body_path + '.compact', 'wb') as body:
+        for seq, frame in frames:
+            body.write(frame)
+            header.append(f"{seq},{offset},{len(frame)} ")
+            offset += len(frame)
+    with open(header_path + '.compact', 'w') as f:
+        f.write("".join(header))
+    os.replace(body_path + '.compact', body_path)
+    os.replace(header_path + '.compact', header_path)
+    return len(kept), len(entries) - len(kept)
+
+
+def compact_directory(path, keep):
+    results = {}
+    for body_path in sorted(glob.glob(os.path.join(path, '*.body'))):
+        if os.path.exists(body_path[:-len('.body')] + '.header'):
+            results[body_path] = compact_store(body_path, keep)
+            kept, dropped = results[body_path]
+            if dropped:
+                print(f"Compacted {body_path}: kept {kept}, dropped {dropped}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FileStore maintenance; run while the FIX engines are stopped")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compact = subparsers.add_parser('compact', help="keep only the newest messages of every session")
+    compact.add_argument('paths', nargs='+', help="FileStorePath directories")
+    compact.add_argument('--keep', type=int, default=10000, help="messages to keep per session")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        compact_directory(path, args.keep)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''Process-wide counters for the FIX applications and the web tier.
+
+The FIX callbacks only ever touch their own thread's dict (CounterSet) or
+histogram (latency.HistogramSet); nothing is locked on the hot path. Totals
+are summed when /metrics is scraped and rendered in the Prometheus text
+exposition format.'''
+
+import threading
+
+from latency import HistogramSet
+
+
+class CounterSet:
+    """Counters keyed by a label tuple, kept per thread and summed on read"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._per_thread = []
+        self._lock = threading.Lock()
+
+    def inc(self, key, amount=1):
+        counts = getattr(self._local, 'counts', None)
+        if counts is None:
+            counts = self._local.counts = {}
+            with self._lock:
+                self._per_thread.append(counts)
+        counts[key] = counts.get(key, 0) + amount
+
+    def totals(self):
+        totals = {}
+        with self._lock:
+            per_thread = list(self._per_thread)
+        for counts in per_thread:
+            for key, count in list(counts.items()):
+                totals[key] = totals.get(key, 0) + count
+        return totals
+
+
+# (app, direction, MsgType) -> messages seen in toAdmin/fromAdmin/toApp/fromApp
+messages = CounterSet()
+# (app, MsgType) -> fromApp handling time in ns
+handler_latency = HistogramSet()
+
+
+def count_message(app, direction, message):
+    """Count one message for an application callback; returns its MsgType"""
+    try:
+        msg_type = message.getHeader().getField(35)
+    except Exception:
+        msg_type = "UNKNOWN"
+    messages.inc((app, direction, msg_type))
+    return msg_type
+
+
+class PrometheusWriter:
+    """Builds a Prometheus text-format exposition"""
+
+    def __init__(self):
+        self.lines = []
+
+    def metric(self, name, kind, help_text):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, value, **labels):
+        if labels:
+            rendered = ",".join(f'{key}="{escape_label(value_)}"' for key, value_ in labels.items())
+            self.lines.append(f"{name}{{{rendered}}} {value}")
+        else:
+            self.lines.append(f"{name} {value}")
+
+    def summary(self, name, histograms, label_names, help_text):
+        """Render {label tuple: LatencyHistogram} (ns) as a summary in seconds"""
+        self.metric(name, "summary", help_text)
+        for key, histogram in sorted(histograms.items()):
+            labels = dict(zip(label_names, key if isinstance(key, tuple) else (key,)))
+            for quantile in (0.5, 0.9, 0.99, 0.999):
+                self.sample(name, histogram.percentile(quantile * 100) / 1e9, quantile=quantile, **labels)
+            self.sample(f"{name}_sum", histogram.total / 1e9, **labels)
+            self.sample(f"{name}_count", histogram.count, **labels)
+
+    def render(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
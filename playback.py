@@ -0,0 +1,204 @@
+'''Plays a blotter of orders, cancels and replaces into a Client.
+
+A blotter is a CSV file with a header row or a JSONL file (one object per
+line). Each record is either a command line, as typed at the CLI prompt:
+
+    {"time": 0.5, "command": "buy USD/BRL 100 limit 5.1"}
+
+or its fields, with the same names as the REST order API:
+
+    time,id,action,symbol,quantity,order_type,price,stop_price,ref
+    0.0,a1,buy,USD/BRL,100,limit,5.1,,
+    0.2,a2,sell,USD/BRL,200,market,,,
+    1.5,,replace,,150,,5.2,,a1
+    3.0,,cancel,,,,,,a1
+
+action is buy, sell, cancel, replace or status. id names an order within the
+blotter and ref (or the ClOrdID in a command line) refers back to it, so
+cancels and replaces reach the ClOrdID the order was actually sent with;
+unknown refs are sent as given. time is seconds (any origin) or an ISO
+timestamp.
+
+    python playback.py blotter.csv --rate 500
+    python playback.py blotter.jsonl --timestamps --speed 10
+
+--rate sends at a fixed number of records per second, --timestamps keeps the
+file's own spacing (--speed N plays N times faster) and neither sends as fast
+as possible. Records are read one at a time, so memory does not grow with the
+size of the file; only the ids of live orders are remembered. The CLI's
+`play FILE [RATE]` command does the same in the interactive client.'''
+
+import argparse
+import csv
+import json
+import time
+from datetime import datetime
+import quickfix as fix
+
+import commands
+import message_store
+
+
+def read_csv(path):
+    with open(path, newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield json.loads(line)
+
+
+def read_blotter(path):
+    return read_csv(path) if path.lower().endswith('.csv') else read_jsonl(path)
+
+
+def field(record, name):
+    """A record value as a string, None when absent or empty (CSV has no nulls)"""
+    value = record.get(name)
+    if value is None or value == '':
+        return None
+    return str(value)
+
+
+def parse_time(value):
+    """Seconds from a number or an ISO timestamp"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def to_command(record):
+    """commands.parse() dict for one blotter record"""
+    if field(record, 'command'):
+        return commands.parse(record['command'])
+
+    action = (field(record, 'action') or '').lower()
+    if action in commands.SIDES:
+        order_type = (field(record, 'order_type') or 'market').lower()
+        if order_type not in commands.ORDER_TYPES:
+            raise commands.CommandError(f"Invalid order type: {order_type}")
+        command = {'action': 'order', 'side': commands.SIDES[action], 'symbol': field(record, 'symbol'),
+                   'quantity': field(record, 'quantity'), 'orderType': commands.ORDER_TYPES[order_type][0],
+                   'price': field(record, 'price'), 'stopPrice': field(record, 'stop_price')}
+        if not command['symbol'] or not command['quantity']:
+            raise commands.CommandError("Order needs symbol and quantity")
+    elif action in ('cancel', 'status', 'replace'):
+        ref = field(record, 'ref') or field(record, 'cl_ord_id')
+        if not ref:
+            raise commands.CommandError(f"{action} needs ref")
+        command = {'action': action, 'clOrdID': ref}
+        if action == 'replace':
+            command['quantity'] = field(record, 'quantity')
+            command['price'] = field(record, 'price')
+            if not command['quantity']:
+                raise commands.CommandError("replace needs quantity")
+    else:
+        raise commands.CommandError(f"Invalid action: {action or 'missing'}")
+
+    missing = commands.missing(command)
+    if missing:
+        raise commands.CommandError(f"Order is missing {', '.join(missing)}")
+    return command
+
+
+class Playback:
+    def __init__(self, client, rate=None, timestamps=False, speed=1.0):
+        self.client = client
+        self.rate = rate
+        self.timestamps = timestamps
+        self.speed = speed
+        # Blotter id -> ClOrdID of the live order it names
+        self.ids = {}
+        self.sent = 0
+        self.errors = 0
+        self.max_lag = 0.0
+
+    def play(self, path):
+        """Send every record of the blotter at path; returns elapsed seconds"""
+        started = time.perf_counter()
+        first_time = None
+        for number, record in enumerate(read_blotter(path)):
+            if self.rate:
+                due = started + number / self.rate
+            elif self.timestamps and field(record, 'time') is not None:
+                record_time = parse_time(field(record, 'time'))
+                if first_time is None:
+                    first_time = record_time
+                due = started + (record_time - first_time) / self.speed
+            else:
+                due = None
+            if due is not None:
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.max_lag = max(self.max_lag, -delay)
+
+            try:
+                self.send(record)
+            except Exception as e:
+                self.errors += 1
+                print(f"Skipping record {number + 1}: {e}")
+
+        elapsed = time.perf_counter() - started
+        self.client.logger.flush()
+        print(f"Played {self.sent} records from {path} in {elapsed:.2f}s "
+              f"({self.sent / elapsed if elapsed else 0:.0f}/s), {self.errors} skipped, "
+              f"max lag {self.max_lag * 1000:.1f} ms")
+        return elapsed
+
+    def send(self, record):
+        command = to_command(record)
+        ref = command.get('clOrdID')
+        if ref is not None:
+            command['clOrdID'] = self.ids.get(ref, ref)
+
+        cl_ord_id = self.client.execute(command, quiet=True)
+        if cl_ord_id is None and command['action'] in ('order', 'replace'):
+            raise RuntimeError("not sent")
+        self.sent += 1
+
+        if command['action'] == 'order' and field(record, 'id'):
+            self.ids[field(record, 'id')] = cl_ord_id
+        elif command['action'] == 'replace':
+            # Later records keep using the blotter id; it now names the replacement
+            self.ids[ref] = cl_ord_id
+        elif command['action'] == 'cancel':
+            self.ids.pop(ref, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a CSV or JSONL blotter of orders into the FIX client")
+    parser.add_argument("blotter", help="a .csv file with a header row, or .jsonl")
+    parser.add_argument("--rate", type=float, help="records per second")
+    parser.add_argument("--timestamps", action="store_true", help="keep the spacing of the records' time field")
+    parser.add_argument("--speed", type=float, default=1.0, help="with --timestamps, play N times faster")
+    parser.add_argument("--config", default="client.cfg")
+    parser.add_argument("--logon-timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    # Client imports this module for its play command
+    from Client import Client
+
+    store_factory, settings = message_store.store_factory(fix.SessionSettings(args.config))
+    client = Client()
+    initiator = fix.SocketInitiator(client, store_factory, settings, fix.ScreenLogFactory(settings))
+    initiator.start()
+    try:
+        if not client.logged_on.wait(args.logon_timeout):
+            print(f"No logon within {args.logon_timeout:g}s")
+            return
+        Playback(client, args.rate, args.timestamps, args.speed).play(args.blotter)
+        # Give the last acknowledgements a moment before logging out
+        time.sleep(1)
+    finally:
+        initiator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+'''On-demand profiling.
+
+SamplingProfiler walks sys._current_frames() for every thread at a fixed
+interval and counts collapsed stacks ("thread;module:function;... count"), the
+input format of flamegraph.pl and speedscope. Nothing runs until start().
+
+enable_handler_timing() wraps named methods of an application instance so each
+call is timed into a HistogramSet; disable_handler_timing() deletes the
+wrappers again, so the class methods run untouched while timing is off.'''
+
+import functools
+import sys
+import threading
+import time
+
+from latency import HistogramSet
+
+MARKET_MAKER_HANDLERS = ('handle_new_order', 'handle_new_order_list', 'handle_cancel_request',
+                         'handle_replace_request', 'handle_market_data_request', 'handle_order_status_request',
+                         'handle_mass_cancel_request', 'handle_mass_status_request')
+CLIENT_HANDLERS = ('fromApp', 'on_execution_report', 'on_market_data', 'on_order_cancel_reject')
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self.started = None
+        self.finished = None
+        self._stop = threading.Event()
+        self._thread = None
+        # Guards self.stacks, which the sampler thread writes while a profile is read
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=10.0):
+        """Sample all threads for up to seconds; a running profile is restarted"""
+        self.stop()
+        with self._lock:
+            self.stacks = {}
+        self.samples = 0
+        self.started = time.time()
+        self.finished = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(seconds,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self.running:
+            self._stop.set()
+            self._thread.join()
+
+    def _run(self, seconds):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            keys = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                keys.append(";".join(reversed(stack)))
+            with self._lock:
+                for key in keys:
+                    self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+        self.finished = time.time()
+
+    def snapshot(self):
+        """Copy of the stack counts so far; safe while the sampler is running"""
+        with self._lock:
+            return dict(self.stacks)
+
+    def collapsed(self):
+        """Profile in collapsed-stack format, hottest stacks first"""
+        return "\n".join(f"{stack} {count}" for stack, count in
+                         sorted(self.snapshot().items(), key=lambda item: item[1], reverse=True)) + "\n"
+
+    def by_thread(self):
+        """Sample counts per thread, to see which thread is burning CPU"""
+        totals = {}
+        for stack, count in self.snapshot().items():
+            thread = stack.split(";", 1)[0]
+            totals[thread] = totals.get(thread, 0) + count
+        return totals
+
+
+handler_timings = HistogramSet()
+
+
+def enable_handler_timing(application, app_name, names, histograms=handler_timings):
+    """Time calls to application.<name> for each name into histograms[(app_name, name)]"""
+    for name in names:
+        if name in vars(application):
+            continue
+        method = getattr(application, name, None)
+        if method is None:
+            continue
+        setattr(application, name, _timed(method, (app_name, name), histograms))
+
+
+def disable_handler_timing(application, names):
+    for name in names:
+        if getattr(vars(application).get(name), '__wrapped__', None) is not None:
+            delattr(application, name)
+
+
+def _timed(method, key, histograms):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter_ns()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            histograms.record(key, time.perf_counter_ns() - started)
+    return wrapper
@@ -0,0 +1,219 @@
+'''Replays recorded client traffic into a MarketMaker, without a network peer.
+
+Input is either a MessageLogger log (logs/marketmaker/messages/incoming_app.log)
+or a FileStore body holding the client's sent messages
+(store_client/FIX.4.4-CLIENT-MARKET_MAKER.body). Application messages are fed
+straight into MarketMaker.fromApp; what it sends is captured by overriding
+MarketMaker.send instead of going to a session.
+
+    python replay.py logs/marketmaker/messages/incoming_app.log --speed 0
+    python replay.py logs/marketmaker/messages/incoming_app.log --speed 10 \\
+        --expected logs/marketmaker/messages/outgoing_app.log
+    python replay.py store_client/FIX.4.4-CLIENT-MARKET_MAKER.body --speed 1 --json replay.json
+
+--speed 1 keeps the recorded inter-arrival times, N replays N times faster and
+0 as fast as possible. With --expected, the ExecutionReports produced are
+diffed against the recorded ones, ignoring fields that differ on every run
+(OrderID, ExecID, times, sequence numbers).'''
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+import quickfix as fix
+
+from Market_maker import MarketMaker
+from latency import HistogramSet, format_summary_table, sending_time_ns
+from message_store import read_header
+import fix_codec
+import fix_dictionary
+
+ADMIN_MSG_TYPES = {'0', '1', '2', '3', '4', '5', 'A'}
+# Fields that legitimately differ between the recorded run and the replay
+VOLATILE_TAGS = {8, 9, 10, 17, 34, 37, 43, 49, 52, 56, 60, 122, 9100, 9101}
+LOG_TIME_FORMAT = '%Y%m%d-%H:%M:%S.%f'
+
+
+def read_log(path):
+    """(arrival time in ns, raw message) from a MessageLogger file"""
+    with open(path) as f:
+        for line in f:
+            timestamp, sep, rest = line.partition(' : ')
+            if not sep or not timestamp[:8].isdigit():
+                continue  # "Parsed Content:" and separator lines
+            _, _, formatted = rest.partition(' : ')
+            raw = fix_codec.from_pipe(formatted)
+            arrived = datetime.strptime(timestamp, LOG_TIME_FORMAT)
+            yield int(arrived.timestamp() * 1e9), raw
+
+
+def read_store(body_path):
+    """(SendingTime in ns, raw message) from a FileStore .body, in sequence order"""
+    entries = sorted(read_header(body_path[:-len('.body')] + '.header'))
+    with open(body_path, 'rb') as body:
+        for _, offset, size in entries:
+            body.seek(offset)
+            frame = body.read(size)
+            sending_time = fix_codec.get_field(frame, 52)
+            yield sending_time_ns(sending_time) if sending_time else None, frame.decode('latin-1')
+
+
+def read_messages(path):
+    return read_store(path) if path.endswith('.body') else read_log(path)
+
+
+class ReplayMarketMaker(MarketMaker):
+    """MarketMaker whose outbound messages are collected instead of sent"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = []
+
+    def send(self, message, session_id):
+        self.sent.append(message.toString())
+
+    def send_market_data(self, md_req_id, session_id, symbol_value):
+        # Same snapshot, without the 10 second pacing of the live feed
+        if symbol_value in self.prices:
+            self.send(self.market_data_snapshot(md_req_id, symbol_value), session_id)
+
+    def format_and_print_message(self, prefix, message):
+        pass
+
+
+class Replayer:
+    def __init__(self, speed=0.0, dictionary="FIX44.xml"):
+        self.speed = speed
+        self.data_dictionary = fix.DataDictionary(dictionary)
+        self.market_maker = ReplayMarketMaker()
+        self.session_id = fix.SessionID("FIX.4.4", "MARKET_MAKER", "CLIENT")
+        self.histograms = HistogramSet()
+        self.replayed = 0
+        self.skipped = 0
+
+    def run(self, path):
+        """Replay every application message in path; returns elapsed seconds"""
+        first_recorded = None
+        started = time.perf_counter_ns()
+        for recorded_at, raw in read_messages(path):
+            msg_type = fix_codec.get_field(raw, 35)
+            if msg_type in ADMIN_MSG_TYPES or msg_type is None:
+                continue
+            if self.speed > 0 and recorded_at is not None:
+                if first_recorded is None:
+                    first_recorded = recorded_at
+                due = started + (recorded_at - first_recorded) / self.speed
+                delay = due - time.perf_counter_ns()
+                if delay > 0:
+                    time.sleep(delay / 1e9)
+            try:
+                message = fix.Message(raw, self.data_dictionary, False)
+            except (fix.InvalidMessage, fix.ConfigError) as e:
+                print(f"Skipping unparseable message: {e}")
+                self.skipped += 1
+                continue
+            handle_started = time.perf_counter_ns()
+            self.market_maker.fromApp(message, self.session_id)
+            self.histograms.record(msg_type, time.perf_counter_ns() - handle_started)
+            self.replayed += 1
+        return (time.perf_counter_ns() - started) / 1e9
+
+    def report(self, elapsed):
+        histograms = self.histograms.merged()
+        print(format_summary_table(histograms))
+        rate = self.replayed / elapsed if elapsed else 0
+        print(f"Replayed {self.replayed} messages in {elapsed:.3f}s ({rate:.0f} msg/s), "
+              f"skipped {self.skipped}, {len(self.market_maker.sent)} messages sent")
+        return {
+            'replayed': self.replayed,
+            'skipped': self.skipped,
+            'sent': len(self.market_maker.sent),
+            'seconds': round(elapsed, 4),
+            'rate': round(rate, 1),
+            'latency_us': {msg_type: histogram.summary() for msg_type, histogram in histograms.items()}
+        }
+
+
+def execution_reports(raws):
+    """{(ClOrdID, ExecType): [fields, ...]} of the ExecutionReports among raws"""
+    reports = {}
+    for raw in raws:
+        if fix_codec.get_field(raw, 35) != fix.MsgType_ExecutionReport:
+            continue
+        fields = {tag: value for tag, value in fix_codec.to_dict(raw).items() if tag not in VOLATILE_TAGS}
+        reports.setdefault((fields.get(11), fields.get(150)), []).append(fields)
+    return reports
+
+
+def diff_execution_reports(expected_raws, actual_raws, limit=20, dictionary=None):
+    """Compare recorded and replayed ExecutionReports matched by (ClOrdID, ExecType)"""
+    label = dictionary.label if dictionary else str
+    expected = execution_reports(expected_raws)
+    actual = execution_reports(actual_raws)
+    matched, mismatched, missing, unexpected = 0, [], [], []
+    for key, reports in expected.items():
+        replayed = actual.get(key, [])
+        for index, fields in enumerate(reports):
+            if index >= len(replayed):
+                missing.append(key)
+                continue
+            differences = {tag: (fields.get(tag), replayed[index].get(tag))
+                           for tag in set(fields) | set(replayed[index])
+                           if fields.get(tag) != replayed[index].get(tag)}
+            if differences:
+                mismatched.append({'key': key, 'fields': differences})
+            else:
+                matched += 1
+        unexpected.extend([key] * max(0, len(replayed) - len(reports)))
+    unexpected.extend(key for key, reports in actual.items() if key not in expected for _ in reports)
+
+    print(f"ExecutionReports: {matched} matched, {len(mismatched)} different, "
+          f"{len(missing)} missing, {len(unexpected)} unexpected")
+    for difference in mismatched[:limit]:
+        print(f"  ClOrdID={difference['key'][0]} ExecType={difference['key'][1]}: "
+              + ", ".join(f"{label(tag)}: {old!r} -> {new!r}" for tag, (old, new) in sorted(difference['fields'].items())))
+    for key in missing[:limit]:
+        print(f"  missing: ClOrdID={key[0]} ExecType={key[1]}")
+    for key in unexpected[:limit]:
+        print(f"  unexpected: ClOrdID={key[0]} ExecType={key[1]}")
+    return {
+        'matched': matched,
+        'different': len(mismatched),
+        'missing': len(missing),
+        'unexpected': len(unexpected),
+        'differences': [{'clOrdID': d['key'][0], 'execType': d['key'][1], 'fields': d['fields']}
+                        for d in mismatched[:limit]]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded client messages into a MarketMaker")
+    parser.add_argument("input", help="incoming_app.log or the client's FileStore .body")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="1 keeps recorded timing, N is N times faster, 0 is as fast as possible")
+    parser.add_argument("--expected", help="recorded market maker output (outgoing_app.log or its .body) to diff")
+    parser.add_argument("--dictionary", default="FIX44.xml")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        parser.error(f"{args.input} not found")
+    replayer = Replayer(args.speed, args.dictionary)
+    try:
+        elapsed = replayer.run(args.input)
+    except KeyboardInterrupt:
+        print("Replay interrupted by user.")
+        return
+    results = replayer.report(elapsed)
+    if args.expected:
+        results['diff'] = diff_execution_reports((raw for _, raw in read_messages(args.expected)),
+                                                 replayer.market_maker.sent,
+                                                 dictionary=fix_dictionary.load(args.dictionary))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, default=list)
+
+
+if __name__ == "__main__":
+    main()
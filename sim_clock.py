@@ -0,0 +1,71 @@
+'''Clocks for the market maker: wall time, or virtual time for simulations.
+
+MarketMaker reads the time and sleeps only through its clock, and draws
+prices and ids only from its own random.Random, so a VirtualClock and a seeded
+Random make a run reproducible and as fast as the CPU allows:
+
+    MarketMaker(clock=VirtualClock(start), rng=random.Random(42))
+
+A VirtualClock's time only moves when it is slept on or advanced, so it must
+be driven from one thread (see simulate.py); wall clock mode is unchanged.'''
+
+import threading
+import time
+from datetime import datetime, timezone
+
+FIX_TIMESTAMP_FORMAT = '%Y%m%d-%H:%M:%S.%f'
+
+
+class WallClock:
+    virtual = False
+
+    def time_ns(self):
+        return time.time_ns()
+
+    def now(self):
+        """Local time, as the logs have always used"""
+        return datetime.now()
+
+    def utcnow(self):
+        return datetime.now(timezone.utc)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """Simulated UTC time that jumps forward instead of waiting"""
+    virtual = True
+
+    def __init__(self, start=None):
+        if start is None:
+            start = datetime(2024, 1, 2, tzinfo=timezone.utc)
+        if isinstance(start, datetime):
+            start = int(start.replace(tzinfo=start.tzinfo or timezone.utc).timestamp()) * 1000000000
+        self._now = int(start)
+        self._lock = threading.Lock()
+
+    def time_ns(self):
+        return self._now
+
+    def now(self):
+        """Log timestamps are UTC in virtual time so runs match across time zones"""
+        return self.utcnow().replace(tzinfo=None)
+
+    def utcnow(self):
+        seconds, ns = divmod(self._now, 1000000000)
+        return datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=ns // 1000)
+
+    def sleep(self, seconds):
+        with self._lock:
+            self._now += int(seconds * 1e9)
+
+    def advance_to(self, ns):
+        """Move to ns unless time is already past it"""
+        with self._lock:
+            self._now = max(self._now, int(ns))
+
+
+def fix_timestamp(clock):
+    """UTCTimestamp with milliseconds, as QuickFIX writes TransactTime"""
+    return clock.utcnow().strftime(FIX_TIMESTAMP_FORMAT)[:-3]
@@ -0,0 +1,203 @@
+'''Runs the market maker in virtual time: a day of trading in seconds, reproducibly.
+
+The MarketMaker gets a VirtualClock and a seeded random.Random (see
+sim_clock.py). Instead of the price thread and a network peer, one thread
+pops events off a time-ordered queue: price ticks every PRICE_INTERVAL
+seconds, market data subscriptions, and a synthetic order flow of limit
+orders, cancels and status requests drawn from its own seeded Random. What
+the market maker sends is captured with its virtual send time.
+
+    python simulate.py --seed 42
+    python simulate.py --seed 42 --hours 8 --orders-per-hour 5000 --output sim.log
+    python simulate.py --seed 7 --ticks sim_ticks
+
+The same seed and options produce byte-identical output; the run ends with a
+digest of every message sent, so two runs can be compared by that line alone.
+--ticks records the quotes in a tick store at that directory (see
+tick_store.py) with virtual timestamps.'''
+
+import argparse
+import contextlib
+import hashlib
+import heapq
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timezone
+import quickfix as fix
+import quickfix44 as fix44
+
+from Market_maker import MarketMaker, PRICE_INTERVAL
+from sim_clock import VirtualClock, fix_timestamp
+from tick_store import TickStore
+
+SESSION_ID = fix.SessionID("FIX.4.4", "MARKET_MAKER", "CLIENT")
+NS = 1000000000
+
+
+class SimulatedMarketMaker(MarketMaker):
+    """MarketMaker whose outbound messages are recorded with their virtual send time"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent = []
+
+    def send(self, message, session_id):
+        self.sent.append((self.clock.time_ns(), message.toString()))
+
+    def format_and_print_message(self, prefix, message):
+        pass
+
+
+class Simulation:
+    def __init__(self, seed=0, start=None, subscribers=1, orders_per_hour=600, ticks=None):
+        self.clock = VirtualClock(start)
+        # Separate streams, so changing the order flow does not change the price walk
+        self.market_maker = SimulatedMarketMaker(self.clock, random.Random(seed))
+        self.market_maker.ticks = TickStore(ticks) if ticks else None
+        self.market_maker.session_id = SESSION_ID
+        self.rng = random.Random(seed + 1)
+        self.subscribers = subscribers
+        self.orders_per_hour = orders_per_hour
+        self.events = []
+        self._sequence = itertools.count()
+        self._cl_ord_ids = itertools.count(1)
+        self.received = 0
+
+    def schedule(self, at, action):
+        heapq.heappush(self.events, (at, next(self._sequence), action))
+
+    def run(self, seconds):
+        """Process every event in the next `seconds` of virtual time"""
+        now = self.clock.time_ns()
+        end = now + int(seconds * NS)
+        for number in range(self.subscribers):
+            self.schedule(now, lambda number=number: self.subscribe(f"SIM{number}"))
+        self.schedule(now + PRICE_INTERVAL * NS, self.price_tick)
+        if self.orders_per_hour > 0:
+            self.schedule(now + self.order_gap(), self.new_order)
+
+        while self.events and self.events[0][0] < end:
+            at, _, action = heapq.heappop(self.events)
+            # A handler that slept may have run past the event's due time already
+            self.clock.advance_to(at)
+            action()
+        self.clock.advance_to(end)
+        if self.market_maker.ticks is not None:
+            self.market_maker.ticks.close()
+
+    def order_gap(self):
+        return int(self.rng.expovariate(self.orders_per_hour / 3600) * NS)
+
+    def deliver(self, message):
+        message.getHeader().setField(52, fix_timestamp(self.clock))
+        self.market_maker.fromApp(message, SESSION_ID)
+        self.received += 1
+
+    def price_tick(self):
+        if not self.market_maker.is_paused:
+            self.market_maker.price_tick()
+        # Like update_prices: the next tick is due an interval after this one finished
+        self.schedule(self.clock.time_ns() + PRICE_INTERVAL * NS, self.price_tick)
+
+    def subscribe(self, md_req_id):
+        request = fix44.MarketDataRequest()
+        request.setField(fix.MDReqID(md_req_id))
+        request.setField(fix.SubscriptionRequestType(fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES))
+        request.setField(fix.MarketDepth(1))
+        self.deliver(request)
+
+    def new_order(self):
+        rng = self.rng
+        cl_ord_id = f"C{next(self._cl_ord_ids)}"
+        mid = self.market_maker.prices[self.market_maker.symbol_value]
+        side = rng.choice((fix.Side_BUY, fix.Side_SELL))
+        offset = round(rng.uniform(0.0, 0.05), 4)
+
+        order = fix44.NewOrderSingle()
+        order.setField(fix.ClOrdID(cl_ord_id))
+        order.setField(fix.Symbol(self.market_maker.symbol_value))
+        order.setField(fix.Side(side))
+        order.setField(fix.OrderQty(rng.choice((100, 500, 1000, 5000))))
+        order.setField(fix.OrdType(fix.OrdType_LIMIT))
+        order.setField(fix.Price(round(mid - offset if side == fix.Side_BUY else mid + offset, 4)))
+        order.setField(fix.TimeInForce(fix.TimeInForce_DAY))
+        transact_time = fix.TransactTime()
+        transact_time.setString(fix_timestamp(self.clock))
+        order.setField(transact_time)
+        self.deliver(order)
+
+        # About a third of the orders are cancelled within a few minutes, some are queried
+        if rng.random() < 0.3:
+            self.schedule(self.clock.time_ns() + int(rng.expovariate(1 / 120) * NS),
+                          lambda: self.cancel(cl_ord_id, side))
+        elif rng.random() < 0.1:
+            self.schedule(self.clock.time_ns() + int(rng.expovariate(1 / 60) * NS),
+                          lambda: self.status(cl_ord_id, side))
+        self.schedule(self.clock.time_ns() + self.order_gap(), self.new_order)
+
+    def cancel(self, orig_cl_ord_id, side):
+        cancel = fix44.OrderCancelRequest()
+        cancel.setField(fix.OrigClOrdID(orig_cl_ord_id))
+        cancel.setField(fix.ClOrdID(f"C{next(self._cl_ord_ids)}"))
+        cancel.setField(fix.Symbol(self.market_maker.symbol_value))
+        cancel.setField(fix.Side(side))
+        transact_time = fix.TransactTime()
+        transact_time.setString(fix_timestamp(self.clock))
+        cancel.setField(transact_time)
+        self.deliver(cancel)
+
+    def status(self, cl_ord_id, side):
+        request = fix44.OrderStatusRequest()
+        request.setField(fix.ClOrdID(cl_ord_id))
+        request.setField(fix.Symbol(self.market_maker.symbol_value))
+        request.setField(fix.Side(side))
+        self.deliver(request)
+
+    def digest(self):
+        sha = hashlib.sha256()
+        for sent_at, raw in self.market_maker.sent:
+            sha.update(f"{sent_at} {raw}\n".encode('latin-1'))
+        return sha.hexdigest()
+
+
+def parse_start(value):
+    """YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS, in UTC"""
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the market maker in virtual time with a seeded order flow")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hours", type=float, default=24, help="virtual time to simulate")
+    parser.add_argument("--start", type=parse_start, help="virtual start time, UTC (default 2024-01-02)")
+    parser.add_argument("--subscribers", type=int, default=1, help="market data subscriptions")
+    parser.add_argument("--orders-per-hour", type=float, default=600)
+    parser.add_argument("--output", help="write every sent message here as '<virtual ns> <message>'")
+    parser.add_argument("--ticks", help="record quotes in a tick store at this directory")
+    parser.add_argument("--verbose", action="store_true", help="keep the market maker's console output")
+    args = parser.parse_args()
+
+    simulation = Simulation(args.seed, args.start, args.subscribers, args.orders_per_hour, args.ticks)
+    started = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        simulation.run(args.hours * 3600)
+    elapsed = time.perf_counter() - started
+
+    sent = simulation.market_maker.sent
+    if args.output:
+        with open(args.output, "w") as f:
+            for sent_at, raw in sent:
+                f.write(f"{sent_at} {raw.replace(chr(1), '|')}\n")
+    print(f"Simulated {args.hours:g}h (seed {args.seed}) in {elapsed:.2f}s wall time, "
+          f"{args.hours * 3600 / elapsed:.0f}x real time")
+    print(f"{simulation.received} messages received, {len(sent)} sent, "
+          f"{len(simulation.market_maker.orders)} orders resting at the end")
+    print(f"Digest: {simulation.digest()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 // Fix_UI.js
 document.addEventListener('DOMContentLoaded', function() {
     // State variables
-    let marketData = null;
+    const marketData = new Map();
     let orderHistory = [];
     let makerOutput = [];
     let status = 'Disconnected';
@@ -39,6 +39,17 @@ document.addEventListener('DOMContentLoaded', function() {
 
 
 
+               <div class="p-4 bg-gray-800 text-white rounded-lg">
+    <h2 class="text-xl font-bold mb-4">Market Data</h2>
+    <div id="market-data" class="bg-gray-900 p-2 rounded h-48 overflow-y-auto font-mono text-sm">
+    </div>
+</div>
+
+               <div class="p-4 bg-gray-800 text-white rounded-lg">
+    <h2 class="text-xl font-bold mb-4">${symbol} 1 minute bars</h2>
+    <canvas id="price-chart" class="w-full h-48 bg-gray-900 rounded"></canvas>
+</div>
+
                <div class="p-4 bg-gray-800 text-white rounded-lg">
     <h2 class="text-xl font-bold mb-4">Market Maker Output</h2>
     <div id="maker-output" class="bg-gray-900 p-2 rounded h-96 overflow-y-auto font-mono text-sm">
@@ -57,30 +68,89 @@ document.addEventListener('DOMContentLoaded', function() {
     const makerOutputDiv = document.getElementById('maker-output');
     const marketDataDiv = document.getElementById('market-data');
 
-    // WebSocket connection
-    const ws = new WebSocket(`ws://${window.location.host}/ws`);
+    // WebSocket connection; reconnects resume after the last event seen
+    let ws = null;
+    let lastSeq = null;
 
-    ws.onopen = () => {
-        status = 'Connected';
-        statusIndicator.textContent = status;
-        statusIndicator.classList.remove('bg-red-500');
-        statusIndicator.classList.add('bg-green-500');
-    };
+    // Field and enum names from /api/fix-dictionary, shown when hovering over a message
+    let fixDictionary = null;
+    fetch('/api/fix-dictionary')
+        .then((response) => response.json())
+        .then((dictionary) => { fixDictionary = dictionary; })
+        .catch(() => {});
 
-    ws.onclose = () => {
-        status = 'Disconnected';
-        statusIndicator.textContent = status;
-        statusIndicator.classList.remove('bg-green-500');
-        statusIndicator.classList.add('bg-red-500');
-    };
+    // '35=8 | 150=0' -> 'MsgType(35)=ExecutionReport | ExecType(150)=NEW'
+    function annotate(message) {
+        if (!fixDictionary) return message;
+        return message.split(' | ').map((part) => {
+            const index = part.indexOf('=');
+            const tag = part.slice(0, index).trim();
+            const name = index > 0 ? fixDictionary.names[Number(tag)] : null;
+            if (!name) return part;
+            const value = part.slice(index + 1).trim();
+            const enums = fixDictionary.values[tag];
+            return `${name}(${tag})=${enums && enums[value] !== undefined ? enums[value] : value}`;
+        }).join(' | ');
+    }
+
+    function connect() {
+        // Topics given to the page (e.g. /?topics=symbol:USD/BRL) are passed on to the feed
+        const params = new URLSearchParams();
+        const topics = new URLSearchParams(window.location.search).get('topics');
+        if (topics) {
+            params.set('topics', topics);
+        }
+        if (lastSeq !== null) {
+            params.set('since', lastSeq);
+        }
+        const query = params.toString() ? `?${params}` : '';
+        ws = new WebSocket(`ws://${window.location.host}/ws${query}`);
+        ws.binaryType = 'arraybuffer';
 
-    ws.onmessage = (event) => {
-    const data = JSON.parse(event.data);
+        ws.onopen = () => {
+            status = 'Connected';
+            statusIndicator.textContent = status;
+            statusIndicator.classList.remove('bg-red-500');
+            statusIndicator.classList.add('bg-green-500');
+        };
 
-    if (data.type === 'market_data') {
-        // Handle market data updates
-        updateMarketData(data.data);
-    } else if (data.type === 'maker_output') {
+        ws.onclose = () => {
+            status = 'Disconnected';
+            statusIndicator.textContent = status;
+            statusIndicator.classList.remove('bg-green-500');
+            statusIndicator.classList.add('bg-red-500');
+            setTimeout(connect, 1000);
+        };
+
+        ws.onmessage = (event) => {
+            if (event.data instanceof ArrayBuffer) {
+                updateMarketData(decodeMarketData(event.data));
+                return;
+            }
+            const data = JSON.parse(event.data);
+
+            if (data.type === 'md') {
+                updateMarketData(data.q);
+            } else if (data.type === 'replay') {
+                if (!data.complete) {
+                    updateMakerOutput('(some events were missed while disconnected)');
+                }
+                data.events.forEach(handleEvent);
+                if (data.seq !== undefined) {
+                    lastSeq = data.seq;
+                }
+            } else {
+                handleEvent(data);
+            }
+        };
+    }
+
+    function handleEvent(data) {
+    if (data.seq !== undefined) {
+        lastSeq = data.seq;
+    }
+
+    if (data.type === 'maker_output') {
         // Handle market maker output
         makerOutput.push(data.message);
         updateMakerOutput(data.message);
@@ -89,7 +159,48 @@ document.addEventListener('DOMContentLoaded', function() {
         orderHistory.push(data.order);
         updateOrderHistory(data.order);
     }
-};
+}
+
+    connect();
+
+    // Candles of the mid price from the tick history (/api/bars), last two hours
+    const chartCanvas = document.getElementById('price-chart');
+
+    function drawBars(bars) {
+        const ctx = chartCanvas.getContext('2d');
+        const width = chartCanvas.width = chartCanvas.clientWidth;
+        const height = chartCanvas.height = chartCanvas.clientHeight;
+        ctx.clearRect(0, 0, width, height);
+        const count = bars.time.length;
+        if (!count) return;
+        const high = Math.max(...bars.high);
+        const low = Math.min(...bars.low);
+        const range = high - low || 1;
+        const y = (price) => height - 4 - (price - low) / range * (height - 8);
+        const step = width / count;
+        for (let i = 0; i < count; i++) {
+            const x = i * step + step / 2;
+            ctx.strokeStyle = ctx.fillStyle = bars.close[i] >= bars.open[i] ? '#22c55e' : '#ef4444';
+            ctx.beginPath();
+            ctx.moveTo(x, y(bars.high[i]));
+            ctx.lineTo(x, y(bars.low[i]));
+            ctx.stroke();
+            const top = y(Math.max(bars.open[i], bars.close[i]));
+            const bottom = y(Math.min(bars.open[i], bars.close[i]));
+            ctx.fillRect(x - step * 0.35, top, Math.max(1, step * 0.7), Math.max(1, bottom - top));
+        }
+    }
+
+    function refreshChart() {
+        const start = Date.now() / 1000 - 2 * 3600;
+        fetch(`/api/bars?symbol=${encodeURIComponent(symbol)}&interval=60&start=${start}`)
+            .then((response) => response.json())
+            .then(drawBars)
+            .catch(() => {});
+    }
+
+    refreshChart();
+    setInterval(refreshChart, 10000);
 
     // Event handlers
     commandForm.onsubmit = (e) => {
@@ -105,45 +216,70 @@ document.addEventListener('DOMContentLoaded', function() {
         commandInput.value = '';
     };
 
-    function updateMarketData(data) {
-    if (!data) return;
+    // Binary market data frame: 'M', uint32 version, uint16 count, then per quote
+    // uint8 symbol length, symbol, bid, bidSize, offer, offerSize (float64, NaN when absent)
+    function decodeMarketData(buffer) {
+        const view = new DataView(buffer);
+        const decoder = new TextDecoder();
+        const count = view.getUint16(5, true);
+        const quotes = [];
+        let offset = 7;
+        for (let i = 0; i < count; i++) {
+            const length = view.getUint8(offset);
+            const symbol = decoder.decode(new Uint8Array(buffer, offset + 1, length));
+            offset += 1 + length;
+            const values = [];
+            for (let j = 0; j < 4; j++) {
+                const value = view.getFloat64(offset, true);
+                values.push(Number.isNaN(value) ? null : value);
+                offset += 8;
+            }
+            quotes.push([symbol, ...values]);
+        }
+        return quotes;
+    }
+
+    // Each quote is [symbol, bid, bidSize, offer, offerSize]; only changed symbols arrive
+    function updateMarketData(quotes) {
+    if (!quotes || !quotes.length) return;
 
     // Create table if it doesn't exist
     if (!marketDataDiv.querySelector('table')) {
         const table = document.createElement('table');
         table.className = 'w-full';
         table.innerHTML = `
-            <colgroup>
-                <col class="w-24">
-                <col>
-            </colgroup>
+            <thead>
+                <tr class="text-gray-500 text-xs text-left">
+                    <th>Symbol</th><th>Bid Size</th><th>Bid</th><th>Offer</th><th>Offer Size</th><th>Updated</th>
+                </tr>
+            </thead>
+            <tbody></tbody>
         `;
         marketDataDiv.appendChild(table);
     }
 
-    const table = marketDataDiv.querySelector('table');
-    const row = document.createElement('tr');
-    row.className = 'hover:bg-gray-800';
+    const body = marketDataDiv.querySelector('tbody');
+    const time = new Date().toLocaleTimeString();
+    const format = (value) => value === null ? '-' : value;
 
-    // Add timestamp
-    const timeCell = document.createElement('td');
-    timeCell.className = 'text-gray-500 text-xs pr-4 align-top';
-    timeCell.textContent = new Date().toLocaleTimeString();
-
-    // Add data content with hover effect
-    const dataCell = document.createElement('td');
-    dataCell.className = 'text-xs relative group';
-    dataCell.innerHTML = `
-        <div class="truncate">${data}</div>
-        <div class="hidden group-hover:block absolute left-0 top-0 bg-gray-700 p-2 rounded shadow-lg z-10 whitespace-pre-wrap">
-            ${data}
-        </div>
-    `;
-
-    row.appendChild(timeCell);
-    row.appendChild(dataCell);
-    table.appendChild(row);
-    marketDataDiv.scrollTop = marketDataDiv.scrollHeight;
+    for (const [symbol, bid, bidSize, offer, offerSize] of quotes) {
+        let row = marketData.get(symbol);
+        if (!row) {
+            row = document.createElement('tr');
+            row.className = 'hover:bg-gray-800';
+            for (let i = 0; i < 6; i++) {
+                row.appendChild(document.createElement('td'));
+            }
+            row.cells[0].textContent = symbol;
+            marketData.set(symbol, row);
+            body.appendChild(row);
+        }
+        row.cells[1].textContent = format(bidSize);
+        row.cells[2].textContent = format(bid);
+        row.cells[3].textContent = format(offer);
+        row.cells[4].textContent = format(offerSize);
+        row.cells[5].textContent = time;
+    }
 }
 
 
@@ -176,7 +312,7 @@ document.addEventListener('DOMContentLoaded', function() {
     messageCell.innerHTML = `
         <div class="truncate">${order}</div>
         <div class="hidden group-hover:block absolute left-0 top-0 bg-gray-700 p-2 rounded shadow-lg z-10 whitespace-pre-wrap">
-            ${order}
+            ${annotate(order)}
         </div>
     `;
 
@@ -228,6 +364,7 @@ function updateMakerOutput(message) {
         const div = document.createElement('div');
         div.className = 'whitespace-pre-wrap mb-1';
         div.textContent = message;
+        div.title = annotate(message);
         makerOutputDiv.appendChild(div);
         makerOutputDiv.scrollTop = makerOutputDiv.scrollHeight;
     }
@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def market_maker(tmp_path, monkeypatch):
+    """A MarketMaker that collects what it sends (replay.ReplayMarketMaker), logging under tmp_path"""
+    pytest.importorskip("quickfix")
+    pytest.importorskip("numpy")  # tick_store
+    monkeypatch.chdir(tmp_path)
+    from replay import ReplayMarketMaker
+    return ReplayMarketMaker()
+
+
+@pytest.fixture
+def sent(market_maker):
+    """The messages market_maker has sent so far, as {tag: value} dicts"""
+    import fix_codec
+    return lambda: [fix_codec.to_dict(raw) for raw in market_maker.sent]
+
+
+class FakeWebSocket:
+    """Accepts and records what the ConnectionManager sends"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+@pytest.fixture
+def fastapi_app(monkeypatch):
+    """The fastapi_app module; it mounts static/ relative to the working directory on import"""
+    pytest.importorskip("fastapi")
+    monkeypatch.chdir(ROOT)
+    import fastapi_app
+    return fastapi_app
+
+
+@pytest.fixture
+def websocket():
+    return FakeWebSocket
+
+
+def queued(connection):
+    """Frames waiting in a ClientConnection's queue, decoded when they are JSON"""
+    import json
+    frames = []
+    while not connection.queue.empty():
+        frame = connection.queue.get_nowait()
+        frames.append(json.loads(frame) if isinstance(frame, str) else frame)
+    return frames
+
+
+@pytest.fixture
+def drain():
+    return queued
@@ -0,0 +1,86 @@
+import pytest
+
+fix = pytest.importorskip("quickfix")
+fix44 = pytest.importorskip("quickfix44")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from Client import Client
+    return Client()
+
+
+@pytest.mark.parametrize("order_type, price, stop_price", [
+    (fix.OrdType_LIMIT, None, None),
+    (fix.OrdType_STOP, None, None),
+    (fix.OrdType_STOP_LIMIT, None, 5.2),
+    (fix.OrdType_STOP_LIMIT, 5.1, None),
+])
+def test_build_order_refuses_an_order_without_its_prices(client, order_type, price, stop_price):
+    with pytest.raises(ValueError):
+        client.build_order(fix44.NewOrderSingle(), "1", fix.Side_BUY, "USD/BRL", 100, order_type, price, stop_price)
+
+
+def test_build_order_sets_the_limit_price(client):
+    order = client.build_order(fix44.NewOrderSingle(), "1", fix.Side_BUY, "USD/BRL", 100, fix.OrdType_LIMIT, 5.1)
+    price = fix.Price()
+    order.getField(price)
+    assert price.getValue() == pytest.approx(5.1)
+
+
+def test_ui_command_missing_its_price_is_not_sent(client, capsys):
+    client.process_command("buy USD/BRL 100 limit")
+
+    assert "missing price" in capsys.readouterr().out
+    assert client.orders == {}
+
+
+def test_place_orders_checks_the_whole_batch_before_sending(client):
+    with pytest.raises(ValueError):
+        client.place_orders([(fix.Side_BUY, "USD/BRL", 100, fix.OrdType_MARKET),
+                             (fix.Side_BUY, "USD/BRL", 100, fix.OrdType_LIMIT)])
+    assert client.orders == {}
+
+
+def test_order_list_failure_keeps_the_fragments_already_sent(client, monkeypatch):
+    fragments = []
+
+    def send_to_target(message, session_id):
+        if len(fragments) == 2:
+            raise fix.RuntimeError("session down")
+        fragments.append(message)
+        return True
+
+    monkeypatch.setattr(fix.Session, "sendToTarget", send_to_target)
+    orders = [(fix.Side_BUY, "USD/BRL", 100, fix.OrdType_MARKET)] * 5
+    sent = client.place_orders(orders, as_list=True, list_size=2)
+
+    assert len(sent) == 4
+    assert sorted(client.orders) == sorted(sent)
+
+
+def test_place_orders_needs_one_cl_ord_id_per_order(client):
+    orders = [(fix.Side_BUY, "USD/BRL", 100, fix.OrdType_MARKET)] * 2
+    with pytest.raises(ValueError):
+        client.place_orders(orders, cl_ord_ids=["A"])
+    assert client.orders == {}
+
+
+def test_quiet_commands_are_sent_quietly_and_print_nothing(client, monkeypatch, capsys):
+    import commands
+    sent = []
+
+    def send_to_target(message, session_id):
+        sent.append((message.getHeader().getField(35), client._local.quiet))
+        return True
+
+    monkeypatch.setattr(fix.Session, "sendToTarget", send_to_target)
+    client.track_order("1", fix.Side_BUY, "USD/BRL", 100, fix.OrdType_LIMIT, 5.1)
+    for line in ("cancel 1", "replace 1 200 5.2", "status 1", "status 2"):
+        client.execute(commands.parse(line), quiet=True)
+
+    assert sent == [(fix.MsgType_OrderCancelRequest, True), (fix.MsgType_OrderCancelReplaceRequest, True),
+                    (fix.MsgType_OrderStatusRequest, True)]
+    assert client._local.quiet is False
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,53 @@
+import pytest
+
+import commands
+
+
+def test_order_command():
+    assert commands.parse("buy USD/BRL 100 limit 5.1") == {
+        'action': 'order', 'side': '1', 'symbol': 'USD/BRL', 'quantity': '100',
+        'orderType': '2', 'price': '5.1', 'stopPrice': None}
+
+
+def test_stop_limit_takes_stop_price_then_price():
+    command = commands.parse("sell USD/BRL 100 stop_limit 5.0 4.9")
+    assert (command['orderType'], command['stopPrice'], command['price']) == ('4', '5.0', '4.9')
+
+
+def test_unknown_order_type_falls_back_to_market_with_a_warning():
+    command = commands.parse("buy USD/BRL 100 iceberg")
+    assert command['orderType'] == '1'
+    assert command['warning']
+
+
+@pytest.mark.parametrize("line, missing", [
+    ("buy USD/BRL 100", []),
+    ("buy USD/BRL 100 limit", ['price']),
+    ("buy USD/BRL 100 stop", ['stopPrice']),
+    ("buy USD/BRL 100 stop_limit 5.0", ['price']),
+    ("cancel 123", []),
+])
+def test_missing_price_fields(line, missing):
+    assert commands.missing(commands.parse(line)) == missing
+
+
+def test_mass_scope():
+    assert commands.parse("cancel all USD/BRL sell") == {'action': 'cancel_all', 'symbol': 'USD/BRL', 'side': '2'}
+    assert commands.parse("status all") == {'action': 'status_all', 'symbol': None, 'side': None}
+
+
+@pytest.mark.parametrize("line", ["", "fly USD/BRL", "buy USD/BRL", "cancel", "replace 123"])
+def test_invalid_commands_raise(line):
+    with pytest.raises(commands.CommandError):
+        commands.parse(line)
+
+
+def test_to_fields():
+    assert commands.to_fields(commands.parse("buy USD/BRL 100 stop_limit 5.0 4.9")) == [
+        (35, 'buy'), (54, '1'), (55, 'USD/BRL'), (38, '100'), (40, '4'), (99, '5.0'), (44, '4.9')]
+    assert commands.to_fields(commands.parse("replace 123 200")) == [(35, 'replace'), (41, '123'), (38, '200')]
+
+
+def test_to_pipe():
+    assert commands.to_pipe("cancel 123") == "35=cancel | 11=123"
+    assert commands.to_pipe("bogus 1") == "bogus 1"
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+fix = pytest.importorskip("quickfix")
+import drop_copy
+import fix_codec
+from drop_copy import INDEX_INTERVAL, DropCopyPublisher, feed_paths, read, read_index
+
+SESSION = fix.SessionID("FIX.4.4", "MARKET_MAKER", "CLIENT")
+RECORDS = 2 * INDEX_INTERVAL + 10
+
+
+def report(number):
+    return f"8=FIX.4.4\x0135=8\x0156=CLIENT\x0111=C{number}\x01150=0\x01"
+
+
+def publish(root, numbers):
+    publisher = DropCopyPublisher(root)
+    for number in numbers:
+        publisher.publish(report(number), SESSION, sent_at=number)
+    publisher.close()
+    return publisher
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = str(tmp_path)
+    publisher = publish(root, range(1, RECORDS + 1))
+    assert (publisher.written, publisher.last_seq, publisher.errors) == (RECORDS, RECORDS, 0)
+    return root
+
+
+def test_records_keep_the_report_fields_in_seq_order(root):
+    records = list(read(0, root))
+    assert [record['seq'] for record in records] == list(range(1, RECORDS + 1))
+    assert records[0]['session'] == SESSION.toString()
+    assert records[0]['time'] == 1
+    assert records[0]['fields']['11'] == "C1"
+
+
+def test_index_points_at_every_interval_th_record(root):
+    feed_path, index_path = feed_paths(root)
+    index = read_index(index_path)
+    assert [seq for seq, _ in index] == [1, INDEX_INTERVAL + 1, 2 * INDEX_INTERVAL + 1]
+    with open(feed_path, 'rb') as feed:
+        for seq, offset in index:
+            feed.seek(offset)
+            assert json.loads(feed.readline())['seq'] == seq
+
+
+@pytest.mark.parametrize("after", [0, 1, INDEX_INTERVAL - 1, INDEX_INTERVAL, INDEX_INTERVAL + 1,
+                                   2 * INDEX_INTERVAL + 5, RECORDS])
+def test_resume_after_any_seq(root, after):
+    assert [record['seq'] for record in read(after, root)] == list(range(after + 1, RECORDS + 1))
+
+
+def test_seq_continues_across_restarts(root):
+    publish(root, [RECORDS + 1])
+    last = list(read(RECORDS, root))
+    assert [record['seq'] for record in last] == [RECORDS + 1]
+    assert last[0]['fields']['11'] == f"C{RECORDS + 1}"
+
+
+def test_partial_record_left_by_a_crash_is_dropped_on_restart(root):
+    feed_path, _ = feed_paths(root)
+    with open(feed_path, 'ab') as feed:
+        feed.write(b'{"seq":99999,"ti')
+    # A reader stops before the half written line
+    assert sum(1 for _ in read(0, root)) == RECORDS
+
+    publish(root, [RECORDS + 1])
+    assert [record['seq'] for record in read(RECORDS - 1, root)] == [RECORDS, RECORDS + 1]
+
+
+def test_no_feed_reads_nothing(tmp_path):
+    assert list(read(0, str(tmp_path / "missing"))) == []
+    assert drop_copy.session_key(SESSION.toString()) == ("FIX.4.4", "MARKET_MAKER", "CLIENT")
+
+
+def test_partial_record_longer_than_the_recover_window_is_dropped(root, monkeypatch):
+    monkeypatch.setattr(drop_copy, "RECOVER_WINDOW", 16)
+    feed_path, _ = feed_paths(root)
+    with open(feed_path, 'ab') as feed:
+        feed.write(b'{"seq":99999,"time":1,"session":"' + b'x' * 100)
+
+    publish(root, [RECORDS + 1])
+    assert [record['seq'] for record in read(RECORDS - 1, root)] == [RECORDS, RECORDS + 1]
+
+
+def test_copies_are_marked_and_sent_through_the_send_hook(tmp_path):
+    copies = []
+    publisher = DropCopyPublisher(str(tmp_path), sessions=["FIX.4.4:MARKET_MAKER->RISK"],
+                                  send=lambda messages, session_id: copies.extend(
+                                      (session_id.toString(), message.toString()) for message in messages))
+    publisher.publish(report(1), SESSION)
+    publisher.publish(report(2), SESSION)
+    publisher.close()
+
+    assert [session for session, _ in copies] == ["FIX.4.4:MARKET_MAKER->RISK"] * 2
+    fields = [fix_codec.to_dict(raw) for _, raw in copies]
+    assert [(copy[11], copy[128], copy[797]) for copy in fields] == [("C1", "CLIENT", "Y"), ("C2", "CLIENT", "Y")]
+
+
+def test_market_maker_sends_copies_quietly(market_maker, monkeypatch, capsys):
+    quiet = []
+    monkeypatch.setattr(fix.Session, "sendToTarget",
+                        lambda message, session_id: quiet.append(market_maker._local.quiet) or True)
+    market_maker.send_drop_copies([fix.Message(report(1)), fix.Message(report(2))], SESSION)
+
+    assert quiet == [True, True]
+    assert market_maker._local.quiet is False
+    assert market_maker.drop_copy.published == 0
+    assert capsys.readouterr().out == ""
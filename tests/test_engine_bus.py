@@ -0,0 +1,109 @@
+import os
+import json
+import queue
+import socket
+import threading
+import time
+
+import pytest
+
+from engine_bus import EngineServer, offer
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = EngineServer(str(tmp_path / "bus.sock"), lambda op, args: {"op": op, "args": args}, queue_size=3)
+    yield server
+    server.stop()
+
+
+def test_slow_worker_loses_its_oldest_events(server):
+    outbox = queue.Queue(server.queue_size)
+    server.connections.add(outbox)
+    for number in range(5):
+        server.publish({"type": "event", "n": number})
+
+    assert [json.loads(outbox.get_nowait())["n"] for _ in range(3)] == [2, 3, 4]
+    assert server.dropped_events == 2
+
+
+def test_concurrent_publishers_never_block_or_raise(server):
+    outbox = queue.Queue(server.queue_size)
+    server.connections.add(outbox)
+    errors = []
+
+    def publish():
+        try:
+            for number in range(2000):
+                server.publish({"type": "event", "n": number})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=publish) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert errors == []
+    assert outbox.qsize() == server.queue_size
+
+
+def test_stop_does_not_block_on_a_full_outbox(server):
+    outbox = queue.Queue(server.queue_size)
+    server.connections.add(outbox)
+    for number in range(server.queue_size):
+        server.publish({"type": "event", "n": number})
+
+    stopper = threading.Thread(target=server.stop)
+    stopper.start()
+    stopper.join(2)
+
+    assert not stopper.is_alive()
+    assert list(outbox.queue)[-1] is None
+
+
+def test_offer_reports_what_it_dropped():
+    outbox = queue.Queue(1)
+    assert offer(outbox, "a") == 0
+    assert offer(outbox, "b") == 1
+    assert outbox.get_nowait() == "b"
+
+
+def test_request_gets_a_reply_and_disconnect_ends_the_connection(server):
+    server.start()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as worker:
+        worker.connect(server.path)
+        worker.sendall(b'{"id": 1, "op": "status"}\n')
+        reply = json.loads(worker.makefile("rb").readline())
+    assert reply == {"id": 1, "result": {"op": "status", "args": {}}}
+
+    deadline = time.monotonic() + 5
+    while server.connections and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert server.connections == set()
+
+
+def test_socket_is_private_to_its_user(server):
+    server.start()
+    assert os.stat(server.path).st_mode & 0o777 == 0o600
+
+
+def test_reply_to_a_worker_that_stopped_reading_does_not_block(server):
+    engine_side, worker = socket.socketpair()
+    outbox = queue.Queue(server.queue_size)
+    server.connections.add(outbox)
+    for number in range(server.queue_size):
+        server.publish({"type": "event", "n": number})
+    worker.sendall(b'{"id": 1, "op": "status"}\n{"id": 2, "op": "status"}\n')
+    worker.close()
+
+    reader = threading.Thread(target=server._read, args=(engine_side, outbox))
+    reader.start()
+    reader.join(2)
+
+    assert not reader.is_alive()
+    *replies, end = outbox.queue
+    assert [json.loads(reply)["id"] for reply in replies] == [1, 2]
+    assert end is None
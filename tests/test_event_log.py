@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture
+def log(fastapi_app):
+    log = fastapi_app.EventLog(capacity=3)
+    for number in range(1, 6):
+        log.append({"type": "order_update", "n": number})
+    return log
+
+
+def seqs(payloads):
+    return [json.loads(payload)["seq"] for payload in payloads]
+
+
+def test_events_are_numbered_and_the_ring_keeps_the_newest(log):
+    assert (log.first_seq, log.last_seq) == (3, 5)
+    events, complete = log.since()
+    assert seqs(events) == [3, 4, 5]
+    assert complete
+
+
+@pytest.mark.parametrize("since, expected, complete", [
+    (0, [3, 4, 5], False),  # seq 1 and 2 fell out of the ring
+    (1, [3, 4, 5], False),
+    (2, [3, 4, 5], True),
+    (4, [5], True),
+    (5, [], True),
+    (9, [], True),
+])
+def test_resume_after_a_seq(log, since, expected, complete):
+    events, whole = log.since(since)
+    assert seqs(events) == expected
+    assert whole is complete
+
+
+def test_resume_filters_by_topic(fastapi_app):
+    log = fastapi_app.EventLog()
+    log.append({"n": 1}, frozenset({"symbol:USD/BRL"}))
+    log.append({"n": 2}, frozenset({"symbol:EUR/USD"}))
+    events, _ = log.since(0, {"symbol:EUR/USD"})
+    assert seqs(events) == [2]
+    assert seqs(log.since(0, {fastapi_app.ALL_TOPICS})[0]) == [1, 2]
+
+
+def connect(manager, websocket, since):
+    async def run():
+        await manager.connect(websocket, since=since, md_rate=0)
+        connection = manager.active_connections[websocket]
+        connection.sender.cancel()
+        return connection
+    return asyncio.run(run())
+
+
+def publish(manager, count):
+    async def run():
+        for number in range(count):
+            await manager.publish({"type": "order_update", "n": number})
+    asyncio.run(run())
+
+
+def test_gap_is_replayed_in_batches(fastapi_app, websocket, drain, monkeypatch):
+    monkeypatch.setattr(fastapi_app, "WS_REPLAY_BATCH", 2)
+    manager = fastapi_app.ConnectionManager()
+    publish(manager, 6)
+
+    frames = drain(connect(manager, websocket(), since=1))
+    assert [frame["type"] for frame in frames] == ["replay"] * 3
+    assert [[event["seq"] for event in frame["events"]] for frame in frames] == [[2, 3], [4, 5], [6]]
+    assert all(frame["complete"] for frame in frames)
+
+
+def test_resume_from_before_the_ring_is_marked_incomplete(fastapi_app, websocket, drain):
+    manager = fastapi_app.ConnectionManager()
+    manager.event_log = fastapi_app.EventLog(capacity=3)
+    publish(manager, 5)
+
+    [frame] = drain(connect(manager, websocket(), since=0))
+    assert [event["seq"] for event in frame["events"]] == [3, 4, 5]
+    assert frame["complete"] is False
+
+
+def test_up_to_date_client_gets_an_empty_replay_with_the_current_seq(fastapi_app, websocket, drain):
+    manager = fastapi_app.ConnectionManager()
+    publish(manager, 2)
+
+    [frame] = drain(connect(manager, websocket(), since=2))
+    assert frame == {"type": "replay", "complete": True, "events": [], "seq": 2}
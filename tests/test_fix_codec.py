@@ -0,0 +1,83 @@
+import pytest
+
+import fix_codec
+
+
+def message(body, begin="FIX.4.4"):
+    """A well formed raw message around body ('35=D\x0111=1\x01...')"""
+    head = f"8={begin}\x019={len(body)}\x01{body}"
+    return f"{head}10={fix_codec.checksum(head):03d}\x01"
+
+
+ORDER = message("35=D\x0149=CLIENT\x0156=MARKET_MAKER\x0111=123\x0155=USD/BRL\x01")
+
+
+def test_fields_are_scanned_in_order_as_views():
+    pairs = list(fix_codec.fields(ORDER))
+    assert [tag for tag, _ in pairs] == [8, 9, 35, 49, 56, 11, 55, 10]
+    assert all(isinstance(value, memoryview) for _, value in pairs)
+    assert fix_codec.text(pairs[5][1]) == "123"
+
+
+@pytest.mark.parametrize("raw", [ORDER, ORDER.encode(), bytearray(ORDER.encode()), memoryview(ORDER.encode())])
+def test_every_buffer_type_scans_the_same(raw):
+    assert fix_codec.scan(raw) == fix_codec.scan(ORDER)
+
+
+def test_missing_final_soh_is_tolerated():
+    assert fix_codec.scan("35=D\x0111=123") == [(35, "D"), (11, "123")]
+    assert fix_codec.get_field("35=D\x0111=123", 11) == "123"
+
+
+@pytest.mark.parametrize("raw", ["35=D\x01x1=123\x01", "35=D\x01=123\x01", "35=D\x01junk"])
+def test_bad_fields_raise(raw):
+    with pytest.raises(fix_codec.FixCodecError):
+        fix_codec.scan(raw)
+
+
+def test_get_field_matches_whole_tags_only():
+    assert fix_codec.get_field(ORDER, 35) == "D"
+    assert fix_codec.get_field(ORDER, 8) == "FIX.4.4"
+    assert fix_codec.get_field(ORDER, 5) is None  # 35= and 55= must not match
+    assert fix_codec.get_field(ORDER, 1) is None  # nor 11=
+    assert fix_codec.get_field(ORDER.encode(), 55) == "USD/BRL"
+
+
+def test_repeated_tags():
+    raw = "35=W\x01268=2\x01269=0\x01270=5.1\x01269=1\x01270=5.2\x01"
+    assert fix_codec.to_dict(raw)[270] == "5.2"
+    assert fix_codec.render_json(fix_codec.scan(raw)) == '{"35": "W", "268": "2", "269": ["0", "1"], "270": ["5.1", "5.2"]}'
+
+
+def test_validate_returns_the_message_length():
+    assert fix_codec.validate(ORDER) == len(ORDER)
+    assert fix_codec.validate(ORDER.encode()) == len(ORDER)
+
+
+@pytest.mark.parametrize("raw, error", [
+    ("9=5\x0135=D\x0110=000\x01", "BeginString"),
+    ("8=FIX.4.4\x0135=D\x0110=000\x01", "BodyLength"),
+    ("8=FIX.4.4\x019=5\x0135=D\x01", "CheckSum"),
+    ("8=FIX.4.4\x019=x\x0135=D\x0110=000\x01", "not a number"),
+    (ORDER.replace("9=", "9=1", 1), "BodyLength"),
+    (ORDER[:-4] + "999\x01", "CheckSum"),
+    (ORDER.replace("11=123", "11=124"), "CheckSum"),
+])
+def test_validate_rejects(raw, error):
+    with pytest.raises(fix_codec.FixCodecError, match=error):
+        fix_codec.validate(raw)
+    assert not fix_codec.is_valid(raw)
+
+
+@pytest.mark.parametrize("raw", [ORDER, ORDER.encode()])
+def test_pipe_round_trip(raw):
+    formatted = fix_codec.to_pipe(raw)
+    assert formatted.startswith("8=FIX.4.4 | 9=")
+    assert formatted.endswith(" | ")
+    assert fix_codec.from_pipe(formatted) == ORDER
+    assert fix_codec.is_valid(fix_codec.from_pipe(formatted))
+
+
+def test_from_pipe_adds_the_final_soh():
+    assert fix_codec.from_pipe("35=D | 11=123") == "35=D\x0111=123\x01"
+    assert fix_codec.from_pipe(fix_codec.render_pipe(fix_codec.scan(ORDER))) == ORDER
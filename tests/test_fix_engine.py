@@ -0,0 +1,53 @@
+import pytest
+
+fix = pytest.importorskip("quickfix")
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from Client import Client
+    from fix_engine import FixEngine
+    engine = FixEngine("client", str(tmp_path / "bus.sock"))
+    engine.client = Client()
+    return engine
+
+
+def test_client_counts_as_logged_on_only_after_logon(engine):
+    # onCreate sets session_id long before the counterparty answers the Logon
+    engine.client.session_id = fix.SessionID("FIX.4.4", "CLIENT", "MARKET_MAKER")
+    assert engine.handle_request("status", {})["client_logged_on"] is False
+
+    engine.client.logged_on.set()
+    assert engine.handle_request("status", {})["client_logged_on"] is True
+
+    engine.client.logged_on.clear()
+    assert engine.handle_request("status", {})["client_logged_on"] is False
+
+
+def test_market_data_is_not_published_as_fix_messages(engine, monkeypatch):
+    fix44 = pytest.importorskip("quickfix44")
+    published = []
+    monkeypatch.setattr(engine.bus, "publish", published.append)
+
+    snapshot = fix44.MarketDataSnapshotFullRefresh()
+    snapshot.setField(fix.MDReqID("MD1"))
+    snapshot.setField(fix.Symbol("USD/BRL"))
+    engine.client_message_handler("Received app", snapshot)
+    engine.market_maker_message_handler("Sending app", snapshot)
+    assert published == []
+
+    report = fix44.ExecutionReport()
+    report.setField(fix.ClOrdID("1"))
+    engine.client_message_handler("Received app", report)
+    engine.market_maker_message_handler("Sending app", report)
+    assert [event["type"] for event in published] == ["order_update", "maker_output"]
+
+
+def test_command_is_published_as_fix_fields(engine, monkeypatch):
+    published = []
+    monkeypatch.setattr(engine.bus, "publish", published.append)
+    monkeypatch.setattr(engine.client, "process_command", lambda command: None)
+
+    engine.handle_request("command", {"command": "cancel 123"})
+    assert published == [{"type": "order_update", "message": "35=cancel | 11=123"}]
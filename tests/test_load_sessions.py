@@ -0,0 +1,52 @@
+import pytest
+
+fix = pytest.importorskip("quickfix")
+fix44 = pytest.importorskip("quickfix44")
+
+CLIENT = fix.SessionID("FIX.4.4", "MARKET_MAKER", "CLIENT")
+LOADGEN = fix.SessionID("FIX.4.4", "MARKET_MAKER", "LOADGEN1")
+
+
+@pytest.fixture
+def load_client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from load_generator import LoadClient
+    return LoadClient()
+
+
+@pytest.mark.parametrize("accepted", [True, False])
+def test_new_order_is_in_flight_before_it_is_sent(load_client, accepted):
+    from load_generator import LoadGenerator
+    in_flight = []
+
+    def place_order(*args, cl_ord_id=None, **kwargs):
+        # Where a fast ack would be handled
+        in_flight.append(('new', cl_ord_id) in load_client.inflight)
+        return cl_ord_id if accepted else None
+
+    load_client.place_order = place_order
+    LoadGenerator(mix="limit=1", seed=1).send_one(load_client)
+
+    assert in_flight == [True]
+    assert len(load_client.inflight) == (1 if accepted else 0)
+
+
+def test_load_generator_sessions_do_not_take_the_clients_market_data(market_maker, monkeypatch):
+    market_maker.ticks = None
+    for session_id in (CLIENT, LOADGEN):
+        market_maker.onCreate(session_id)
+        market_maker.onLogon(session_id)
+
+    request = fix44.MarketDataRequest()
+    request.setField(fix.MDReqID("MD1"))
+    request.setField(fix.SubscriptionRequestType(fix.SubscriptionRequestType_SNAPSHOT_PLUS_UPDATES))
+    request.setField(fix.MarketDepth(1))
+    market_maker.handle_market_data_request(request, CLIENT)
+
+    delivered = []
+    monkeypatch.setattr(market_maker, "send_market_data",
+                        lambda md_req_id, session_id, symbol: delivered.append((md_req_id, session_id.toString())))
+    market_maker.price_tick()
+
+    assert delivered == [("MD1", CLIENT.toString())]
+    assert market_maker.session_id.toString() == CLIENT.toString()
@@ -0,0 +1,79 @@
+import json
+import math
+import struct
+
+from market_data import (BINARY_HEADER, BINARY_QUOTE, MarketDataCache, encode_binary, encode_json,
+                         is_market_data)
+
+
+def quote(symbol, bid, offer=None):
+    return {'symbol': symbol, 'bid': bid, 'bidSize': 100.0, 'offer': offer, 'offerSize': 100.0}
+
+
+def test_market_data_is_recognised_by_msg_type():
+    assert is_market_data("8=FIX.4.4\x019=20\x0135=W\x01262=MD1\x01")
+    assert is_market_data("8=FIX.4.4\x019=20\x0135=X\x01262=MD1\x01")
+    # Text mentioning market data tags is not market data
+    assert not is_market_data("8=FIX.4.4\x019=20\x0135=8\x0158=MDReqID NoMDEntries\x01")
+    assert not is_market_data("8=FIX.4.4\x019=20\x0135=V\x01262=MD1\x01")
+
+
+def test_readers_get_only_the_latest_book_per_changed_symbol():
+    cache = MarketDataCache()
+    cache.update(quote("USD/BRL", 5.0, 5.1))
+    cache.update(quote("EUR/USD", 1.1, 1.2))
+    changed, version = cache.changed_since(0)
+    assert sorted(symbol for symbol, _ in changed) == ["EUR/USD", "USD/BRL"]
+
+    for bid in (5.01, 5.02, 5.03):
+        cache.update(quote("USD/BRL", bid, 5.1))
+    changed, latest = cache.changed_since(version)
+    assert changed == [("USD/BRL", {'bid': 5.03, 'bidSize': 100.0, 'offer': 5.1, 'offerSize': 100.0})]
+    assert latest == version + 3
+    assert cache.changed_since(latest) == ([], latest)
+
+
+def test_unchanged_books_do_not_bump_the_version():
+    cache = MarketDataCache()
+    cache.update(quote("USD/BRL", 5.0, 5.1))
+    cache.update(quote("USD/BRL", 5.0, 5.1))
+    cache.update({'bid': 1.0})
+    assert cache.version == 1
+
+
+def test_reader_is_woken_once_per_batch_of_changes():
+    cache = MarketDataCache()
+    wakeups = []
+    cache.on_change = lambda: wakeups.append(cache.version)
+    cache.update(quote("USD/BRL", 5.0, 5.1))
+    cache.update(quote("USD/BRL", 5.01, 5.1))
+    assert wakeups == [1]
+    cache.acknowledge()
+    cache.update(quote("USD/BRL", 5.02, 5.1))
+    assert wakeups == [1, 3]
+
+
+def test_json_frame():
+    frame = json.loads(encode_json([("USD/BRL", {'bid': 5.0, 'bidSize': 100.0, 'offer': None, 'offerSize': None})], 7))
+    assert frame == {"type": "md", "v": 7, "q": [["USD/BRL", 5.0, 100.0, None, None]]}
+
+
+def test_binary_frame():
+    frame = encode_binary([("USD/BRL", {'bid': 5.0, 'bidSize': 100.0, 'offer': None, 'offerSize': 200.0}),
+                           ("EUR/USD", {'bid': 1.1, 'bidSize': 1.0, 'offer': 1.2, 'offerSize': 2.0})], 2 ** 32 + 5)
+    kind, version, count = BINARY_HEADER.unpack_from(frame)
+    assert (kind, version, count) == (b'M', 5, 2)
+
+    offset = BINARY_HEADER.size
+    quotes = []
+    for _ in range(count):
+        length = frame[offset]
+        symbol = frame[offset + 1:offset + 1 + length].decode()
+        offset += 1 + length
+        quotes.append((symbol, BINARY_QUOTE.unpack_from(frame, offset)))
+        offset += BINARY_QUOTE.size
+    assert offset == len(frame)
+    assert quotes[0][0] == "USD/BRL"
+    bid, bid_size, offer, offer_size = quotes[0][1]
+    assert (bid, bid_size, offer_size) == (5.0, 100.0, 200.0) and math.isnan(offer)
+    assert quotes[1] == ("EUR/USD", (1.1, 1.0, 1.2, 2.0))
@@ -0,0 +1,102 @@
+import pytest
+
+fix = pytest.importorskip("quickfix")
+fix44 = pytest.importorskip("quickfix44")
+
+CLIENT = fix.SessionID("FIX.4.4", "MARKET_MAKER", "CLIENT")
+LOADGEN = fix.SessionID("FIX.4.4", "MARKET_MAKER", "LOADGEN1")
+
+
+def new_order(cl_ord_id, side=fix.Side_BUY, symbol="USD/BRL", ord_type=fix.OrdType_LIMIT, price=5.1):
+    order = fix44.NewOrderSingle()
+    order.setField(fix.ClOrdID(cl_ord_id))
+    order.setField(fix.Symbol(symbol))
+    order.setField(fix.Side(side))
+    order.setField(fix.OrderQty(100))
+    order.setField(fix.OrdType(ord_type))
+    if price is not None:
+        order.setField(fix.Price(price))
+    order.setField(fix.TransactTime())
+    return order
+
+
+@pytest.fixture
+def book(market_maker):
+    market_maker.handle_new_order(new_order("1", fix.Side_BUY, "USD/BRL"), CLIENT)
+    market_maker.handle_new_order(new_order("2", fix.Side_SELL, "USD/BRL"), CLIENT)
+    market_maker.handle_new_order(new_order("3", fix.Side_BUY, "EUR/USD"), CLIENT)
+    market_maker.handle_new_order(new_order("4", fix.Side_BUY, "USD/BRL"), LOADGEN)
+    market_maker.sent.clear()
+    return market_maker
+
+
+def test_mass_cancel_is_scoped_by_symbol_side_and_session(book, sent):
+    request = fix44.OrderMassCancelRequest()
+    request.setField(fix.ClOrdID("MC1"))
+    request.setField(fix.MassCancelRequestType(fix.MassCancelRequestType_CANCEL_ORDERS_FOR_A_SECURITY))
+    request.setField(fix.Symbol("USD/BRL"))
+    request.setField(fix.Side(fix.Side_BUY))
+    request.setField(fix.TransactTime())
+    book.handle_mass_cancel_request(request, CLIENT)
+
+    report, *cancels = sent()
+    assert report[35] == fix.MsgType_OrderMassCancelReport
+    assert report[533] == "1"  # TotalAffectedOrders
+    assert [cancel[41] for cancel in cancels] == ["1"]
+    assert {order['clOrdID'] for order in book.orders.values()} == {"2", "3", "4"}
+    assert book.find_order("1") == (None, None)
+
+
+def test_mass_cancel_all_leaves_other_sessions_alone(book, sent):
+    request = fix44.OrderMassCancelRequest()
+    request.setField(fix.ClOrdID("MC2"))
+    request.setField(fix.MassCancelRequestType(fix.MassCancelRequestType_CANCEL_ALL_ORDERS))
+    request.setField(fix.TransactTime())
+    book.handle_mass_cancel_request(request, CLIENT)
+
+    report, *cancels = sent()
+    assert report[533] == "3"
+    assert sorted(cancel[41] for cancel in cancels) == ["1", "2", "3"]
+    assert [order['clOrdID'] for order in book.orders.values()] == ["4"]
+
+
+def test_mass_status_reports_matching_orders_and_marks_the_last(book, sent):
+    request = fix44.OrderMassStatusRequest()
+    request.setField(fix.MassStatusReqID("MS1"))
+    request.setField(fix.MassStatusReqType(fix.MassStatusReqType_STATUS_FOR_ALL_ORDERS))
+    request.setField(fix.Side(fix.Side_BUY))
+    book.handle_mass_status_request(request, CLIENT)
+
+    reports = sent()
+    assert sorted(report[11] for report in reports) == ["1", "3"]
+    assert all(report[911] == "2" for report in reports)  # TotNumReports
+    assert reports[-1][912] == "Y"  # LastRptRequested
+    assert len(book.orders) == 4
+
+
+def test_mass_status_without_matches_is_answered_with_zero_reports(book, sent):
+    request = fix44.OrderMassStatusRequest()
+    request.setField(fix.MassStatusReqID("MS2"))
+    request.setField(fix.MassStatusReqType(fix.MassStatusReqType_STATUS_FOR_ORDERS_FOR_A_SECURITY))
+    request.setField(fix.Symbol("GBP/USD"))
+    book.handle_mass_status_request(request, CLIENT)
+
+    [report] = sent()
+    assert report[35] == fix.MsgType_ExecutionReport
+    assert report[150] == fix.ExecType_ORDER_STATUS
+    assert report[584] == "MS2"  # MassStatusReqID
+    assert report[911] == "0"  # TotNumReports
+    assert report[912] == "Y"  # LastRptRequested
+    assert 11 not in report
+    assert report[55] == "GBP/USD"
+
+
+def test_order_missing_its_price_is_rejected_and_not_stored(market_maker, sent):
+    market_maker.handle_new_order(new_order("L1", price=None), CLIENT)
+
+    [reject] = sent()
+    assert reject[150] == fix.ExecType_REJECTED
+    assert reject[11] == "L1"
+    assert market_maker.orders == {}
+    assert market_maker.orders_by_clordid == {}
+    assert market_maker.orders_by_session == {}
@@ -0,0 +1,49 @@
+import pytest
+
+fix = pytest.importorskip("quickfix")
+fix44 = pytest.importorskip("quickfix44")
+
+CLIENT = fix.SessionID("FIX.4.4", "MARKET_MAKER", "CLIENT")
+
+
+def order_list(prices, list_id="L1"):
+    """A NewOrderList of LIMIT orders; a None price leaves Price(44) out of that entry"""
+    message = fix44.NewOrderList()
+    message.setField(fix.ListID(list_id))
+    message.setField(fix.BidType(fix.BidType_NO_BIDDING_PROCESS))
+    message.setField(fix.TotNoOrders(len(prices)))
+    for number, price in enumerate(prices, 1):
+        group = fix44.NewOrderList.NoOrders()
+        group.setField(fix.ClOrdID(f"{list_id}-{number}"))
+        group.setField(fix.ListSeqNo(number))
+        group.setField(fix.Symbol("USD/BRL"))
+        group.setField(fix.Side(fix.Side_BUY))
+        group.setField(fix.OrderQty(100))
+        group.setField(fix.OrdType(fix.OrdType_LIMIT))
+        if price is not None:
+            group.setField(fix.Price(price))
+        message.addGroup(group)
+    return message
+
+
+def test_every_entry_is_acknowledged_with_the_list_id(market_maker, sent):
+    market_maker.handle_new_order_list(order_list([5.0 + i / 1000 for i in range(1000)]), CLIENT)
+
+    reports = sent()
+    assert len(reports) == 1000
+    assert all(report[150] == fix.ExecType_NEW and report[66] == "L1" for report in reports)
+    assert [report[11] for report in reports] == [f"L1-{number}" for number in range(1, 1001)]
+    assert len(market_maker.orders) == 1000
+    assert market_maker.find_order("L1-1000")[1]['price'] == pytest.approx(5.999)
+
+
+def test_bad_entry_is_rejected_and_the_rest_acknowledged(market_maker, sent):
+    market_maker.handle_new_order_list(order_list([5.1, None, 5.3]), CLIENT)
+
+    reports = sent()
+    assert [(report[11], report[150]) for report in reports] == [
+        ("L1-1", fix.ExecType_NEW), ("L1-2", fix.ExecType_REJECTED), ("L1-3", fix.ExecType_NEW)]
+    assert "List entry 2" in reports[1][58]
+    assert sorted(order['clOrdID'] for order in market_maker.orders.values()) == ["L1-1", "L1-3"]
+    assert market_maker.find_order("L1-2") == (None, None)
+    assert len(market_maker.select_orders(CLIENT)) == 2
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+import pytest
+
+fix = pytest.importorskip("quickfix")
+pytest.importorskip("fastapi")
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def main(fastapi_app, tmp_path, monkeypatch):
+    # fastapi_app has mounted static/ by now, so main can be imported from anywhere
+    import main
+    from Client import Client
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "state", main.GlobalState())
+    main.state.client = Client()
+    main.state.client.session_id = fix.SessionID("FIX.4.4", "CLIENT", "MARKET_MAKER")
+    return main
+
+
+def ack(client, cl_ord_id):
+    client.notify('execution_report', {'execType': fix.ExecType_NEW, 'ordStatus': fix.OrdStatus_NEW,
+                                       'clOrdID': cl_ord_id, 'origClOrdID': ''})
+
+
+def call(main, endpoint, request):
+    """Run an endpoint on a fresh loop with an AsyncClient, as the lifespan sets it up"""
+    from async_client import AsyncClient
+
+    async def run():
+        main.state.async_client = AsyncClient(main.state.client, asyncio.get_running_loop())
+        return threading.get_ident(), await endpoint(request)
+
+    return asyncio.run(run())
+
+
+def test_waiting_order_is_sent_off_the_event_loop_and_its_early_ack_is_kept(main):
+    sent_on = []
+
+    def place_order(*, cl_ord_id, **kwargs):
+        sent_on.append(threading.get_ident())
+        # Acknowledged before place_order returns
+        ack(main.state.client, cl_ord_id)
+        return cl_ord_id
+
+    main.state.client.place_order = place_order
+    loop_thread, response = call(main, main.create_order, main.SingleOrderRequest(
+        side="buy", symbol="USD/BRL", quantity=100, order_type="limit", price=5.1, wait=True, timeout=2))
+
+    assert response["status"] == "acknowledged"
+    assert sent_on and sent_on[0] != loop_thread
+
+
+def test_waiting_batch_is_sent_off_the_event_loop_and_unsent_orders_are_forgotten(main):
+    sent_on = []
+
+    def place_orders(orders, as_list=False, cl_ord_ids=None):
+        sent_on.append(threading.get_ident())
+        # Only the first order makes it out
+        ack(main.state.client, cl_ord_ids[0])
+        return cl_ord_ids[:1]
+
+    main.state.client.place_orders = place_orders
+    order = {"side": "buy", "symbol": "USD/BRL", "quantity": 100}
+    loop_thread, response = call(main, main.create_orders, main.BatchOrderRequest(
+        orders=[order, order], wait=True, timeout=2))
+
+    assert sent_on and sent_on[0] != loop_thread
+    assert response["sent"] == 1
+    assert [result["status"] for result in response["results"]] == ["acknowledged"]
+    assert main.state.async_client.in_flight == 0
+
+
+def test_batch_size_is_capped(main):
+    from pydantic import ValidationError
+    order = {"side": "buy", "symbol": "USD/BRL", "quantity": 100}
+    main.BatchOrderRequest(orders=[order] * main.MAX_BATCH_ORDERS)
+    with pytest.raises(ValidationError):
+        main.BatchOrderRequest(orders=[order] * (main.MAX_BATCH_ORDERS + 1))
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+pytest.importorskip("quickfix")
+import commands
+from playback import Playback, read_blotter, to_command
+
+
+class RecordingClient:
+    """Stands in for Client: records executed commands and hands out ClOrdIDs"""
+
+    def __init__(self):
+        self.executed = []
+        self.logger = self
+
+    def execute(self, command, quiet=False):
+        self.executed.append(dict(command))
+        return f"ID{len(self.executed)}"
+
+    def flush(self):
+        pass
+
+
+def test_record_fields_and_command_lines_give_the_same_command():
+    assert to_command({'action': 'buy', 'symbol': 'USD/BRL', 'quantity': '100', 'order_type': 'limit',
+                       'price': '5.1', 'stop_price': ''}) == commands.parse("buy USD/BRL 100 limit 5.1")
+    assert to_command({'command': 'cancel 42'}) == {'action': 'cancel', 'clOrdID': '42'}
+
+
+@pytest.mark.parametrize("record", [
+    {'action': 'buy', 'symbol': 'USD/BRL', 'quantity': '100', 'order_type': 'limit'},
+    {'action': 'buy', 'symbol': 'USD/BRL'},
+    {'action': 'buy', 'symbol': 'USD/BRL', 'quantity': '100', 'order_type': 'iceberg'},
+    {'action': 'cancel'},
+    {'action': 'fly'},
+])
+def test_bad_records_raise(record):
+    with pytest.raises(commands.CommandError):
+        to_command(record)
+
+
+def test_blotter_ids_follow_the_order_through_replace_and_cancel(tmp_path):
+    blotter = tmp_path / "blotter.csv"
+    blotter.write_text("time,id,action,symbol,quantity,order_type,price,stop_price,ref\n"
+                       "0.0,a1,buy,USD/BRL,100,limit,5.1,,\n"
+                       "0.1,,replace,,150,,5.2,,a1\n"
+                       "0.2,,cancel,,,,,,a1\n"
+                       "0.3,,buy,USD/BRL,100,limit,,,\n")
+    client = RecordingClient()
+    playback = Playback(client)
+    playback.play(str(blotter))
+
+    assert [command['action'] for command in client.executed] == ['order', 'replace', 'cancel']
+    # The replace reaches the order's ClOrdID, the cancel the replacement's
+    assert client.executed[1]['clOrdID'] == 'ID1'
+    assert client.executed[2]['clOrdID'] == 'ID2'
+    assert (playback.sent, playback.errors) == (3, 1)
+    assert playback.ids == {}
+
+
+def test_jsonl_blotter_skips_blank_and_comment_lines(tmp_path):
+    blotter = tmp_path / "blotter.jsonl"
+    blotter.write_text("# header\n\n" + json.dumps({"command": "buy USD/BRL 100"}) + "\n")
+    assert list(read_blotter(str(blotter))) == [{"command": "buy USD/BRL 100"}]
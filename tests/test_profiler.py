@@ -0,0 +1,42 @@
+import os
+import re
+import threading
+
+from profiler import MARKET_MAKER_HANDLERS, SamplingProfiler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def busy(stop, depth):
+    if depth:
+        return busy(stop, depth - 1)
+    while not stop.is_set():
+        pass
+
+
+def test_profile_can_be_read_while_sampling():
+    stop = threading.Event()
+    # Different depths give new stacks, so the sampler keeps adding keys
+    workers = [threading.Thread(target=busy, args=(stop, depth), name=f"worker-{depth}") for depth in range(20)]
+    for worker in workers:
+        worker.start()
+    profiler = SamplingProfiler(interval=0)
+    profiler.start(seconds=0.3)
+    try:
+        while profiler.running:
+            profiler.collapsed()
+            profiler.by_thread()
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+    assert profiler.samples > 0
+    assert any(thread.startswith("worker-") for thread in profiler.by_thread())
+
+
+def test_every_dispatched_market_maker_handler_can_be_timed():
+    with open(os.path.join(ROOT, "Market_maker.py")) as f:
+        source = f.read()
+    dispatched = set(re.findall(r"self\.(handle_\w+)\(message, session_id\)", source))
+    assert dispatched and dispatched <= set(MARKET_MAKER_HANDLERS)
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+import pytest
+
+fix = pytest.importorskip("quickfix")
+pytest.importorskip("fastapi")
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def main(fastapi_app, tmp_path, monkeypatch):
+    # fastapi_app has mounted static/ by now, so main can be imported from anywhere
+    import main
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "state", main.GlobalState())
+    return main
+
+
+def body(response):
+    """/ready returns a dict when ready and a 503 JSONResponse when not"""
+    if isinstance(response, dict):
+        return 200, response
+    return response.status_code, json.loads(response.body)
+
+
+def test_ready_waits_for_the_local_client_logon(main):
+    from Client import Client
+    main.state.acceptor_started.set()
+    main.state.client = Client()
+    main.state.client.session_id = fix.SessionID("FIX.4.4", "CLIENT", "MARKET_MAKER")
+
+    status, checks = body(asyncio.run(main.ready()))
+    assert status == 503
+    assert checks["client_logged_on"] is False
+
+    main.state.client.logged_on.set()
+    status, checks = body(asyncio.run(main.ready()))
+    assert status == 200
+    assert checks["status"] == "ready"
+
+
+def test_ready_waits_for_the_engine_client_logon(main, tmp_path):
+    from Client import Client
+    from engine_bus import EngineConnection
+    from fix_engine import FixEngine
+
+    engine = FixEngine("client", str(tmp_path / "engine.sock"))
+    engine.client = Client()
+    # Created, not yet logged on
+    engine.client.session_id = fix.SessionID("FIX.4.4", "CLIENT", "MARKET_MAKER")
+    engine.bus.start()
+
+    async def on_event(event):
+        pass
+
+    async def check():
+        main.state.engine = EngineConnection(engine.bus.path, on_event)
+        await main.state.engine.connect(timeout=5)
+        try:
+            before = body(await main.ready())
+            engine.client.logged_on.set()
+            after = body(await main.ready())
+        finally:
+            await main.state.engine.close()
+        return before, after
+
+    try:
+        (status_before, checks_before), (status_after, checks_after) = asyncio.run(check())
+    finally:
+        engine.bus.stop()
+
+    assert status_before == 503
+    assert checks_before["client_logged_on"] is False
+    assert checks_before["engine_connected"] is True
+    assert status_after == 200
+    assert checks_after["client_logged_on"] is True
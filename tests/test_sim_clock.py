@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+
+from sim_clock import VirtualClock, fix_timestamp
+
+START = datetime(2024, 1, 2, tzinfo=timezone.utc)
+
+
+def test_virtual_time_moves_only_when_slept_or_advanced():
+    clock = VirtualClock(START)
+    start = clock.time_ns()
+    assert start == int(START.timestamp()) * 1000000000
+    assert clock.time_ns() == start
+
+    clock.sleep(1.5)
+    assert clock.time_ns() == start + 1500000000
+
+
+def test_advance_to_never_goes_back():
+    clock = VirtualClock(START)
+    start = clock.time_ns()
+    clock.advance_to(start + 10)
+    clock.advance_to(start + 5)
+    assert clock.time_ns() == start + 10
+
+
+def test_timestamps_are_utc():
+    clock = VirtualClock(START)
+    clock.sleep(3723.0456)
+    assert clock.utcnow() == datetime(2024, 1, 2, 1, 2, 3, 45600, tzinfo=timezone.utc)
+    assert clock.now() == datetime(2024, 1, 2, 1, 2, 3, 45600)
+    assert fix_timestamp(clock) == "20240102-01:02:03.045"
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("quickfix")
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def simulate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import simulate
+    return simulate
+
+
+def run(simulate, seed, hours=1):
+    simulation = simulate.Simulation(seed, subscribers=2, orders_per_hour=600)
+    simulation.run(hours * 3600)
+    return simulation
+
+
+def test_same_seed_gives_identical_runs(simulate):
+    first = run(simulate, 42)
+    second = run(simulate, 42)
+
+    assert first.received > 0
+    assert len(first.market_maker.sent) > first.received
+    assert first.market_maker.sent == second.market_maker.sent
+    assert first.digest() == second.digest()
+
+
+def test_different_seeds_differ(simulate):
+    assert run(simulate, 1).digest() != run(simulate, 2).digest()
+
+
+def test_messages_carry_virtual_time(simulate):
+    simulation = run(simulate, 7)
+    start = simulate.VirtualClock().time_ns()
+    sent_at = [at for at, _ in simulation.market_maker.sent]
+
+    assert sent_at == sorted(sent_at)
+    assert sent_at[0] >= start
+    # A handler that sleeps near the end may finish a little past the hour
+    assert sent_at[-1] < start + 2 * 3600 * simulate.NS
@@ -0,0 +1,97 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+import tick_store
+from tick_store import TickStore, bars, ticks
+
+S = 1_000_000_000
+SYMBOL = "USD/BRL"
+
+
+@pytest.fixture
+def root(tmp_path):
+    store = TickStore(str(tmp_path))
+    # (seconds, bid, ask, bid_size, ask_size): two ticks in the first minute, three in the second
+    for second, bid, ask, bid_size, ask_size in [
+        (0, 4.99, 5.01, 100, 100),
+        (30, 5.09, 5.11, 300, 300),
+        (60, 4.89, 4.91, 100, 100),
+        (90, 5.19, 5.21, 100, 100),
+        (119, 4.99, 5.01, 200, 200),
+    ]:
+        store.append(SYMBOL, bid, ask, bid_size, ask_size, second * S)
+    store.close()
+    assert store.written == 5
+    return str(tmp_path)
+
+
+def test_bars_are_ohlc_and_size_weighted_vwap_of_the_mid(root):
+    result = bars(SYMBOL, 60 * S, root=root)
+
+    assert result['time'] == [0, 60 * S]
+    assert result['ticks'] == [2, 3]
+    assert result['open'] == pytest.approx([5.0, 4.9])
+    assert result['high'] == pytest.approx([5.1, 5.2])
+    assert result['low'] == pytest.approx([5.0, 4.9])
+    assert result['close'] == pytest.approx([5.1, 5.0])
+    assert result['volume'] == pytest.approx([400, 400])
+    assert result['vwap'] == pytest.approx([(5.0 * 100 + 5.1 * 300) / 400, (4.9 * 100 + 5.2 * 100 + 5.0 * 200) / 400])
+
+
+def test_bars_respect_the_time_range(root):
+    result = bars(SYMBOL, 60 * S, start=30 * S, end=90 * S, root=root)
+
+    assert result['time'] == [0, 60 * S]
+    assert result['ticks'] == [1, 1]
+
+
+def test_zero_size_bucket_has_no_vwap(tmp_path):
+    store = TickStore(str(tmp_path))
+    store.append(SYMBOL, 4.99, 5.01, 0, 0, 0)
+    store.close()
+
+    assert bars(SYMBOL, 60 * S, root=str(tmp_path))['vwap'] == [None]
+
+
+def test_no_history_gives_empty_bars(tmp_path):
+    assert bars(SYMBOL, 60 * S, root=str(tmp_path))['time'] == []
+
+
+def test_ticks_keep_the_most_recent_and_timestamps_never_go_back(tmp_path):
+    store = TickStore(str(tmp_path))
+    for ts in (10, 30, 20, 40):
+        store.append(SYMBOL, 5.0, 5.1, ts=ts)
+    store.close()
+
+    assert ticks(SYMBOL, root=str(tmp_path))['ts'] == [10, 30, 30, 40]
+    assert ticks(SYMBOL, limit=2, root=str(tmp_path))['ts'] == [30, 40]
+
+
+def test_half_written_batch_is_not_visible(root):
+    directory = tick_store.symbol_directory(root, SYMBOL)
+    # The writer appends ts last; a crash between columns leaves the others longer
+    with open(tick_store.column_path(directory, 'bid', np.float64), 'ab') as f:
+        f.write(np.array([1.0], dtype=np.float64).tobytes())
+
+    assert len(ticks(SYMBOL, root=root)['bid']) == 5
+
+
+def test_next_run_writes_after_the_half_written_batch_and_keeps_ts_ordered(root):
+    directory = tick_store.symbol_directory(root, SYMBOL)
+    with open(tick_store.column_path(directory, 'bid', np.float64), 'ab') as f:
+        f.write(np.array([1.0, 2.0], dtype=np.float64).tobytes())
+    with open(tick_store.column_path(directory, 'ask', np.float64), 'ab') as f:
+        f.write(b'\0\0\0')  # not even a whole value
+
+    # A new run whose clock is behind the last stored tick
+    store = TickStore(root)
+    store.append(SYMBOL, 6.0, 6.1, ts=5 * S)
+    store.close()
+
+    result = ticks(SYMBOL, root=root)
+    assert len(result['bid']) == 6
+    assert result['bid'][-1] == 6.0
+    assert result['ask'][-1] == 6.1
+    assert result['ts'] == sorted(result['ts'])
+    assert result['ts'][-1] == 119 * S
+    assert set(tick_store.column_lengths(directory).values()) == {6}
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+EXECUTION = "8=FIX.4.4 | 35=8 | 49=MARKET_MAKER | 56=CLIENT | 11=123 | 55=USD/BRL"
+
+
+def test_event_topics(fastapi_app):
+    assert fastapi_app.event_topics("order_update", EXECUTION) == {
+        "channel:order_update", "msgtype:8", "session:MARKET_MAKER", "session:CLIENT",
+        "clordid:123", "symbol:USD/BRL"}
+
+
+@pytest.fixture
+def manager(fastapi_app):
+    return fastapi_app.ConnectionManager()
+
+
+def connect(manager, websocket, topics=None):
+    async def run():
+        await manager.connect(websocket, md_rate=0, topics=topics)
+        connection = manager.active_connections[websocket]
+        connection.sender.cancel()
+        return connection
+    return asyncio.run(run())
+
+
+def order_updates(frames):
+    return [frame["order"] for frame in frames if frame.get("type") == "order_update"]
+
+
+def test_events_reach_only_matching_subscribers(manager, websocket, drain):
+    everything = connect(manager, websocket())
+    brl = connect(manager, websocket(), ["symbol:USD/BRL"])
+    eur = connect(manager, websocket(), ["symbol:EUR/USD"])
+    both = connect(manager, websocket(), ["symbol:USD/BRL", "clordid:123"])
+    for connection in (everything, brl, eur, both):
+        drain(connection)
+
+    asyncio.run(manager.broadcast_order_update(EXECUTION))
+
+    assert order_updates(drain(everything)) == [EXECUTION]
+    assert order_updates(drain(brl)) == [EXECUTION]
+    assert order_updates(drain(eur)) == []
+    # Matching two topics still delivers the event once
+    assert order_updates(drain(both)) == [EXECUTION]
+
+
+def test_subscriptions_change_with_control_frames(manager, websocket, drain):
+    socket = websocket()
+    connection = connect(manager, socket, ["symbol:EUR/USD"])
+    drain(connection)
+
+    asyncio.run(manager.handle_control(socket, '{"action": "subscribe", "topics": ["msgtype:8"]}'))
+    assert drain(connection) == [{"type": "subscriptions", "topics": ["msgtype:8", "symbol:EUR/USD"]}]
+    asyncio.run(manager.broadcast_order_update(EXECUTION))
+    assert order_updates(drain(connection)) == [EXECUTION]
+
+    asyncio.run(manager.handle_control(socket, '{"action": "unsubscribe", "topics": ["msgtype:8"]}'))
+    drain(connection)
+    asyncio.run(manager.broadcast_order_update(EXECUTION))
+    assert order_updates(drain(connection)) == []
+    assert "msgtype:8" not in manager.subscribers
+
+
+@pytest.mark.parametrize("text", ["not json", '{"topics": []}', '{"action": "mute"}'])
+def test_bad_control_frames_are_answered_with_an_error(manager, websocket, drain, text):
+    socket = websocket()
+    connection = connect(manager, socket)
+    drain(connection)
+
+    asyncio.run(manager.handle_control(socket, text))
+    [frame] = drain(connection)
+    assert frame["type"] == "error"
+    assert connection.topics == {"*"}
+
+
+def test_disconnect_removes_every_subscription(manager, websocket):
+    socket = websocket()
+    connect(manager, socket, ["symbol:USD/BRL", "msgtype:8"])
+
+    async def run():
+        manager.disconnect(socket)
+    asyncio.run(run())
+    assert manager.subscribers == {}
@@ -0,0 +1,203 @@
+'''Tick history: append-only columnar files per symbol, with OHLC/VWAP bars.
+
+Every quote the market maker publishes is appended to one directory per
+symbol under FIX_TICK_DIR (default ticks/):
+
+    ticks/USD_BRL/ts.i8        int64   ns since epoch, non-decreasing
+    ticks/USD_BRL/bid.f8       float64
+    ticks/USD_BRL/ask.f8       float64
+    ticks/USD_BRL/bid_size.f8  float64
+    ticks/USD_BRL/ask_size.f8  float64
+
+The publisher only puts ticks on a queue; a writer thread appends them to the
+column files in batches. Readers memory-map the columns and use the shortest
+one, so a batch that is half written is simply not visible yet; the next
+writer to touch the symbol cuts it off before appending. Queries work
+on the mapped arrays: a time range is two binary searches and bars are
+computed with reduceat over the bucket boundaries. Readers may be in another
+process (the web tier in separate engine mode), as long as they share the
+directory.'''
+
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+TICK_DIRECTORY = os.environ.get('FIX_TICK_DIR', 'ticks')
+# (name, dtype) of every column, in the order the writer appends them; ts goes last
+COLUMNS = (('bid', np.float64), ('ask', np.float64), ('bid_size', np.float64), ('ask_size', np.float64),
+           ('ts', np.int64))
+QUEUE_SIZE = 100000
+WRITE_BATCH = 10000
+
+
+def symbol_directory(root, symbol):
+    return os.path.join(root, symbol.replace('/', '_'))
+
+
+def column_path(directory, name, dtype):
+    return os.path.join(directory, f"{name}.{np.dtype(dtype).kind}{np.dtype(dtype).itemsize}")
+
+
+class TickStore:
+    def __init__(self, root=TICK_DIRECTORY, queue_size=QUEUE_SIZE):
+        self.root = root
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.written = 0
+        self._writer = None
+        self._lock = threading.Lock()
+        # symbol -> last ts written; a symbol is reconciled with its files the first time it is written
+        self._last_ts = {}
+
+    def append(self, symbol, bid, ask, bid_size=0.0, ask_size=0.0, ts=None):
+        """Queue one tick; never blocks, a full queue drops the tick and counts it"""
+        if self._writer is None:
+            self.start()
+        try:
+            self.queue.put_nowait((symbol, time.time_ns() if ts is None else ts, bid, ask, bid_size, ask_size))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write, name="tick-writer", daemon=True)
+                self._writer.start()
+
+    def close(self, timeout=5):
+        """Write out what is queued and stop the writer"""
+        if self._writer is not None:
+            self.queue.put(None)
+            self._writer.join(timeout)
+            self._writer = None
+
+    def _write(self):
+        while True:
+            tick = self.queue.get()
+            if tick is None:
+                return
+            batch = [tick]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    tick = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if tick is None:
+                    self._flush(batch)
+                    return
+                batch.append(tick)
+            self._flush(batch)
+
+    def _flush(self, batch):
+        by_symbol = {}
+        for tick in batch:
+            by_symbol.setdefault(tick[0], []).append(tick[1:])
+        for symbol, ticks in by_symbol.items():
+            try:
+                self._append_columns(symbol, ticks)
+            except OSError as e:
+                print(f"Error writing ticks for {symbol}: {e}")
+
+    def _append_columns(self, symbol, ticks):
+        directory = symbol_directory(self.root, symbol)
+        os.makedirs(directory, exist_ok=True)
+        if symbol not in self._last_ts:
+            self._last_ts[symbol] = self._reconcile(directory)
+        ts, bid, ask, bid_size, ask_size = zip(*ticks)
+        # Keep ts non-decreasing so range queries can binary search it
+        ts = np.maximum.accumulate(np.maximum(np.array(ts, dtype=np.int64), self._last_ts[symbol]))
+        self._last_ts[symbol] = int(ts[-1])
+        arrays = {'bid': bid, 'ask': ask, 'bid_size': bid_size, 'ask_size': ask_size, 'ts': ts}
+        for name, dtype in COLUMNS:
+            with open(column_path(directory, name, dtype), 'ab') as f:
+                f.write(np.asarray(arrays[name], dtype=dtype).tobytes())
+        self.written += len(ticks)
+
+    def _reconcile(self, directory):
+        """Cut every column back to the shortest, dropping a batch a crash left half written; returns the last ts"""
+        length = min(column_lengths(directory).values())
+        for name, dtype in COLUMNS:
+            path = column_path(directory, name, dtype)
+            size = length * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, size)
+        if length == 0:
+            return 0
+        ts = np.memmap(column_path(directory, 'ts', np.int64), dtype=np.int64, mode='r', shape=(length,))
+        return int(ts[-1])
+
+
+def symbols(root=TICK_DIRECTORY):
+    """Directory names of the symbols with history ('/' is stored as '_')"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root) if os.path.isdir(os.path.join(root, name)))
+
+
+def column_lengths(directory):
+    """{column: number of whole values in its file}, 0 for a missing file"""
+    lengths = {}
+    for name, dtype in COLUMNS:
+        path = column_path(directory, name, dtype)
+        lengths[name] = os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+    return lengths
+
+
+def load_columns(symbol, root=TICK_DIRECTORY):
+    """{column: read-only memory-mapped array}, all of the same length; empty arrays if no history"""
+    directory = symbol_directory(root, symbol)
+    length = min(column_lengths(directory).values())
+    if length == 0:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+    return {name: np.memmap(column_path(directory, name, dtype), dtype=dtype, mode='r', shape=(length,))
+            for name, dtype in COLUMNS}
+
+
+def time_range(columns, start=None, end=None):
+    """Columns restricted to start <= ts < end (ns; None is unbounded)"""
+    ts = columns['ts']
+    first = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+    last = len(ts) if end is None else int(np.searchsorted(ts, end, side='left'))
+    return {name: column[first:last] for name, column in columns.items()}
+
+
+def ticks(symbol, start=None, end=None, limit=None, root=TICK_DIRECTORY):
+    """Ticks in [start, end) ns as lists per column; limit keeps the most recent"""
+    columns = time_range(load_columns(symbol, root), start, end)
+    if limit is not None:
+        columns = {name: column[-limit:] if limit else column[:0] for name, column in columns.items()}
+    return {name: column.tolist() for name, column in columns.items()}
+
+
+def bars(symbol, interval, start=None, end=None, root=TICK_DIRECTORY):
+    """OHLC bars of the mid price over interval ns buckets aligned to the epoch.
+
+    There are no trades, so VWAP and volume use the quoted sizes: each mid is
+    weighted by the average of its bid and ask size."""
+    columns = time_range(load_columns(symbol, root), start, end)
+    ts = columns['ts']
+    if not len(ts):
+        return {'time': [], 'open': [], 'high': [], 'low': [], 'close': [], 'vwap': [], 'volume': [], 'ticks': []}
+    mid = (columns['bid'] + columns['ask']) / 2
+    size = (columns['bid_size'] + columns['ask_size']) / 2
+
+    bucket = ts // interval
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    ends = np.append(starts[1:], len(ts))
+    volume = np.add.reduceat(size, starts)
+    notional = np.add.reduceat(mid * size, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.where(volume > 0, notional / volume, np.nan)
+    return {
+        'time': (bucket[starts] * interval).tolist(),
+        'open': mid[starts].tolist(),
+        'high': np.maximum.reduceat(mid, starts).tolist(),
+        'low': np.minimum.reduceat(mid, starts).tolist(),
+        'close': mid[ends - 1].tolist(),
+        # NaN is not valid JSON
+        'vwap': [None if np.isnan(value) else value for value in vwap.tolist()],
+        'volume': volume.tolist(),
+        'ticks': (ends - starts).tolist()
+    }